@@ -1,4 +1,6 @@
 from accounts.models import UserProfile
+from accounts.services import UserService
+from accounts.tasks import process_avatar_task
 from django.contrib.auth.models import User
 from rest_framework import serializers, exceptions
 
@@ -18,24 +20,47 @@ class UserSerializerWithProfile(UserSerializer):
         fields = ('id', 'username', 'nickname', 'avatar_url')
 
     def get_avatar_url(self, obj):
-        if obj.profile.avatar:
-            return obj.profile.avatar.url
-        return None
+        return UserService.get_avatar_url(obj.profile, 'large')
 
 
-class UserSerializerForTweet(UserSerializerWithProfile):
+class UserSummarySerializer(serializers.Serializer):
+    """
+    renders a user id (or a user) from UserService.get_user_summaries. list
+    views put the summaries of the whole page into the context as
+    user_summaries_map, otherwise the single user is loaded.
+    """
+    id = serializers.IntegerField()
+    username = serializers.CharField()
+    nickname = serializers.CharField()
+    avatar_url = serializers.CharField()
+
+    def to_representation(self, instance):
+        user_id = instance.id if isinstance(instance, User) else int(instance)
+        summary = self.context.get('user_summaries_map', {}).get(user_id)
+        if summary is None:
+            summary = UserService.get_user_summaries([user_id]).get(user_id)
+        if summary is None:
+            return None
+        return super(UserSummarySerializer, self).to_representation(summary)
+
+
+class UserSerializerForTweet(UserSummarySerializer):
     pass
 
 
-class UserSerializerForFriendship(UserSerializerWithProfile):
+class UserSerializerForFriendship(UserSummarySerializer):
     pass
 
 
-class UserSerializerForComment(UserSerializerWithProfile):
+class UserSerializerForComment(UserSummarySerializer):
     pass
 
 
-class UserSerializerForLike(UserSerializerWithProfile):
+class UserSerializerForLike(UserSummarySerializer):
+    pass
+
+
+class UserSerializerForNotification(UserSummarySerializer):
     pass
 
 
@@ -45,13 +70,29 @@ class UserProfileSerializerForUpdate(serializers.ModelSerializer):
         model = UserProfile
         fields = ('nickname', 'avatar')
 
+    def update(self, instance, validated_data):
+        # the original is stored as uploaded, the thumbnails are made in the background
+        if validated_data.get('avatar'):
+            validated_data['avatar'] = UserService.save_avatar(
+                instance.user_id,
+                validated_data['avatar'],
+            )
+            validated_data['avatar_resized'] = False
+        instance = super(UserProfileSerializerForUpdate, self).update(instance, validated_data)
+        if 'avatar_resized' in validated_data:
+            process_avatar_task.delay(instance.id, instance.avatar.name)
+        return instance
+
 
 class LoginSerializer(serializers.Serializer):
     username = serializers.CharField()
     password = serializers.CharField()
 
     def validate(self, data):
-        if not User.objects.filter(username=data['username'].lower()).exists():
+        # the bloom filter answers most unknown usernames without the db
+        username = data['username'].lower()
+        if not UserService.username_may_exist(username) or \
+                not User.objects.filter(username=username).exists():
             raise exceptions.ValidationError({
                 'username': 'User does not exist.'
             })
@@ -70,11 +111,14 @@ class SignupSerializer(serializers.ModelSerializer):
     # will be called when is_valid is called
     # needs to check with insensitive letter
     def validate(self, data):
-        if User.objects.filter(username=data['username'].lower()).exists():
+        # the db is only checked when the bloom filter can not rule it out
+        if UserService.username_may_exist(data['username']) and \
+                User.objects.filter(username=data['username'].lower()).exists():
             raise exceptions.ValidationError({
                 'username': 'This user has been occupied.'
             })
-        if User.objects.filter(email=data['email'].lower()).exists():
+        if UserService.email_may_exist(data['email']) and \
+                User.objects.filter(email=data['email'].lower()).exists():
             raise exceptions.ValidationError({
                 'email': 'This email address has been occupied.'
             })
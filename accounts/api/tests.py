@@ -1,13 +1,19 @@
 from accounts.models import UserProfile
+from accounts.services import UserService
+from django.contrib.sessions.backends.base import UpdateError
 from django.core.files.uploadedfile import SimpleUploadedFile
 from rest_framework.test import APIClient
 from testing.testcases import TestCase
+from twitter.cache import SESSION_PATTERN
+from utils.redis_client import RedisClient
+from utils.redis_session import SessionStore
 
 
 LOGIN_URL = '/api/accounts/login/'
 LOGOUT_URL = '/api/accounts/logout/'
 LOGIN_STATUS_URL = '/api/accounts/login_status/'
 SIGNUP_URL = '/api/accounts/signup/'
+USERNAME_AVAILABLE_URL = '/api/accounts/username_available/'
 USER_PROFILE_DETAIL_URL = '/api/profiles/{}/'
 
 class AccountApiTests(TestCase):
@@ -61,6 +67,38 @@ class AccountApiTests(TestCase):
         self.assertEqual(response.status_code, 400)
         self.assertEqual(str(response.data['errors']['username'][0]), 'User does not exist.')
 
+    def test_session_in_redis(self):
+        self.client.post(LOGIN_URL, {
+            'username': self.user.username,
+            'password': 'correct password',
+        })
+        key = SESSION_PATTERN.format(session_key=self.client.cookies['sessionid'].value)
+        self.assertEqual(RedisClient.get_connection().exists(key), 1)
+
+        # the user is loaded once, then no query is needed to authenticate
+        response = self.client.get(LOGIN_STATUS_URL)
+        self.assertEqual(response.data['has_logged_in'], True)
+        with self.assertNumQueries(0):
+            response = self.client.get(LOGIN_STATUS_URL)
+        self.assertEqual(response.data['user']['id'], self.user.id)
+
+        # an inactive user is logged out right away in this process
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(LOGIN_STATUS_URL)
+        self.assertEqual(response.data['has_logged_in'], False)
+
+        self.user.is_active = True
+        self.user.save()
+        # a request still running during the logout must not write it back
+        session = SessionStore(self.client.cookies['sessionid'].value)
+        session['last_seen'] = 1
+        self.client.post(LOGOUT_URL)
+        self.assertEqual(RedisClient.get_connection().exists(key), 0)
+        with self.assertRaises(UpdateError):
+            session.save()
+        self.assertEqual(RedisClient.get_connection().exists(key), 0)
+
     def test_logout(self):
         # login first and check status
         self.client.post(LOGIN_URL, {
@@ -150,6 +188,43 @@ class AccountApiTests(TestCase):
         self.assertEqual(response.data['has_logged_in'], True)
 
 
+    def test_username_available(self):
+        RedisClient.clear()
+        # no filter yet, every check falls back to the db
+        self.assertEqual(UserService.username_may_exist('nobody'), True)
+        self.assertEqual(UserService.rebuild_bloom_filter(batch_size=3), 2)
+        self.assertEqual(UserService.username_may_exist('Admin_123'), True)
+        self.assertEqual(UserService.email_may_exist('ADMIN@twitter.com'), True)
+        self.assertEqual(UserService.username_may_exist('nobody'), False)
+
+        # missing param
+        response = self.client.get(USERNAME_AVAILABLE_URL)
+        self.assertEqual(response.status_code, 400)
+        response = self.client.get(USERNAME_AVAILABLE_URL, {'username': 'ADMIN_123'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['username'], 'admin_123')
+        self.assertEqual(response.data['available'], False)
+        response = self.client.get(USERNAME_AVAILABLE_URL, {'username': 'nobody'})
+        self.assertEqual(response.data['available'], True)
+
+        # new users are added to the existing filter
+        self.create_user('nobody', 'nobody@twitter.com')
+        self.assertEqual(UserService.username_may_exist('nobody'), True)
+        self.assertEqual(UserService.email_may_exist('nobody@twitter.com'), True)
+        response = self.client.get(USERNAME_AVAILABLE_URL, {'username': 'nobody'})
+        self.assertEqual(response.data['available'], False)
+        response = self.client.post(LOGIN_URL, {
+            'username': 'nobody',
+            'password': 'wrong password',
+        })
+        self.assertEqual(response.data['message'], 'username and password does not match')
+        response = self.client.post(LOGIN_URL, {
+            'username': 'somebody',
+            'password': 'any password',
+        })
+        self.assertEqual(str(response.data['errors']['username'][0]), 'User does not exist.')
+
+
 class UserProfileApiTests(TestCase):
 
     def test_update(self):
@@ -185,6 +260,19 @@ class UserProfileApiTests(TestCase):
         self.assertEqual(p.nickname, 'new nickname')
 
         # update avatar
+        response = marcus_client.put(url, {
+            'avatar': self.create_image_file('my-avatar.jpg'),
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual('my-avatar' in response.data['avatar'], True)
+        p.refresh_from_db()
+        self.assertIsNotNone(p.avatar)
+        self.assertEqual(p.avatar_resized, True)
+        # summaries serve the small thumbnail
+        summary = UserService.get_user_summaries([p.user_id])[p.user_id]
+        self.assertEqual(summary['avatar_url'].endswith('my-avatar_small.jpg'), True)
+
+        # not an image, the avatar is dropped
         response = marcus_client.put(url, {
             'avatar': SimpleUploadedFile(
                 name='my-avatar.jpg',
@@ -193,6 +281,8 @@ class UserProfileApiTests(TestCase):
             ),
         })
         self.assertEqual(response.status_code, 200)
-        self.assertEqual('my-avatar' in response.data['avatar'], True)
         p.refresh_from_db()
-        self.assertIsNotNone(p.avatar)
\ No newline at end of file
+        self.assertEqual(bool(p.avatar), False)
+        self.assertEqual(p.avatar_resized, False)
+        summary = UserService.get_user_summaries([p.user_id])[p.user_id]
+        self.assertEqual(summary['avatar_url'], None)
\ No newline at end of file
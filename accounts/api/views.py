@@ -6,6 +6,7 @@ from accounts.api.serializers import (
     UserSerializerWithProfile
 )
 from accounts.models import UserProfile
+from accounts.services import UserService
 from django.contrib.auth import (
     login as django_login,
     logout as django_logout,
@@ -18,6 +19,7 @@ from rest_framework import permissions
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
+from utils.decorators import required_params
 from utils.permissions import IsObjectOwner
 
 
@@ -44,6 +46,19 @@ class AccountViewSet(viewsets.ViewSet):
             data['user'] = UserSerializer(request.user).data
         return Response(data)
 
+    @action(methods=['GET'], detail=False)
+    @method_decorator(ratelimit(key='ip', rate='10/s', method='GET', block=True))
+    @required_params(params=['username'])
+    def username_available(self, request):
+        # most typed usernames are new, the bloom filter answers them without the db
+        username = request.query_params['username'].lower()
+        available = not UserService.username_may_exist(username) or \
+            not User.objects.filter(username=username).exists()
+        return Response({
+            'username': username,
+            'available': available,
+        })
+
     @action(methods=['POST'], detail=False)
     @method_decorator(ratelimit(key='ip', rate='3/s', method='POST', block=True))
     def logout(self, request):
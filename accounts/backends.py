@@ -0,0 +1,16 @@
+from accounts.services import UserService
+from django.contrib.auth.backends import ModelBackend
+
+
+class CachedModelBackend(ModelBackend):
+    """
+    the same as ModelBackend, except that the user of a session is loaded
+    through UserService.get_user_through_local_cache instead of a query on
+    every request.
+    """
+
+    def get_user(self, user_id):
+        user = UserService.get_user_through_local_cache(user_id)
+        if user is None or not self.user_can_authenticate(user):
+            return None
+        return user
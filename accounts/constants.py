@@ -0,0 +1,17 @@
+from django.conf import settings
+
+# 2^28 bits (32MB) and 7 hashes keep the false positives of the username and
+# email filter under 1% up to 10 million users
+USER_BLOOM_FILTER_SIZE = 2 ** 28 if not settings.TESTING else 2 ** 16
+USER_BLOOM_FILTER_HASH_COUNT = 7
+REBUILD_USER_BLOOM_FILTER_BATCH_SIZE = 1000 if not settings.TESTING else 3
+
+AVATAR_UPLOAD_PATTERN = 'avatars/{user_id}/{name}'
+# max width / height in pixels, user summaries carry the small size
+AVATAR_SIZES = {
+    'small': 96,
+    'large': 400,
+}
+# avatars which failed for another reason than not being an image are
+# retried, then rejected
+AVATAR_RESIZE_MAX_RETRIES = 3
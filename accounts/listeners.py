@@ -1,3 +1,28 @@
+def user_changed(sender, instance, **kwargs):
+    from accounts.services import UserService
+    UserService.invalidate_user_summary(instance.id)
+    UserService.invalidate_local_user(instance.id)
+
+
+def remember_bloom_filter_values(sender, instance, **kwargs):
+    # __dict__ instead of the attributes, deferred fields must not be loaded
+    instance._bloom_filter_values = (
+        instance.__dict__.get('username'),
+        instance.__dict__.get('email'),
+    )
+
+
+def add_user_to_bloom_filter(sender, instance, created, **kwargs):
+    from accounts.services import UserService
+    # most saves only touch last_login, the filter is left alone for them
+    values = (instance.username, instance.email)
+    if not created and getattr(instance, '_bloom_filter_values', None) == values:
+        return
+    UserService.add_to_bloom_filter(instance)
+    instance._bloom_filter_values = values
+
+
 def profile_changed(sender, instance, **kwargs):
     from accounts.services import UserService
-    UserService.invalidate_profile(instance.user_id)
\ No newline at end of file
+    UserService.invalidate_profile(instance.user_id)
+    UserService.invalidate_user_summary(instance.user_id)
\ No newline at end of file
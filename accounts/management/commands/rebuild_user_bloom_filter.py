@@ -0,0 +1,14 @@
+from accounts.constants import REBUILD_USER_BLOOM_FILTER_BATCH_SIZE
+from accounts.services import UserService
+from django.core.management.base import BaseCommand
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the bloom filter of usernames and emails, e.g. after a redis flush.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=REBUILD_USER_BLOOM_FILTER_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        count = UserService.rebuild_bloom_filter(options['batch_size'])
+        self.stdout.write('{} usernames and emails added to the bloom filter.'.format(count))
@@ -0,0 +1,18 @@
+# Generated by Django 3.1.3 on 2026-10-19 10:00
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('accounts', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='userprofile',
+            name='avatar_resized',
+            field=models.BooleanField(default=False),
+        ),
+    ]
@@ -1,13 +1,20 @@
-from accounts.listeners import profile_changed
+from accounts.listeners import (
+    add_user_to_bloom_filter,
+    profile_changed,
+    remember_bloom_filter_values,
+    user_changed,
+)
 from django.contrib.auth.models import User
 from django.db import models
-from django.db.models.signals import pre_delete, post_save
+from django.db.models.signals import post_delete, post_init, post_save
 from utils.listeners import invalidate_object_cache
 
 
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.SET_NULL, null=True)
     avatar = models.FileField(null=True)
+    # set by process_avatar_task once the AVATAR_SIZES thumbnails are saved
+    avatar_resized = models.BooleanField(default=False)
     nickname = models.CharField(null=True, max_length=200)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
@@ -29,8 +36,13 @@ def get_profile(user):
 User.profile = property(get_profile)
 
 # hook up with listeners to invalidate cache
-pre_delete.connect(invalidate_object_cache, sender=User)
+post_delete.connect(invalidate_object_cache, sender=User)
 post_save.connect(invalidate_object_cache, sender=User)
+post_delete.connect(user_changed, sender=User)
+post_save.connect(user_changed, sender=User)
+# a bloom filter can not remove values, deleted users stay as false positives
+post_init.connect(remember_bloom_filter_values, sender=User)
+post_save.connect(add_user_to_bloom_filter, sender=User)
 
-pre_delete.connect(profile_changed, sender=UserProfile)
+post_delete.connect(profile_changed, sender=UserProfile)
 post_save.connect(profile_changed, sender=UserProfile)
@@ -1,12 +1,33 @@
+from accounts.constants import (
+    AVATAR_UPLOAD_PATTERN,
+    USER_BLOOM_FILTER_HASH_COUNT,
+    USER_BLOOM_FILTER_SIZE,
+)
 from accounts.models import UserProfile
 from django.conf import settings
 from django.contrib.auth.models import User
 from django.core.cache import caches
-from twitter.cache import USER_PROFILE_PATTERN
+from twitter.cache import USER_BLOOM_FILTER_KEY, USER_PROFILE_PATTERN, USER_SUMMARY_PATTERN
+from utils.bloom_filter import BloomFilter
+from utils.photo_helper import PhotoHelper
 from utils.memcached_helper import MemcachedHelper
+from utils.time_helpers import utc_now
+
+import datetime
+import json
 
 
 cache = caches['testing'] if settings.TESTING else caches['default']
+local_cache = caches['local']
+
+USER_SUMMARY_FIELDS = ('id', 'username', 'nickname', 'avatar_url')
+
+# lowercased usernames and emails of all users
+user_bloom_filter = BloomFilter(
+    USER_BLOOM_FILTER_KEY,
+    USER_BLOOM_FILTER_SIZE,
+    USER_BLOOM_FILTER_HASH_COUNT,
+)
 
 
 class UserService:
@@ -15,6 +36,75 @@ class UserService:
     def get_user_by_id(cls, user_id):
         return MemcachedHelper.get_object_through_cache(User, user_id)
 
+    @classmethod
+    def get_user_through_local_cache(cls, user_id):
+        """
+        the user of a session, kept in process for a few seconds in front of
+        memcached. a change of the user drops the entry of this process only,
+        the other processes see it once their entry expires.
+        """
+        key = MemcachedHelper.get_key(User, user_id)
+        user = local_cache.get(key)
+        if user is not None:
+            return user
+        user = MemcachedHelper.get_object_or_none_through_cache(User, user_id)
+        if user is not None:
+            local_cache.set(key, user)
+        return user
+
+    @classmethod
+    def invalidate_local_user(cls, user_id):
+        local_cache.delete(MemcachedHelper.get_key(User, user_id))
+
+    @classmethod
+    def username_may_exist(cls, username):
+        # False is definite, True needs to be checked in db
+        return user_bloom_filter.might_contain('username:' + username.lower())
+
+    @classmethod
+    def email_may_exist(cls, email):
+        return user_bloom_filter.might_contain('email:' + email.lower())
+
+    @classmethod
+    def add_to_bloom_filter(cls, user):
+        user_bloom_filter.add(cls._get_bloom_filter_values(user.username, user.email))
+
+    @classmethod
+    def rebuild_bloom_filter(cls, batch_size):
+        def _batches():
+            last_id = 0
+            while True:
+                rows = list(
+                    User.objects.filter(id__gt=last_id)
+                    .order_by('id')
+                    .values_list('id', 'username', 'email')[:batch_size]
+                )
+                if not rows:
+                    return
+                last_id = rows[-1][0]
+                yield [
+                    value
+                    for _, username, email in rows
+                    for value in cls._get_bloom_filter_values(username, email)
+                ]
+        return user_bloom_filter.rebuild(_batches())
+
+    @classmethod
+    def _get_bloom_filter_values(cls, username, email):
+        values = ['username:' + username.lower()]
+        if email:
+            values.append('email:' + email.lower())
+        return values
+
+    @classmethod
+    def get_recently_active_user_ids(cls, days):
+        since = utc_now() - datetime.timedelta(days=days)
+        return list(
+            User.objects.filter(last_login__gte=since)
+            .order_by('-last_login')
+            .values_list('id', flat=True)
+        )
+
     @classmethod
     def get_profile_through_cache(cls, user_id):
         key = USER_PROFILE_PATTERN.format(user_id=user_id)
@@ -25,6 +115,78 @@ class UserService:
         cache.set(key, profile)
         return profile
 
+    @classmethod
+    def get_user_summaries(cls, user_ids):
+        """
+        {user_id: summary} of the users that exist, a summary is what the api
+        renders of a user. each user has one compact cache entry, read with one
+        get_many. the misses are loaded with one query for the users and one
+        for the profiles, a user without a profile is not given one here.
+        """
+        keys = {USER_SUMMARY_PATTERN.format(user_id=user_id): user_id for user_id in set(user_ids)}
+        if not keys:
+            return {}
+        summaries = {
+            keys[key]: cls.decode_user_summary(value)
+            for key, value in cache.get_many(list(keys)).items()
+        }
+        missed_ids = [user_id for user_id in keys.values() if user_id not in summaries]
+        if not missed_ids:
+            return summaries
+
+        profiles = {
+            profile.user_id: profile
+            for profile in UserProfile.objects.filter(user_id__in=missed_ids)
+        }
+        loaded_summaries = {
+            user.id: cls.build_user_summary(user, profiles.get(user.id))
+            for user in User.objects.filter(id__in=missed_ids).only('id', 'username')
+        }
+        cache.set_many({
+            USER_SUMMARY_PATTERN.format(user_id=user_id): cls.encode_user_summary(summary)
+            for user_id, summary in loaded_summaries.items()
+        })
+        summaries.update(loaded_summaries)
+        return summaries
+
+    @classmethod
+    def build_user_summary(cls, user, profile):
+        return {
+            'id': user.id,
+            'username': user.username,
+            'nickname': profile.nickname if profile else None,
+            'avatar_url': cls.get_avatar_url(profile, 'small'),
+        }
+
+    @classmethod
+    def get_avatar_url(cls, profile, size_name):
+        if not profile or not profile.avatar:
+            return None
+        # the original is served until process_avatar_task has resized it
+        if not profile.avatar_resized:
+            return profile.avatar.url
+        return PhotoHelper.get_url(profile.avatar.name, size_name)
+
+    @classmethod
+    def save_avatar(cls, user_id, file):
+        return PhotoHelper.save_upload(
+            AVATAR_UPLOAD_PATTERN.format(user_id=user_id, name=file.name),
+            file,
+        )
+
+    @classmethod
+    def encode_user_summary(cls, summary):
+        # a json array in field order, much smaller than the pickled models
+        return json.dumps([summary[field] for field in USER_SUMMARY_FIELDS], separators=(',', ':'))
+
+    @classmethod
+    def decode_user_summary(cls, value):
+        return dict(zip(USER_SUMMARY_FIELDS, json.loads(value)))
+
+    @classmethod
+    def invalidate_user_summary(cls, user_id):
+        cache.delete(USER_SUMMARY_PATTERN.format(user_id=user_id))
+
     @classmethod
     def invalidate_profile(cls, user_id):
         key = USER_PROFILE_PATTERN.format(user_id=user_id)
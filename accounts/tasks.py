@@ -0,0 +1,28 @@
+from accounts.constants import AVATAR_RESIZE_MAX_RETRIES, AVATAR_SIZES
+from celery import shared_task
+from utils.time_constants import ONE_HOUR, ONE_MINUTE
+
+
+@shared_task(
+    bind=True,
+    routing_key='photos',
+    time_limit=ONE_HOUR,
+    max_retries=AVATAR_RESIZE_MAX_RETRIES,
+)
+def process_avatar_task(self, profile_id, name):
+    from accounts.models import UserProfile
+    from utils.photo_helper import PhotoHelper
+    resized = PhotoHelper.make_thumbnails([name], AVATAR_SIZES)[name]
+    if resized is None and self.request.retries < self.max_retries:
+        raise self.retry(countdown=ONE_MINUTE)
+    profile = UserProfile.objects.filter(id=profile_id).first()
+    # the avatar has been replaced by a newer upload in the meantime
+    if profile is None or profile.avatar.name != name:
+        return 'Avatar {} is outdated.'.format(name)
+    if resized:
+        profile.avatar_resized = True
+    else:
+        profile.avatar = None
+    # save() instead of update() to invalidate the cached profile and summary
+    profile.save()
+    return 'Avatar {} {}.'.format(name, 'resized' if resized else 'rejected')
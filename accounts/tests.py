@@ -1,5 +1,11 @@
 from accounts.models import UserProfile
+from accounts.services import UserService
+from django.core.cache import caches
+from django.core.management import call_command
+from io import StringIO
 from testing.testcases import TestCase
+from twitter.cache import USER_SUMMARY_PATTERN
+from utils.redis_client import RedisClient
 
 
 class UserProfileTests(TestCase):
@@ -12,4 +18,58 @@ class UserProfileTests(TestCase):
         self.assertEqual(UserProfile.objects.count(), 0)
         p = marcus.profile
         self.assertEqual(isinstance(p, UserProfile), True)
-        self.assertEqual(UserProfile.objects.count(), 1)
\ No newline at end of file
+        self.assertEqual(UserProfile.objects.count(), 1)
+
+    def test_get_user_summaries(self):
+        self.clear_cache()
+        marcus = self.create_user('marcus')
+        fiona = self.create_user('fiona')
+        profile = marcus.profile
+        profile.nickname = 'marco'
+        profile.save()
+        missing_id = fiona.id + 1
+
+        # one query for the profiles and one for the users, fiona has no
+        # profile and none is created
+        with self.assertNumQueries(2):
+            summaries = UserService.get_user_summaries([marcus.id, fiona.id, missing_id])
+        self.assertEqual(summaries, {
+            marcus.id: {'id': marcus.id, 'username': 'marcus', 'nickname': 'marco', 'avatar_url': None},
+            fiona.id: {'id': fiona.id, 'username': 'fiona', 'nickname': None, 'avatar_url': None},
+        })
+        self.assertEqual(UserProfile.objects.filter(user=fiona).exists(), False)
+
+        # marcus comes from one compact cache entry
+        with self.assertNumQueries(0):
+            summaries = UserService.get_user_summaries([marcus.id])
+        self.assertEqual(summaries[marcus.id]['nickname'], 'marco')
+        key = USER_SUMMARY_PATTERN.format(user_id=marcus.id)
+        self.assertEqual(caches['testing'].get(key), '[{},"marcus","marco",null]'.format(marcus.id))
+
+        # dropped when the user or the profile changes
+        marcus.username = 'marcus2'
+        marcus.save()
+        self.assertEqual(caches['testing'].get(key), None)
+        self.assertEqual(UserService.get_user_summaries([marcus.id])[marcus.id]['username'], 'marcus2')
+        profile.nickname = 'marcy'
+        profile.save()
+        self.assertEqual(caches['testing'].get(key), None)
+        self.assertEqual(UserService.get_user_summaries([marcus.id])[marcus.id]['nickname'], 'marcy')
+
+    def test_rebuild_user_bloom_filter(self):
+        RedisClient.clear()
+        for i in range(4):
+            self.create_user('user{}'.format(i))
+        out = StringIO()
+        call_command('rebuild_user_bloom_filter', batch_size=3, stdout=out)
+        self.assertEqual('8 usernames and emails added' in out.getvalue(), True)
+        self.assertEqual(UserService.username_may_exist('USER3'), True)
+        self.assertEqual(UserService.email_may_exist('user0@twitter.com'), True)
+        self.assertEqual(UserService.username_may_exist('nobody'), False)
+
+        # a changed username is added, the old one stays as a false positive
+        user = self.create_user('marcus')
+        user.username = 'marco'
+        user.save()
+        self.assertEqual(UserService.username_may_exist('marco'), True)
+        self.assertEqual(UserService.username_may_exist('marcus'), True)
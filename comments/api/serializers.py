@@ -4,10 +4,12 @@ from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from likes.services import LikeService
 from tweets.models import Tweet
+from utils.memcached_helper import MemcachedHelper
+from utils.redis_helper import RedisHelper
 
 
 class CommentSerializer(serializers.ModelSerializer):
-    user = UserSerializerForComment(source='cached_user')
+    user = UserSerializerForComment(source='user_id')
     has_liked = serializers.SerializerMethodField()
     likes_count = serializers.SerializerMethodField()
 
@@ -25,10 +27,14 @@ class CommentSerializer(serializers.ModelSerializer):
         )
 
     def get_has_liked(self, obj):
-        return LikeService.has_liked(self.context['request'].user, obj)
+        return LikeService.has_liked_in_context(self.context, obj)
 
     def get_likes_count(self, obj):
-        return obj.like_set.count()
+        # views put the counts of the whole page into the serializer context
+        counts = self.context.get('counts_map', {}).get(obj)
+        if counts is not None and 'likes_count' in counts:
+            return counts['likes_count']
+        return RedisHelper.get_count(obj, 'likes_count')
 
 class CommentSerializerForCreate(serializers.ModelSerializer):
     tweet_id = serializers.IntegerField()
@@ -40,7 +46,7 @@ class CommentSerializerForCreate(serializers.ModelSerializer):
 
     def validate(self, data):
         tweet_id = data['tweet_id']
-        if not Tweet.objects.filter(id=tweet_id).exists():
+        if MemcachedHelper.get_object_or_none_through_cache(Tweet, tweet_id) is None:
             raise ValidationError({'message': 'the tweet does not exist.'})
         return data
 
@@ -1,7 +1,10 @@
 from django.utils import timezone
 from rest_framework.test import APIClient
+from comments.constants import COMMENTS_PREVIEW_SIZE
 from comments.models import Comment
 from testing.testcases import TestCase
+from tweets.tasks import flush_counts_task
+from utils.paginations import EndlessPagination
 
 
 COMMENT_URL = '/api/comments/'
@@ -109,15 +112,18 @@ class CommentApiTests(TestCase):
         # tweet_id needs to be there
         response = self.anonymous_client.get(COMMENT_URL)
         self.assertEqual(response.status_code, 400)
+        # and it needs to be an integer
+        response = self.anonymous_client.get(COMMENT_URL, {'tweet_id': 'abc'})
+        self.assertEqual(response.status_code, 400)
 
         # add tweet_id in the url and there is no comments initially
         response = self.anonymous_client.get(COMMENT_URL, {
             'tweet_id': self.tweet.id,
         })
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data['comments']), 0)
+        self.assertEqual(len(response.data['results']), 0)
 
-        # sorted by created_at
+        # sorted by created_at, newest first
         self.create_comment(self.marcus, self.tweet, '1')
         self.create_comment(self.fiona, self.tweet, '2')
         self.create_comment(self.fiona, self.create_tweet(self.fiona), '3')
@@ -125,16 +131,55 @@ class CommentApiTests(TestCase):
             'tweet_id': self.tweet.id,
         })
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(len(response.data['comments']), 2)
-        self.assertEqual(response.data['comments'][0]['content'], '1')
-        self.assertEqual(response.data['comments'][1]['content'], '2')
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertEqual(response.data['results'][0]['content'], '2')
+        self.assertEqual(response.data['results'][1]['content'], '1')
 
         # check only filter tweet_id will work. as marcus only comment 1
         response = self.anonymous_client.get(COMMENT_URL, {
             'tweet_id': self.tweet.id,
             'user_id': self.marcus.id,
         })
-        self.assertEqual(len(response.data['comments']), 2)
+        self.assertEqual(len(response.data['results']), 2)
+
+    def test_pagination(self):
+        page_size = EndlessPagination.page_size
+        comments = [
+            self.create_comment(self.marcus, self.tweet, str(i))
+            for i in range(page_size + 2)
+        ][::-1]
+
+        # the cache holds at most REDIS_LIST_LENGTH_LIMIT comments, the rest come from db
+        response = self.anonymous_client.get(COMMENT_URL, {'tweet_id': self.tweet.id})
+        self.assertEqual(response.data['has_next_page'], True)
+        self.assertEqual(
+            [comment['id'] for comment in response.data['results']],
+            [comment.id for comment in comments[:page_size]],
+        )
+        response = self.anonymous_client.get(COMMENT_URL, {
+            'tweet_id': self.tweet.id,
+            'before': response.data['next_cursor'],
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(
+            [comment['id'] for comment in response.data['results']],
+            [comment.id for comment in comments[page_size:]],
+        )
+
+        # updated and deleted comments are reloaded from db
+        comments[0].delete()
+        comments[1].content = 'updated'
+        comments[1].save()
+        response = self.anonymous_client.get(COMMENT_URL, {'tweet_id': self.tweet.id})
+        self.assertEqual(response.data['results'][0]['id'], comments[1].id)
+        self.assertEqual(response.data['results'][0]['content'], 'updated')
+
+        # the tweet detail only embeds the newest comments
+        response = self.anonymous_client.get(TWEET_DETAIL_URL.format(self.tweet.id))
+        self.assertEqual(
+            [comment['id'] for comment in response.data['comments']],
+            [comment.id for comment in comments[1:COMMENTS_PREVIEW_SIZE + 1]],
+        )
 
     def test_comments_count(self):
         # test tweet detail api
@@ -170,12 +215,14 @@ class CommentApiTests(TestCase):
             response = client.get(tweet_url)
             self.assertEqual(response.data['comments_count'], i + 1)
             self.assertEqual(self.tweet.comments_count, i)
+            flush_counts_task()
             self.tweet.refresh_from_db()
             self.assertEqual(self.tweet.comments_count, i + 1)
 
         comment_data = self.fiona_client.post(COMMENT_URL, data).data
         response = self.fiona_client.get(tweet_url)
         self.assertEqual(response.data['comments_count'], 3)
+        flush_counts_task()
         self.tweet.refresh_from_db()
         self.assertEqual(self.tweet.comments_count, 3)
 
@@ -194,6 +241,7 @@ class CommentApiTests(TestCase):
         response = self.fiona_client.get(tweet_url)
         self.assertEqual(response.data['comments_count'], 2)
         self.assertEqual(self.tweet.comments_count, 3)
+        flush_counts_task()
         self.tweet.refresh_from_db()
         self.assertEqual(self.tweet.comments_count, 2)
 
@@ -1,4 +1,6 @@
+from accounts.services import UserService
 from comments.models import Comment
+from comments.services import CommentService
 from comments.api.serializers import (
     CommentSerializer,
     CommentSerializerForCreate,
@@ -6,18 +8,21 @@ from comments.api.serializers import (
 )
 from django.utils.decorators import method_decorator
 from inbox.services import NotificationService
+from likes.services import LikeService
 from ratelimit.decorators import ratelimit
 from rest_framework import viewsets, status
 from rest_framework.permissions import IsAuthenticated, AllowAny
 from rest_framework.response import Response
 from utils.decorators import required_params
+from utils.paginations import EndlessPagination
 from utils.permissions import IsObjectOwner
+from utils.redis_helper import RedisHelper
 
 
 class CommentViewSet(viewsets.GenericViewSet):
     serializer_class = CommentSerializerForCreate
     queryset = Comment.objects.all()
-    filterset_fields = ('tweet_id',)
+    pagination_class = EndlessPagination
 
     def get_permissions(self):
         if self.action == 'create':
@@ -31,19 +36,30 @@ class CommentViewSet(viewsets.GenericViewSet):
     @required_params(params=['tweet_id'])
     @method_decorator(ratelimit(key='user', rate='10/s', method='GET', block=True))
     def list(self, request, *args, **kwargs):
-        queryset = self.get_queryset()
-        comments = self.filter_queryset(queryset)\
-            .prefetch_related('user')\
-            .order_by('created_at')
+        # newest comments first, the first pages are served from redis
+        try:
+            tweet_id = int(request.query_params['tweet_id'])
+        except ValueError:
+            return Response({
+                'success': False,
+                'message': 'tweet_id should be an integer.',
+            }, status=status.HTTP_400_BAD_REQUEST)
+        load_window = CommentService.get_cached_comments_window_loader(tweet_id)
+        page = self.paginator.paginate_cached_window(load_window, request)
+        if page is None:
+            queryset = Comment.objects.filter(tweet_id=tweet_id)
+            page = self.paginate_queryset(queryset)
         serializer = CommentSerializer(
-            comments,
-            context={'request': request},
+            page,
+            context={
+                'request': request,
+                'liked_map': LikeService.has_liked_many(request.user, page),
+                'counts_map': RedisHelper.get_counts_many(page, ['likes_count']),
+                'user_summaries_map': UserService.get_user_summaries([comment.user_id for comment in page]),
+            },
             many=True,
         )
-        # return一个dict，而不是list
-        return Response({
-            'comments': serializer.data
-        }, status=status.HTTP_200_OK)
+        return self.get_paginated_response(serializer.data)
 
     @method_decorator(ratelimit(key='user', rate='3/s', method='POST', block=True))
     def create(self, request, *args, **kwargs):
@@ -0,0 +1,3 @@
+# number of newest comments embedded in the tweet detail, the full list is
+# served by the paginated comments api
+COMMENTS_PREVIEW_SIZE = 3
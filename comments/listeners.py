@@ -3,18 +3,28 @@ from utils.redis_helper import RedisHelper
 
 def incr_comments_count(sender, instance, created, **kwargs):
     from tweets.models import Tweet
-    from django.db.models import F
 
     if not created:
         return
 
-    Tweet.objects.filter(id=instance.tweet.id).update(comments_count=F('comments_count') + 1)
-    RedisHelper.incr_count(instance.tweet, 'comments_count')
+    # written behind to the database by the flush_counts task
+    RedisHelper.incr_count(Tweet(id=instance.tweet_id), 'comments_count')
 
 def decr_comments_count(sender, instance, **kwargs):
     from tweets.models import Tweet
-    from django.db.models import F
 
+    RedisHelper.decr_count(Tweet(id=instance.tweet_id), 'comments_count')
 
-    Tweet.objects.filter(id=instance.tweet.id).update(comments_count=F('comments_count') - 1)
-    RedisHelper.decr_count(instance.tweet, 'comments_count')
\ No newline at end of file
+
+def push_comment_to_cache(sender, instance, created, **kwargs):
+    from comments.services import CommentService
+
+    if created:
+        CommentService.push_comment_to_cache(instance)
+    else:
+        CommentService.invalidate_comments_cache(instance.tweet_id)
+
+
+def remove_comment_from_cache(sender, instance, **kwargs):
+    from comments.services import CommentService
+    CommentService.invalidate_comments_cache(instance.tweet_id)
\ No newline at end of file
@@ -0,0 +1,43 @@
+# Generated by Django 3.1.3 on 2026-10-19 10:00
+
+from django.db import migrations, models
+from django.db.models import Count
+
+BACKFILL_BATCH_SIZE = 500
+
+
+def backfill_likes_count(apps, schema_editor):
+    Comment = apps.get_model('comments', 'Comment')
+    ContentType = apps.get_model('contenttypes', 'ContentType')
+    Like = apps.get_model('likes', 'Like')
+
+    content_type = ContentType.objects.filter(app_label='comments', model='comment').first()
+    if content_type is None:
+        return
+    likes_counts = Like.objects.filter(content_type=content_type)\
+        .values('object_id')\
+        .annotate(likes_count=Count('id'))\
+        .order_by()
+    comments = [
+        Comment(id=row['object_id'], likes_count=row['likes_count'])
+        for row in likes_counts
+    ]
+    Comment.objects.bulk_update(comments, ['likes_count'], batch_size=BACKFILL_BATCH_SIZE)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('likes', '0001_initial'),
+        ('comments', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='comment',
+            name='likes_count',
+            field=models.IntegerField(default=0, null=True),
+        ),
+        migrations.RunPython(backfill_likes_count, migrations.RunPython.noop),
+    ]
@@ -3,9 +3,15 @@ from django.contrib.contenttypes.models import ContentType
 from django.db import models
 from likes.models import Like
 from tweets.models import Tweet
+from utils.listeners import invalidate_object_cache
 from utils.memcached_helper import MemcachedHelper
-from django.db.models.signals import post_save, pre_delete
-from comments.listeners import incr_comments_count, decr_comments_count
+from django.db.models.signals import post_delete, post_save, pre_delete
+from comments.listeners import (
+    incr_comments_count,
+    decr_comments_count,
+    push_comment_to_cache,
+    remove_comment_from_cache,
+)
 
 
 class Comment(models.Model):
@@ -15,6 +21,7 @@ class Comment(models.Model):
     content = models.TextField(max_length=140)
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    likes_count = models.IntegerField(default=0, null=True)
 
     class Meta:
         index_together = (('tweet', 'created_at'),)
@@ -40,4 +47,8 @@ class Comment(models.Model):
 
 
 post_save.connect(incr_comments_count, sender=Comment)
-pre_delete.connect(decr_comments_count, sender=Comment)
\ No newline at end of file
+pre_delete.connect(decr_comments_count, sender=Comment)
+post_save.connect(push_comment_to_cache, sender=Comment)
+post_delete.connect(remove_comment_from_cache, sender=Comment)
+post_save.connect(invalidate_object_cache, sender=Comment)
+post_delete.connect(invalidate_object_cache, sender=Comment)
\ No newline at end of file
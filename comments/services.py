@@ -0,0 +1,36 @@
+from comments.models import Comment
+from twitter.cache import TWEET_COMMENTS_PATTERN
+from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
+
+
+def lazy_load_comments(tweet_id):
+    def _lazy_load(limit):
+        return Comment.objects.filter(tweet_id=tweet_id).order_by('-created_at', '-id')[:limit]
+    return _lazy_load
+
+
+class CommentService(object):
+
+    @classmethod
+    def get_cached_comments_window_loader(cls, tweet_id):
+        key = TWEET_COMMENTS_PATTERN.format(tweet_id=tweet_id)
+        return RedisHelper.get_window_loader(key, lazy_load_comments(tweet_id))
+
+    @classmethod
+    def get_recent_comments(cls, tweet_id, limit):
+        load_window = cls.get_cached_comments_window_loader(tweet_id)
+        comments, _ = load_window(limit=limit)
+        return comments
+
+    @classmethod
+    def push_comment_to_cache(cls, comment):
+        key = TWEET_COMMENTS_PATTERN.format(tweet_id=comment.tweet_id)
+        RedisHelper.push_object(key, comment, lazy_load_comments(comment.tweet_id))
+
+    @classmethod
+    def invalidate_comments_cache(cls, tweet_id):
+        # edits and deletes are rare compared to reads, the list is reloaded
+        # on next read
+        key = TWEET_COMMENTS_PATTERN.format(tweet_id=tweet_id)
+        RedisClient.get_connection().delete(key)
@@ -1,4 +1,8 @@
+from likes.models import Like
 from testing.testcases import TestCase
+from tweets.tasks import flush_counts_task
+from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
 
 
 class CommentModelTests(TestCase):
@@ -21,4 +25,21 @@ class CommentModelTests(TestCase):
 
         fiona = self.create_user('fiona')
         self.create_like(fiona, self.comment)
-        self.assertEqual(self.comment.like_set.count(), 2)
\ No newline at end of file
+        self.assertEqual(self.comment.like_set.count(), 2)
+
+    def test_likes_count(self):
+        RedisClient.clear()
+        fiona = self.create_user('fiona')
+        self.create_like(self.marcus, self.comment)
+        self.create_like(fiona, self.comment)
+        self.assertEqual(RedisHelper.get_count(self.comment, 'likes_count'), 2)
+
+        flush_counts_task()
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 2)
+
+        Like.objects.filter(user=fiona).delete()
+        self.assertEqual(RedisHelper.get_count(self.comment, 'likes_count'), 1)
+        flush_counts_task()
+        self.comment.refresh_from_db()
+        self.assertEqual(self.comment.likes_count, 1)
@@ -11,4 +11,8 @@ class IntegerField(HBaseField):
 
 
 class TimeStampField(HBaseField):
-    field_type = 'timestamp'
\ No newline at end of file
+    field_type = 'timestamp'
+
+
+class StringField(HBaseField):
+    field_type = 'string'
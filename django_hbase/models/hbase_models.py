@@ -14,6 +14,8 @@ class HBaseModel:
     class Meta:
         table_name = None
         row_key = ()
+        # seconds before the cells expire, None to keep them forever
+        ttl = None
 
     def __init__(self, **kwargs):
         for key, field in self.get_field_hash().items():
@@ -107,6 +109,8 @@ class HBaseModel:
             value = value[::-1]
         if field.field_type in [IntegerField.field_type, TimeStampField.field_type]:
             return int(value)
+        if isinstance(value, bytes):
+            return value.decode('utf-8')
         return value
 
     @classmethod
@@ -165,6 +169,19 @@ class HBaseModel:
         row_data = table.row(row_key)
         return cls.init_from_row(row_key, row_data)
 
+    @classmethod
+    def batch_get(cls, batch_kwargs):
+        # one round trip for many rows, None for the rows that do not exist
+        row_keys = [cls.serialize_row_key(kwargs) for kwargs in batch_kwargs]
+        if not row_keys:
+            return []
+        table = cls.get_table()
+        row_data_by_key = dict(table.rows(row_keys))
+        return [
+            cls.init_from_row(row_key, row_data_by_key.get(row_key))
+            for row_key in row_keys
+        ]
+
     @classmethod
     def get_table_name(cls):
         if not cls.Meta.table_name:
@@ -188,8 +205,10 @@ class HBaseModel:
         tables = [table.decode('utf-8') for table in conn.tables()]
         if cls.get_table_name() in tables:
             return
+        ttl = getattr(cls.Meta, 'ttl', None)
+        options = dict(time_to_live=ttl) if ttl else dict()
         column_families = {
-            field.column_family: dict()
+            field.column_family: options
             for key, field in cls.get_field_hash().items()
             if field.column_family is not None
         }
@@ -223,4 +242,14 @@ class HBaseModel:
         # need to pass in row_key to delete
         row_key = cls.serialize_row_key(kwargs)
         table = cls.get_table()
-        return table.delete(row_key)
\ No newline at end of file
+        return table.delete(row_key)
+
+    @classmethod
+    def batch_delete(cls, batch_kwargs):
+        if not batch_kwargs:
+            return
+        table = cls.get_table()
+        batch = table.batch()
+        for kwargs in batch_kwargs:
+            batch.delete(cls.serialize_row_key(kwargs))
+        batch.send()
\ No newline at end of file
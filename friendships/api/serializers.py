@@ -1,5 +1,4 @@
 from accounts.api.serializers import UserSerializerForFriendship
-from accounts.services import UserService
 from friendships.models import Friendship
 from friendships.services import FriendshipService
 from rest_framework import serializers
@@ -36,8 +35,7 @@ class BaseFriendshipSerializer(serializers.Serializer):
         return self.get_user_id(obj) in self._get_following_user_id_set()
 
     def get_user(self, obj):
-        user = UserService.get_user_by_id(self.get_user_id(obj))
-        return UserSerializerForFriendship(user).data
+        return UserSerializerForFriendship(self.get_user_id(obj), context=self.context).data
 
     def get_created_at(self, obj):
         return obj.created_at
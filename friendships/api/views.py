@@ -1,3 +1,4 @@
+from accounts.services import UserService
 from django.contrib.auth.models import User
 from django.utils.decorators import method_decorator
 
@@ -38,7 +39,12 @@ class FriendshipViewSet(viewsets.GenericViewSet):
         serializer = FollowerSerializer(
             page,
             many=True,
-            context={'request': request}
+            context={
+                'request': request,
+                'user_summaries_map': UserService.get_user_summaries(
+                    [friendship.from_user_id for friendship in page],
+                ),
+            },
         )
         return self.paginator.get_paginated_response(serializer.data)
 
@@ -55,7 +61,12 @@ class FriendshipViewSet(viewsets.GenericViewSet):
         serializer = FollowingSerializer(
             page,
             many=True,
-            context={'request': request}
+            context={
+                'request': request,
+                'user_summaries_map': UserService.get_user_summaries(
+                    [friendship.to_user_id for friendship in page],
+                ),
+            },
         )
         return self.paginator.get_paginated_response(serializer.data)
 
@@ -1,24 +1,70 @@
+from accounts.api.serializers import UserSerializerForNotification
+from comments.models import Comment
+from inbox.services import NotificationService
 from rest_framework import serializers
 from notifications.models import Notification
 
 
 class NotificationSerializer(serializers.ModelSerializer):
 
+    actor = UserSerializerForNotification(source='actor_object_id')
+    actor_count = serializers.SerializerMethodField()
+    sample_actor_ids = serializers.SerializerMethodField()
+    target = serializers.SerializerMethodField()
+    unread = serializers.SerializerMethodField()
+
     class Meta:
         model = Notification
         fields = (
             'id',
-            'actor_content_type',
-            'actor_object_id',
+            'actor',
             'verb',
-            'action_object_content_type',
-            'action_object_object_id',
-            'target_content_type',
-            'target_object_id',
+            'target',
             'timestamp',
             'unread',
+            'actor_count',
+            'sample_actor_ids',
         )
 
+    def get_unread(self, obj):
+        if 'read_watermark' in self.context:
+            watermark = self.context['read_watermark']
+        else:
+            watermark = NotificationService.get_read_watermark(obj.recipient_id)
+        return NotificationService.is_unread(obj, watermark)
+
+    # targets are read from the map built for the whole page by the view,
+    # a single notification loads its own
+    def get_target(self, obj):
+        if obj.target_content_type_id is None:
+            return None
+        targets_map = self.context.get('targets_map')
+        if targets_map is None:
+            targets_map = NotificationService.get_targets_map([obj])
+        target = targets_map.get((obj.target_content_type_id, int(obj.target_object_id)))
+        if target is None:
+            return None
+        summary = {
+            'type': target.__class__.__name__.lower(),
+            'id': target.id,
+            'content': target.content,
+        }
+        if isinstance(target, Comment):
+            summary['tweet_id'] = target.tweet_id
+        return summary
+
+    # notifications of the same target are collapsed, see
+    # NotificationService.upsert_notifications
+    def get_actor_count(self, obj):
+        if obj.data and 'actor_count' in obj.data:
+            return obj.data['actor_count']
+        return 1
+
+    def get_sample_actor_ids(self, obj):
+        if obj.data and 'sample_actor_ids' in obj.data:
+            return obj.data['sample_actor_ids']
+        return [int(obj.actor_object_id)]
+
 
 class NotificationSerializerForUpdate(serializers.ModelSerializer):
 
@@ -28,7 +74,24 @@ class NotificationSerializerForUpdate(serializers.ModelSerializer):
         model = Notification
         fields = ('unread',)
 
+    def validate(self, data):
+        # rows up to a pending mark-all-as-read watermark count as read whatever
+        # their unread column says, until mark_all_as_read_task has updated them
+        watermark = NotificationService.get_read_watermark(self.instance.recipient_id)
+        if data['unread'] and watermark is not None and self.instance.id <= watermark:
+            raise serializers.ValidationError({
+                'unread': 'Can not mark as unread while marking all as read.',
+            })
+        return data
+
     def update(self, instance, validated_data):
+        watermark = NotificationService.get_read_watermark(instance.recipient_id)
+        if NotificationService.is_unread(instance, watermark) == validated_data['unread']:
+            return instance
         instance.unread = validated_data['unread']
         instance.save()
+        NotificationService.save_to_hbase([instance])
+        NotificationService.incr_unread_counts({
+            instance.recipient_id: 1 if instance.unread else -1,
+        })
         return instance
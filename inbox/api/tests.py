@@ -1,5 +1,12 @@
+from gatekeeper.models import GateKeeper
+from inbox.models import HBaseNotification
 from notifications.models import Notification
+from inbox.api.views import NotificationPagination
+from inbox.services import NotificationService
+from inbox.tasks import reconcile_unread_counts_task
 from testing.testcases import TestCase
+from twitter.cache import NOTIFICATIONS_READ_WATERMARK_PATTERN
+from utils.redis_client import RedisClient
 
 COMMENT_URL = '/api/comments/'
 LIKE_URL = '/api/likes/'
@@ -31,6 +38,8 @@ class NotificationTests(TestCase):
 
 class NotificationApiTests(TestCase):
     def setUp(self):
+        super(NotificationApiTests, self).setUp()
+        RedisClient.clear()
         self.marcus, self.marcus_client = self.create_user_and_client('marcus')
         self.fiona, self.fiona_client = self.create_user_and_client('fiona')
         self.marcus_tweet = self.create_tweet(self.marcus)
@@ -114,23 +123,63 @@ class NotificationApiTests(TestCase):
         # the other user cant get notification information
         response = self.fiona_client.get(NOTIFICATION_URL)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['count'], 0)
+        self.assertEqual(len(response.data['results']), 0)
 
         # marcus should be able to see 2 notifications.
         response = self.marcus_client.get(NOTIFICATION_URL)
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 2)
 
         # mark the first one as read
         notification = self.marcus.notifications.first()
         notification.unread = False
         notification.save()
         response = self.marcus_client.get(NOTIFICATION_URL)
-        self.assertEqual(response.data['count'], 2)
+        self.assertEqual(len(response.data['results']), 2)
         response = self.marcus_client.get(NOTIFICATION_URL, {'unread': True})
-        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(response.data['results']), 1)
         response = self.marcus_client.get(NOTIFICATION_URL, {'unread': False})
-        self.assertEqual(response.data['count'], 1)
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_list_with_cursor(self):
+        page_size = NotificationPagination.page_size
+        comment = self.create_comment(self.marcus, self.marcus_tweet)
+        self.fiona_client.post(LIKE_URL, {
+            'content_type': 'comment',
+            'object_id': comment.id,
+        })
+        for i in range(page_size):
+            tweet = self.create_tweet(self.marcus)
+            self.fiona_client.post(LIKE_URL, {
+                'content_type': 'tweet',
+                'object_id': tweet.id,
+            })
+        notifications = list(self.marcus.notifications.order_by('-timestamp', '-id'))
+
+        # actor and target come as summaries, newest first, no count
+        response = self.marcus_client.get(NOTIFICATION_URL)
+        self.assertEqual(response.data['has_next_page'], True)
+        self.assertEqual('count' in response.data, False)
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], [n.id for n in notifications[:page_size]])
+        self.assertEqual(results[0]['actor']['username'], 'fiona')
+        self.assertEqual(results[0]['target']['type'], 'tweet')
+        self.assertEqual(results[0]['target']['id'], tweet.id)
+
+        # the page after the cursor
+        response = self.marcus_client.get(NOTIFICATION_URL, {
+            'before': response.data['next_cursor'],
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], [notifications[-1].id])
+        self.assertEqual(results[0]['target']['type'], 'comment')
+        self.assertEqual(results[0]['target']['tweet_id'], self.marcus_tweet.id)
+
+        # a deleted target is left out
+        tweet.delete()
+        response = self.marcus_client.get(NOTIFICATION_URL)
+        self.assertEqual(response.data['results'][0]['target'], None)
 
     def test_update(self):
         self.fiona_client.post(LIKE_URL, {
@@ -180,3 +229,114 @@ class NotificationApiTests(TestCase):
         self.assertEqual(response.status_code, 200)
         notification.refresh_from_db()
         self.assertNotEqual(notification.verb, 'asdad')
+
+        # rows under a pending mark-all-as-read can not become unread
+        RedisClient.get_connection().set(
+            NOTIFICATIONS_READ_WATERMARK_PATTERN.format(user_id=self.marcus.id),
+            notification.id,
+        )
+        response = self.marcus_client.put(url, {'unread': True})
+        self.assertEqual(response.status_code, 400)
+        notification.refresh_from_db()
+        self.assertEqual(notification.unread, False)
+
+    def test_unread_count_in_redis(self):
+        url = '/api/notifications/unread-count/'
+        self.fiona_client.post(LIKE_URL, {
+            'content_type': 'tweet',
+            'object_id': self.marcus_tweet.id,
+        })
+        # rebuilt from db on a miss, then served from redis
+        response = self.marcus_client.get(url)
+        self.assertEqual(response.data['unread_count'], 1)
+        with self.assertNumQueries(0):
+            self.assertEqual(NotificationService.get_unread_count(self.marcus.id), 1)
+
+        # incremented when a notification is delivered
+        comment = self.create_comment(self.marcus, self.marcus_tweet)
+        self.fiona_client.post(LIKE_URL, {
+            'content_type': 'comment',
+            'object_id': comment.id,
+        })
+        response = self.marcus_client.get(url)
+        self.assertEqual(response.data['unread_count'], 2)
+
+        # a lost increment is fixed by the reconciliation
+        notification = self.marcus.notifications.first()
+        notification.unread = False
+        notification.save()
+        response = self.marcus_client.get(url)
+        self.assertEqual(response.data['unread_count'], 2)
+        reconcile_unread_counts_task()
+        response = self.marcus_client.get(url)
+        self.assertEqual(response.data['unread_count'], 1)
+
+    def test_list_from_hbase(self):
+        GateKeeper.turn_on('switch_notification_to_hbase')
+        self.addCleanup(GateKeeper.set_kv, 'switch_notification_to_hbase', 'percent', 0)
+        bruno, bruno_client = self.create_user_and_client('bruno')
+        self.fiona_client.post(LIKE_URL, {
+            'content_type': 'tweet',
+            'object_id': self.marcus_tweet.id,
+        })
+        comment = self.create_comment(self.marcus, self.marcus_tweet)
+        self.fiona_client.post(LIKE_URL, {
+            'content_type': 'comment',
+            'object_id': comment.id,
+        })
+        # collapsed into the like of fiona, its hbase row moves to the top
+        bruno_client.post(LIKE_URL, {
+            'content_type': 'tweet',
+            'object_id': self.marcus_tweet.id,
+        })
+        self.assertEqual(len(HBaseNotification.filter(prefix=(self.marcus.id, None))), 2)
+        notifications = list(self.marcus.notifications.order_by('-timestamp', '-id'))
+
+        response = self.marcus_client.get(NOTIFICATION_URL)
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], [n.id for n in notifications])
+        self.assertEqual(results[0]['actor']['username'], 'bruno')
+        self.assertEqual(results[0]['actor_count'], 2)
+        self.assertEqual(results[0]['sample_actor_ids'], [bruno.id, self.fiona.id])
+        self.assertEqual(results[0]['target']['id'], self.marcus_tweet.id)
+        self.assertEqual(results[1]['target']['type'], 'comment')
+        self.assertEqual([r['unread'] for r in results], [True, True])
+
+        # read status is written through
+        url = '{}{}/'.format(NOTIFICATION_URL, notifications[0].id)
+        self.marcus_client.put(url, {'unread': False})
+        response = self.marcus_client.get(NOTIFICATION_URL)
+        self.assertEqual([r['unread'] for r in response.data['results']], [False, True])
+        self.marcus_client.post('/api/notifications/mark-all-as-read/')
+        response = self.marcus_client.get(NOTIFICATION_URL)
+        self.assertEqual([r['unread'] for r in response.data['results']], [False, False])
+        row = HBaseNotification.filter(prefix=(self.marcus.id, None))[0]
+        self.assertEqual(row.unread, 0)
+
+    def test_backfill_notifications_to_hbase(self):
+        bruno, bruno_client = self.create_user_and_client('bruno')
+        like_data = {'content_type': 'tweet', 'object_id': self.marcus_tweet.id}
+        # written to hbase, then collapsed while the dual write was off
+        GateKeeper.turn_on('switch_notification_dual_write')
+        self.fiona_client.post(LIKE_URL, like_data)
+        GateKeeper.set_kv('switch_notification_dual_write', 'percent', 0)
+        bruno_client.post(LIKE_URL, like_data)
+        comment = self.create_comment(self.marcus, self.marcus_tweet)
+        self.fiona_client.post(LIKE_URL, {
+            'content_type': 'comment',
+            'object_id': comment.id,
+        })
+        self.assertEqual(len(HBaseNotification.filter(prefix=(self.marcus.id, None))), 1)
+
+        GateKeeper.turn_on('switch_notification_dual_write')
+        self.addCleanup(GateKeeper.set_kv, 'switch_notification_dual_write', 'percent', 0)
+        self.assertEqual(NotificationService.backfill_hbase(batch_size=3), (2, 1))
+        self.assertEqual(NotificationService.backfill_hbase(batch_size=3), (2, 0))
+
+        GateKeeper.turn_on('switch_notification_to_hbase')
+        self.addCleanup(GateKeeper.set_kv, 'switch_notification_to_hbase', 'percent', 0)
+        notifications = list(self.marcus.notifications.order_by('-timestamp', '-id'))
+        response = self.marcus_client.get(NOTIFICATION_URL)
+        results = response.data['results']
+        self.assertEqual([r['id'] for r in results], [n.id for n in notifications])
+        self.assertEqual([r['actor_count'] for r in results], [1, 2])
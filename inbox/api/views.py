@@ -1,41 +1,76 @@
+from accounts.services import UserService
 from django.utils.decorators import method_decorator
+from gatekeeper.models import GateKeeper
 from inbox.api.serializers import (
     NotificationSerializer,
     NotificationSerializerForUpdate,
 )
+from inbox.models import HBaseNotification
+from inbox.services import NotificationService
 from notifications.models import Notification
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 from utils.decorators import required_params
+from utils.paginations import EndlessPagination
 from ratelimit.decorators import ratelimit
 
 
+class NotificationPagination(EndlessPagination):
+    cursor_field = 'timestamp'
+
+
 class NotificationViewSet(
     viewsets.GenericViewSet,
     viewsets.mixins.ListModelMixin,
 ):
     serializer_class = NotificationSerializer
     permission_classes = (IsAuthenticated,)
-    filterset_fields = ('unread', )
+    pagination_class = NotificationPagination
 
     def get_queryset(self):
         return Notification.objects.filter(recipient=self.request.user)
 
+    def list(self, request, *args, **kwargs):
+        # keyset pagination on (recipient, timestamp), no count query
+        unread = request.query_params.get('unread', '').lower()
+        if unread not in ['true', 'false'] and GateKeeper.is_switch_on('switch_notification_to_hbase'):
+            rows = self.paginator.paginate_hbase(HBaseNotification, (request.user.id,), request)
+            page = [row.to_notification() for row in rows]
+        else:
+            queryset = self.get_queryset()
+            if unread in ['true', 'false']:
+                # read status also depends on the watermark of mark-all-as-read
+                queryset = NotificationService.filter_by_unread(queryset, request.user.id, unread == 'true')
+            page = self.paginate_queryset(queryset)
+        serializer = NotificationSerializer(
+            page,
+            context={
+                'request': request,
+                'user_summaries_map': UserService.get_user_summaries(
+                    [int(notification.actor_object_id) for notification in page],
+                ),
+                'targets_map': NotificationService.get_targets_map(page),
+                'read_watermark': NotificationService.get_read_watermark(request.user.id),
+            },
+            many=True,
+        )
+        return self.get_paginated_response(serializer.data)
+
     @action(methods=['GET'], detail=False, url_path='unread-count')
     @method_decorator(ratelimit(key='user', rate='3/s', method='GET', block=True))
     def unread_count(self, request, *args, **kwargs):
-        count = self.get_queryset().filter(unread=True).count()
+        count = NotificationService.get_unread_count(request.user.id)
         return Response({'unread_count': count}, status=status.HTTP_200_OK)
 
     @action(methods=['POST'], detail=False, url_path='mark-all-as-read')
     @method_decorator(ratelimit(key='user', rate='3/s', method='POST', block=True))
     def mark_all_as_read(self, request, *args, **kwargs):
-        updated_count = self.get_queryset().\
-            filter(unread=True).update(unread=False)
+        # the rows are updated in the background, see mark_all_as_read_task
+        marked_count = NotificationService.mark_all_as_read(request.user.id)
         return Response({
-            'marked_count': updated_count
+            'marked_count': marked_count
         }, status=status.HTTP_200_OK)
 
     @required_params(method='PUT', params=['unread'])
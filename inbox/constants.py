@@ -0,0 +1,20 @@
+from django.conf import settings
+from utils.time_constants import ONE_HOUR, ONE_MINUTE
+
+# notifications created in a burst are delivered together after this delay
+NOTIFICATION_DELIVERY_DELAY = 2
+# a delivery stops draining after half of it, so that it never runs unlocked
+NOTIFICATION_DELIVERY_LOCK_TIMEOUT = 5 * ONE_MINUTE
+# max number of notifications inserted by one bulk_create
+NOTIFICATION_DELIVERY_BATCH_SIZE = 500 if not settings.TESTING else 3
+# max number of rows updated by one query of mark_all_as_read_task
+MARK_ALL_AS_READ_BATCH_SIZE = 1000 if not settings.TESTING else 3
+# number of notifications copied by one batch of backfill_hbase_notifications
+BACKFILL_HBASE_NOTIFICATIONS_BATCH_SIZE = 1000 if not settings.TESTING else 3
+# number of cached unread counters recounted by one query
+RECONCILE_UNREAD_COUNTS_BATCH_SIZE = 500 if not settings.TESTING else 3
+# notifications of the same target are collapsed inside buckets of an hour,
+# in microseconds as the timestamps
+NOTIFICATION_AGGREGATION_BUCKET = ONE_HOUR * 10 ** 6
+# number of the latest actors kept in a collapsed notification
+NOTIFICATION_SAMPLE_ACTORS_SIZE = 3
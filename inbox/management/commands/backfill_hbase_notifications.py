@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from inbox.constants import BACKFILL_HBASE_NOTIFICATIONS_BATCH_SIZE
+from inbox.services import NotificationService
+
+
+class Command(BaseCommand):
+    help = 'Copy the mysql notifications to hbase, run with switch_notification_dual_write on ' \
+           'and before switch_notification_to_hbase.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_HBASE_NOTIFICATIONS_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        copied, deleted = NotificationService.backfill_hbase(options['batch_size'])
+        self.stdout.write('{} notifications copied to hbase, {} outdated rows deleted.'.format(copied, deleted))
@@ -0,0 +1,19 @@
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    # the notification table belongs to django-notifications, so the index
+    # for the (recipient, timestamp) keyset pagination is created with sql
+    dependencies = [
+        ('notifications', '0008_index_together_recipient_unread'),
+    ]
+
+    operations = [
+        migrations.RunSQL(
+            sql='CREATE INDEX inbox_notification_recipient_timestamp '
+                'ON notifications_notification (recipient_id, timestamp)',
+            reverse_sql='DROP INDEX inbox_notification_recipient_timestamp '
+                        'ON notifications_notification',
+        ),
+    ]
@@ -0,0 +1,82 @@
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django_hbase import models
+from notifications.models import Notification
+from utils.time_constants import ONE_DAY
+from utils.time_helpers import timestamp_to_datetime, to_timestamp
+
+
+class HBaseNotification(models.HBaseModel):
+    """
+    row_key: recipient_id + created_at + notification_id
+    row_data: the notification
+    created_at is the timestamp of the mysql row, so a row is moved when a
+    collapsed notification gets a newer actor. notification_id is the id of
+    the mysql row, it keeps two notifications of the same microsecond apart
+    """
+    # reverse it to avoid hot-cold data
+    recipient_id = models.IntegerField(reverse=True)
+    created_at = models.TimeStampField()
+    notification_id = models.IntegerField()
+    actor_id = models.IntegerField(column_family='cf')
+    verb = models.StringField(column_family='cf')
+    target_content_type_id = models.IntegerField(column_family='cf')
+    target_id = models.IntegerField(column_family='cf')
+    unread = models.IntegerField(column_family='cf')
+    actor_count = models.IntegerField(column_family='cf')
+    # comma separated, latest first
+    sample_actor_ids = models.StringField(column_family='cf')
+
+    class Meta:
+        table_name = 'twitter_notifications'
+        row_key = ('recipient_id', 'created_at', 'notification_id')
+        # old notifications expire instead of piling up
+        ttl = 90 * ONE_DAY
+
+    def __str__(self):
+        return '{} notification of {}: {} {}'.format(
+            self.created_at,
+            self.recipient_id,
+            self.actor_id,
+            self.verb,
+        )
+
+    @property
+    def timestamp(self):
+        # cursors of the notification list are on timestamp
+        return self.created_at
+
+    @classmethod
+    def get_params(cls, notification):
+        data = notification.data or {}
+        actor_id = int(notification.actor_object_id)
+        return {
+            'recipient_id': notification.recipient_id,
+            'created_at': to_timestamp(notification.timestamp),
+            'notification_id': notification.id,
+            'actor_id': actor_id,
+            'verb': notification.verb,
+            'target_content_type_id': notification.target_content_type_id,
+            'target_id': notification.target_object_id,
+            'unread': int(notification.unread),
+            'actor_count': data.get('actor_count', 1),
+            'sample_actor_ids': ','.join(map(str, data.get('sample_actor_ids', [actor_id]))),
+        }
+
+    def to_notification(self):
+        # an unsaved mysql model, so that NotificationSerializer can render it
+        return Notification(
+            id=self.notification_id,
+            recipient_id=self.recipient_id,
+            actor_content_type_id=ContentType.objects.get_for_model(User).id,
+            actor_object_id=self.actor_id,
+            verb=self.verb,
+            target_content_type_id=self.target_content_type_id,
+            target_object_id=self.target_id,
+            timestamp=timestamp_to_datetime(self.created_at),
+            unread=bool(self.unread),
+            data={
+                'actor_count': self.actor_count,
+                'sample_actor_ids': [int(actor_id) for actor_id in self.sample_actor_ids.split(',')],
+            },
+        )
@@ -1,37 +1,542 @@
+from collections import Counter, defaultdict
 from comments.models import Comment
+from django.conf import settings
+from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
-from notifications.signals import notify
+from django.db.models import Count, Q
+from gatekeeper.models import GateKeeper
+from datetime import timedelta
+from django.utils import timezone
+from inbox.constants import (
+    NOTIFICATION_AGGREGATION_BUCKET,
+    NOTIFICATION_DELIVERY_BATCH_SIZE,
+    NOTIFICATION_DELIVERY_DELAY,
+    NOTIFICATION_DELIVERY_LOCK_TIMEOUT,
+    NOTIFICATION_SAMPLE_ACTORS_SIZE,
+)
+from inbox.models import HBaseNotification
+from likes.models import Like
+from notifications.models import Notification
 from tweets.models import Tweet
+from twitter.cache import (
+    NOTIFICATIONS_READ_WATERMARK_PATTERN,
+    PENDING_NOTIFICATIONS_KEY,
+    PENDING_NOTIFICATIONS_LOCK_KEY,
+    PENDING_NOTIFICATIONS_SCHEDULED_KEY,
+    UNREAD_NOTIFICATIONS_PATTERN,
+)
+from utils.memcached_helper import MemcachedHelper
+from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
+from utils.time_constants import ONE_MINUTE
+from utils.time_helpers import timestamp_to_datetime, to_timestamp
+
+import json
+import time
+import uuid
+
+LIKE_EVENT = 'like'
+COMMENT_EVENT = 'comment'
+
 
 class NotificationService(object):
 
+    # notifications are delivered by deliver_notifications_task, the request
+    # only queues the id of the like / comment in redis. events queued in a
+    # burst are delivered together with bulk_create.
+
     @classmethod
     def send_like_notification(cls, like):
-        target = like.content_object
-        if like.user == target.user:
+        cls.enqueue_event(LIKE_EVENT, like.id)
+
+    @classmethod
+    def send_comment_notification(cls, comment):
+        cls.enqueue_event(COMMENT_EVENT, comment.id)
+
+    @classmethod
+    def enqueue_event(cls, event_type, object_id):
+        from inbox.tasks import deliver_notifications_task
+        conn = RedisClient.get_connection()
+        conn.rpush(PENDING_NOTIFICATIONS_KEY, json.dumps([event_type, object_id]))
+        # only one delivery is scheduled at a time, the following events of the
+        # burst are picked up by it. the flag expires in case the task is lost.
+        if conn.set(PENDING_NOTIFICATIONS_SCHEDULED_KEY, 1, ex=ONE_MINUTE, nx=True):
+            deliver_notifications_task.apply_async(countdown=NOTIFICATION_DELIVERY_DELAY)
+
+    @classmethod
+    def deliver_pending_notifications(cls):
+        from inbox.tasks import deliver_notifications_task
+        conn = RedisClient.get_connection()
+        # one delivery drains at a time, otherwise two of them could both miss
+        # an aggregation in _get_unread_aggregations and insert it twice
+        token = uuid.uuid4().hex
+        if not conn.set(PENDING_NOTIFICATIONS_LOCK_KEY, token, ex=NOTIFICATION_DELIVERY_LOCK_TIMEOUT, nx=True):
+            deliver_notifications_task.apply_async(countdown=NOTIFICATION_DELIVERY_DELAY)
+            return 0
+        try:
+            return cls._drain_pending_notifications(conn)
+        finally:
+            RedisHelper.delete_if_equals(PENDING_NOTIFICATIONS_LOCK_KEY, token)
+
+    @classmethod
+    def _drain_pending_notifications(cls, conn):
+        from inbox.tasks import deliver_notifications_task
+        # cleared before draining, so that an event queued after the last
+        # batch schedules a new delivery
+        conn.delete(PENDING_NOTIFICATIONS_SCHEDULED_KEY)
+        deadline = time.time() + NOTIFICATION_DELIVERY_LOCK_TIMEOUT / 2
+        delivered = 0
+        while True:
+            if time.time() > deadline:
+                # the rest is left to the next delivery, before the lock expires
+                deliver_notifications_task.apply_async(countdown=NOTIFICATION_DELIVERY_DELAY)
+                return delivered
+            pipeline = conn.pipeline()
+            pipeline.lrange(PENDING_NOTIFICATIONS_KEY, 0, NOTIFICATION_DELIVERY_BATCH_SIZE - 1)
+            pipeline.ltrim(PENDING_NOTIFICATIONS_KEY, NOTIFICATION_DELIVERY_BATCH_SIZE, -1)
+            events, _ = pipeline.execute()
+            if not events:
+                return delivered
+            events = [json.loads(event) for event in events]
+            delivered += cls.create_notifications(events)
+
+    @classmethod
+    def create_notifications(cls, events):
+        like_ids = [object_id for event_type, object_id in events if event_type == LIKE_EVENT]
+        comment_ids = [object_id for event_type, object_id in events if event_type == COMMENT_EVENT]
+        notifications = cls._build_like_notifications(like_ids)
+        notifications += cls._build_comment_notifications(comment_ids)
+        created_notifications = cls.upsert_notifications(notifications)
+        unread_counts = Counter(notification.recipient_id for notification in created_notifications)
+        cls.incr_unread_counts(unread_counts)
+        return len(notifications)
+
+    @classmethod
+    def upsert_notifications(cls, notifications):
+        """
+        collapse the notifications of the same (recipient, verb, target) inside
+        one time bucket into a single row. data of the row holds the bucket, the
+        number of actors and the ids of the latest few of them. a notification
+        is merged into an unread row of its bucket if there is one, otherwise it
+        is inserted. returns the inserted rows.
+
+        the collapsed row moves up to the timestamp of its latest actor. a
+        client scrolling down past it with a timestamp cursor does not see it
+        again, it shows up as a new row on the next refresh (after) instead.
+        deliveries hold PENDING_NOTIFICATIONS_LOCK_KEY, so upserts never run
+        concurrently.
+        """
+        if not notifications:
+            return []
+        aggregations = cls._get_unread_aggregations(notifications)
+        created_notifications, updated_notifications = [], {}
+        previous_timestamps = {}
+        for notification in sorted(notifications, key=lambda n: n.timestamp):
+            key = cls._get_aggregation_key(notification, cls._get_bucket(notification.timestamp))
+            aggregation = aggregations.get(key)
+            if aggregation is None:
+                notification.data = {
+                    'bucket': key[-1],
+                    'actor_count': 1,
+                    'sample_actor_ids': [int(notification.actor_object_id)],
+                }
+                aggregations[key] = notification
+                created_notifications.append(notification)
+                continue
+            if aggregation.id is not None and aggregation.id not in updated_notifications:
+                previous_timestamps[aggregation.id] = aggregation.timestamp
+                updated_notifications[aggregation.id] = aggregation
+            cls._add_actor(aggregation, notification)
+
+        dual_write = cls.is_dual_write_on()
+        if dual_write:
+            last_id = Notification.objects.order_by('-id').values_list('id', flat=True).first()
+        created_notifications = Notification.objects.bulk_create(created_notifications)
+        updated_notifications = list(updated_notifications.values())
+        Notification.objects.bulk_update(updated_notifications, ['actor_object_id', 'timestamp', 'data'])
+
+        if dual_write:
+            # dual write, the hbase row of a collapsed notification moves to
+            # its new timestamp
+            cls._load_ids(created_notifications, last_id or 0)
+            HBaseNotification.batch_delete([
+                {
+                    'recipient_id': notification.recipient_id,
+                    'created_at': to_timestamp(previous_timestamps[notification.id]),
+                    'notification_id': notification.id,
+                }
+                for notification in updated_notifications
+                if previous_timestamps[notification.id] != notification.timestamp
+            ])
+            cls.save_to_hbase(created_notifications + updated_notifications)
+        return created_notifications
+
+    # writes go to hbase as soon as switch_notification_dual_write is on, the
+    # list only reads hbase with switch_notification_to_hbase, which is turned
+    # on after backfill_hbase
+    @classmethod
+    def is_dual_write_on(cls):
+        return GateKeeper.is_switch_on('switch_notification_dual_write') or \
+            GateKeeper.is_switch_on('switch_notification_to_hbase')
+
+    @classmethod
+    def save_to_hbase(cls, notifications):
+        if not cls.is_dual_write_on():
             return
-        if like.content_type == ContentType.objects.get_for_model(Tweet):
-            notify.send(
-                like.user,
-                recipient=target.user,
-                verb='liked your tweet',
-                target=target,
-            )
-        if like.content_type == ContentType.objects.get_for_model(Comment):
-            notify.send(
-                like.user,
-                recipient=target.user,
-                verb='liked your comment',
-                target=target,
+        HBaseNotification.batch_create([
+            HBaseNotification.get_params(notification)
+            for notification in notifications
+        ])
+
+    @classmethod
+    def backfill_hbase(cls, batch_size):
+        """
+        copies the mysql notifications younger than the hbase ttl to hbase,
+        then drops the hbase rows which are not in mysql anymore (moved while
+        the dual write was off) and rewrites the outdated ones. run it with
+        switch_notification_dual_write on, before switch_notification_to_hbase.
+        returns (copied, deleted).
+        """
+        oldest = timezone.now() - timedelta(seconds=HBaseNotification.Meta.ttl)
+        copied, last_id = 0, 0
+        while True:
+            notifications = list(
+                Notification.objects
+                .filter(id__gt=last_id, timestamp__gte=oldest)
+                .order_by('id')[:batch_size]
             )
+            if not notifications:
+                break
+            cls.save_to_hbase(notifications)
+            copied += len(notifications)
+            last_id = notifications[-1].id
+
+        deleted, start = 0, None
+        while True:
+            # the scan starts at the last row of the previous batch, inclusive
+            rows = HBaseNotification.filter(start=start, limit=batch_size + 1)
+            if start is not None:
+                rows = rows[1:]
+            if not rows:
+                break
+            notifications = Notification.objects.in_bulk([row.notification_id for row in rows])
+            ghosts, outdated = [], []
+            for row in rows:
+                notification = notifications.get(row.notification_id)
+                if notification is None or to_timestamp(notification.timestamp) != row.created_at:
+                    ghosts.append(row)
+                    continue
+                params = HBaseNotification.get_params(notification)
+                # written by the first pass before a concurrent update
+                if any(str(getattr(row, key)) != str(value) for key, value in params.items()):
+                    outdated.append(notification)
+            HBaseNotification.batch_delete([
+                {
+                    'recipient_id': row.recipient_id,
+                    'created_at': row.created_at,
+                    'notification_id': row.notification_id,
+                }
+                for row in ghosts
+            ])
+            cls.save_to_hbase(outdated)
+            deleted += len(ghosts)
+            last_row = rows[-1]
+            start = (last_row.recipient_id, last_row.created_at, last_row.notification_id)
+        return copied, deleted
 
     @classmethod
-    def send_comment_notification(cls, comment):
-        if comment.user == comment.tweet.user:
+    def _load_ids(cls, notifications, last_id):
+        # bulk_create does not set the ids on mysql. the rows inserted after
+        # last_id are matched back by their aggregation key and timestamp,
+        # which are unique inside one upsert
+        notifications = [notification for notification in notifications if notification.id is None]
+        if not notifications:
             return
-        notify.send(
-            comment.user,
-            recipient=comment.tweet.user,
-            verb='commented on your tweet',
-            target=comment.tweet,
-        )
\ No newline at end of file
+        rows = Notification.objects.filter(
+            id__gt=last_id,
+            recipient_id__in={notification.recipient_id for notification in notifications},
+            timestamp__in={notification.timestamp for notification in notifications},
+        )
+        ids = {
+            (cls._get_aggregation_key(row, None), row.timestamp): row.id
+            for row in rows
+        }
+        for notification in notifications:
+            notification.id = ids.get((cls._get_aggregation_key(notification, None), notification.timestamp))
+
+    @classmethod
+    def _get_bucket(cls, timestamp):
+        return to_timestamp(timestamp) // NOTIFICATION_AGGREGATION_BUCKET
+
+    @classmethod
+    def _get_aggregation_key(cls, notification, bucket):
+        return (
+            notification.recipient_id,
+            notification.verb,
+            notification.target_content_type_id,
+            str(notification.target_object_id),
+            bucket,
+        )
+
+    @classmethod
+    def _get_unread_aggregations(cls, notifications):
+        # rows can only be merged into inside their bucket, so the oldest
+        # bucket bounds the scan of the (recipient, unread) index
+        oldest_bucket = min(cls._get_bucket(n.timestamp) for n in notifications)
+        rows = Notification.objects.filter(
+            recipient_id__in={n.recipient_id for n in notifications},
+            unread=True,
+            target_object_id__in={str(n.target_object_id) for n in notifications},
+            timestamp__gte=timestamp_to_datetime(oldest_bucket * NOTIFICATION_AGGREGATION_BUCKET),
+        )
+        watermarks = cls.get_read_watermarks(list({n.recipient_id for n in notifications}))
+        aggregations = {}
+        for row in rows:
+            # rows created before the aggregation have no bucket
+            if not row.data or 'bucket' not in row.data:
+                continue
+            if not cls.is_unread(row, watermarks.get(row.recipient_id)):
+                continue
+            aggregations.setdefault(cls._get_aggregation_key(row, row.data['bucket']), row)
+        return aggregations
+
+    @classmethod
+    def _add_actor(cls, aggregation, notification):
+        actor_id = int(notification.actor_object_id)
+        sample_actor_ids = aggregation.data['sample_actor_ids']
+        if actor_id in sample_actor_ids:
+            sample_actor_ids.remove(actor_id)
+        else:
+            aggregation.data['actor_count'] += 1
+        aggregation.data['sample_actor_ids'] = [actor_id] + sample_actor_ids[:NOTIFICATION_SAMPLE_ACTORS_SIZE - 1]
+        # the row shows up as the latest of its actors
+        aggregation.actor_object_id = notification.actor_object_id
+        aggregation.timestamp = max(aggregation.timestamp, notification.timestamp)
+
+    @classmethod
+    def get_targets_map(cls, notifications):
+        # {(content_type_id, object_id): target}, deleted targets are left out
+        object_ids = defaultdict(list)
+        for notification in notifications:
+            if notification.target_content_type_id is None:
+                continue
+            object_ids[notification.target_content_type_id].append(int(notification.target_object_id))
+        targets = {}
+        for content_type_id, ids in object_ids.items():
+            model_class = ContentType.objects.get_for_id(content_type_id).model_class()
+            for object_id, target in MemcachedHelper.get_objects_through_cache(model_class, ids).items():
+                targets[(content_type_id, object_id)] = target
+        return targets
+
+    @classmethod
+    def get_read_watermarks(cls, user_ids):
+        # {user_id: watermark} of the users whose mark-all-as-read is pending
+        if not user_ids:
+            return {}
+        keys = [NOTIFICATIONS_READ_WATERMARK_PATTERN.format(user_id=user_id) for user_id in user_ids]
+        watermarks = RedisClient.get_connection().mget(keys)
+        return {
+            user_id: int(watermark)
+            for user_id, watermark in zip(user_ids, watermarks)
+            if watermark is not None
+        }
+
+    @classmethod
+    def get_read_watermark(cls, user_id):
+        return cls.get_read_watermarks([user_id]).get(user_id)
+
+    @classmethod
+    def get_unread_condition(cls, user_id, watermark):
+        # rows up to the watermark are read even if not updated yet
+        condition = Q(recipient_id=user_id, unread=True)
+        if watermark is not None:
+            condition &= Q(id__gt=watermark)
+        return condition
+
+    @classmethod
+    def is_unread(cls, notification, watermark):
+        return notification.unread and (watermark is None or notification.id > watermark)
+
+    @classmethod
+    def filter_by_unread(cls, queryset, user_id, unread):
+        condition = cls.get_unread_condition(user_id, cls.get_read_watermark(user_id))
+        if unread:
+            return queryset.filter(condition)
+        return queryset.exclude(condition)
+
+    @classmethod
+    def mark_all_as_read(cls, user_id):
+        """
+        notifications up to the latest id are read from now on, the watermark
+        is set and the counter reset right away while the rows are updated in
+        chunks by mark_all_as_read_task. returns the number of unread ones.
+        """
+        from inbox.tasks import mark_all_as_read_task
+        marked_count = cls.get_unread_count(user_id)
+        # the latest id of the whole table, read from the primary key
+        watermark = Notification.objects.order_by('-id').values_list('id', flat=True).first()
+        if watermark is None:
+            return 0
+        pipeline = RedisClient.get_connection().pipeline()
+        pipeline.set(
+            NOTIFICATIONS_READ_WATERMARK_PATTERN.format(user_id=user_id),
+            watermark,
+            ex=settings.REDIS_KEY_EXPIRE_TIME,
+        )
+        pipeline.set(
+            UNREAD_NOTIFICATIONS_PATTERN.format(user_id=user_id),
+            0,
+            ex=settings.REDIS_KEY_EXPIRE_TIME,
+        )
+        pipeline.execute()
+        mark_all_as_read_task.delay(user_id, watermark)
+        return marked_count
+
+    @classmethod
+    def mark_as_read_until(cls, user_id, watermark, batch_size):
+        marked = 0
+        while True:
+            notification_ids = list(
+                Notification.objects
+                .filter(recipient_id=user_id, unread=True, id__lte=watermark)
+                .order_by('id')
+                .values_list('id', flat=True)[:batch_size]
+            )
+            if not notification_ids:
+                break
+            marked += Notification.objects.filter(id__in=notification_ids).update(unread=False)
+            if cls.is_dual_write_on():
+                cls.save_to_hbase(list(Notification.objects.filter(id__in=notification_ids)))
+        # a later mark-all-as-read has set its own watermark, left to its task
+        RedisHelper.delete_if_equals(
+            NOTIFICATIONS_READ_WATERMARK_PATTERN.format(user_id=user_id),
+            watermark,
+        )
+        return marked
+
+    @classmethod
+    def get_unread_count(cls, user_id):
+        conn = RedisClient.get_connection()
+        key = UNREAD_NOTIFICATIONS_PATTERN.format(user_id=user_id)
+        count = conn.get(key)
+        if count is not None:
+            return int(count)
+        watermark = cls.get_read_watermark(user_id)
+        count = Notification.objects.filter(cls.get_unread_condition(user_id, watermark)).count()
+        conn.set(key, count, ex=settings.REDIS_KEY_EXPIRE_TIME, nx=True)
+        return count
+
+    @classmethod
+    def incr_unread_counts(cls, user_id_to_amount):
+        RedisHelper.incr_if_exists({
+            UNREAD_NOTIFICATIONS_PATTERN.format(user_id=user_id): amount
+            for user_id, amount in user_id_to_amount.items()
+        })
+
+    @classmethod
+    def reconcile_unread_counts(cls, batch_size):
+        """
+        recount the cached unread counters from db, in case an increment was
+        lost. only the cached counters are rewritten, the others are rebuilt
+        on next read anyway.
+        """
+        conn = RedisClient.get_connection()
+        pattern = UNREAD_NOTIFICATIONS_PATTERN.format(user_id='*')
+        reconciled = 0
+        user_ids = []
+        for key in conn.scan_iter(match=pattern, count=batch_size):
+            user_ids.append(int(key.split(b':')[-1]))
+            if len(user_ids) == batch_size:
+                reconciled += cls._reconcile_unread_counts_batch(user_ids)
+                user_ids = []
+        if user_ids:
+            reconciled += cls._reconcile_unread_counts_batch(user_ids)
+        return reconciled
+
+    @classmethod
+    def _reconcile_unread_counts_batch(cls, user_ids):
+        watermarks = cls.get_read_watermarks(user_ids)
+        condition = Q(
+            recipient_id__in=[user_id for user_id in user_ids if user_id not in watermarks],
+            unread=True,
+        )
+        for user_id, watermark in watermarks.items():
+            condition |= cls.get_unread_condition(user_id, watermark)
+        counts = dict(
+            Notification.objects.filter(condition)
+            .values('recipient_id')
+            .annotate(unread_count=Count('id'))
+            .order_by()
+            .values_list('recipient_id', 'unread_count')
+        )
+        pipeline = RedisClient.get_connection().pipeline(transaction=False)
+        for user_id in user_ids:
+            key = UNREAD_NOTIFICATIONS_PATTERN.format(user_id=user_id)
+            pipeline.set(key, counts.get(user_id, 0), ex=settings.REDIS_KEY_EXPIRE_TIME, xx=True)
+        pipeline.execute()
+        return len(user_ids)
+
+    @classmethod
+    def _build_notification(cls, actor_id, recipient_id, verb, target_content_type_id, target_id, timestamp):
+        return Notification(
+            recipient_id=recipient_id,
+            actor_content_type_id=ContentType.objects.get_for_model(User).id,
+            actor_object_id=actor_id,
+            verb=verb,
+            target_content_type_id=target_content_type_id,
+            target_object_id=target_id,
+            timestamp=timestamp,
+        )
+
+    @classmethod
+    def _build_like_notifications(cls, like_ids):
+        # likes canceled before the delivery are gone and not notified
+        likes = list(Like.objects.filter(id__in=like_ids))
+        verbs = {
+            ContentType.objects.get_for_model(Tweet).id: 'liked your tweet',
+            ContentType.objects.get_for_model(Comment).id: 'liked your comment',
+        }
+        owner_ids = {}
+        for model_class in [Tweet, Comment]:
+            content_type = ContentType.objects.get_for_model(model_class)
+            object_ids = [like.object_id for like in likes if like.content_type_id == content_type.id]
+            if not object_ids:
+                continue
+            for row in model_class.objects.filter(id__in=object_ids).values('id', 'user_id'):
+                owner_ids[(content_type.id, row['id'])] = row['user_id']
+
+        notifications = []
+        for like in likes:
+            owner_id = owner_ids.get((like.content_type_id, like.object_id))
+            if owner_id is None or owner_id == like.user_id:
+                continue
+            notifications.append(cls._build_notification(
+                actor_id=like.user_id,
+                recipient_id=owner_id,
+                verb=verbs[like.content_type_id],
+                target_content_type_id=like.content_type_id,
+                target_id=like.object_id,
+                timestamp=like.created_at,
+            ))
+        return notifications
+
+    @classmethod
+    def _build_comment_notifications(cls, comment_ids):
+        if not comment_ids:
+            return []
+        tweet_content_type_id = ContentType.objects.get_for_model(Tweet).id
+        rows = Comment.objects.filter(id__in=comment_ids)\
+            .values('user_id', 'tweet_id', 'tweet__user_id', 'created_at')
+        notifications = []
+        for row in rows:
+            if row['tweet__user_id'] is None or row['user_id'] == row['tweet__user_id']:
+                continue
+            notifications.append(cls._build_notification(
+                actor_id=row['user_id'],
+                recipient_id=row['tweet__user_id'],
+                verb='commented on your tweet',
+                target_content_type_id=tweet_content_type_id,
+                target_id=row['tweet_id'],
+                timestamp=row['created_at'],
+            ))
+        return notifications
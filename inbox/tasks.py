@@ -0,0 +1,25 @@
+from celery import shared_task
+from inbox.constants import MARK_ALL_AS_READ_BATCH_SIZE, RECONCILE_UNREAD_COUNTS_BATCH_SIZE
+from utils.time_constants import ONE_HOUR
+
+
+@shared_task(time_limit=ONE_HOUR)
+def deliver_notifications_task():
+    from inbox.services import NotificationService
+    delivered = NotificationService.deliver_pending_notifications()
+    return '{} notifications delivered.'.format(delivered)
+
+
+@shared_task(time_limit=ONE_HOUR)
+def reconcile_unread_counts_task():
+    # run by celery beat, see CELERY_BEAT_SCHEDULE
+    from inbox.services import NotificationService
+    reconciled = NotificationService.reconcile_unread_counts(RECONCILE_UNREAD_COUNTS_BATCH_SIZE)
+    return '{} unread counts reconciled.'.format(reconciled)
+
+
+@shared_task(time_limit=ONE_HOUR)
+def mark_all_as_read_task(user_id, watermark):
+    from inbox.services import NotificationService
+    marked = NotificationService.mark_as_read_until(user_id, watermark, MARK_ALL_AS_READ_BATCH_SIZE)
+    return '{} notifications marked as read.'.format(marked)
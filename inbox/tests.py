@@ -1,6 +1,14 @@
 from notifications.models import Notification
 from inbox.services import NotificationService
+from inbox.tasks import deliver_notifications_task, mark_all_as_read_task
 from testing.testcases import TestCase
+from twitter.cache import (
+    NOTIFICATIONS_READ_WATERMARK_PATTERN,
+    PENDING_NOTIFICATIONS_LOCK_KEY,
+    PENDING_NOTIFICATIONS_SCHEDULED_KEY,
+    UNREAD_NOTIFICATIONS_PATTERN,
+)
+from utils.redis_client import RedisClient
 
 class NotificationServiceTests(TestCase):
 
@@ -36,4 +44,102 @@ class NotificationServiceTests(TestCase):
         comment = self.create_comment(self.fiona, self.marcus_tweet)
         like = self.create_like(self.marcus, comment)
         NotificationService.send_like_notification(like)
-        self.assertEqual(Notification.objects.count(), 2)
\ No newline at end of file
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_deliver_notifications_in_batch(self):
+        RedisClient.clear()
+        # a delivery is already scheduled, new events wait for it
+        RedisClient.get_connection().set(PENDING_NOTIFICATIONS_SCHEDULED_KEY, 1)
+        users = [self.create_user('user{}'.format(i)) for i in range(4)]
+        for user in users:
+            NotificationService.send_like_notification(self.create_like(user, self.marcus_tweet))
+        comment = self.create_comment(self.fiona, self.marcus_tweet)
+        NotificationService.send_comment_notification(comment)
+        # canceled before the delivery, nothing to notify
+        like = self.create_like(self.create_user('bruno'), self.marcus_tweet)
+        NotificationService.send_like_notification(like)
+        like.delete()
+        self.assertEqual(Notification.objects.count(), 0)
+
+        self.assertEqual(deliver_notifications_task(), '5 notifications delivered.')
+        # the lock is released once the queue is drained
+        self.assertEqual(RedisClient.get_connection().exists(PENDING_NOTIFICATIONS_LOCK_KEY), 0)
+        # the likes of the tweet are collapsed into one notification
+        self.assertEqual(Notification.objects.count(), 2)
+        notification = self.marcus.notifications.get(verb='liked your tweet')
+        self.assertEqual(notification.data['actor_count'], 4)
+        self.assertEqual(notification.actor_object_id, str(users[-1].id))
+        # the queue is drained and the next event schedules a new delivery
+        NotificationService.send_like_notification(self.create_like(self.fiona, self.marcus_tweet))
+        notification.refresh_from_db()
+        self.assertEqual(notification.data['actor_count'], 5)
+        self.assertEqual(Notification.objects.count(), 2)
+
+    def test_aggregate_notifications(self):
+        RedisClient.clear()
+        users = [self.create_user('user{}'.format(i)) for i in range(4)]
+        for user in users:
+            NotificationService.send_like_notification(self.create_like(user, self.marcus_tweet))
+        self.assertEqual(Notification.objects.count(), 1)
+        notification = self.marcus.notifications.first()
+        self.assertEqual(notification.data['actor_count'], 4)
+        self.assertEqual(
+            notification.data['sample_actor_ids'],
+            [users[3].id, users[2].id, users[1].id],
+        )
+        self.assertEqual(NotificationService.get_unread_count(self.marcus.id), 1)
+
+        # another target or another verb is not collapsed
+        fiona_tweet = self.create_tweet(self.fiona)
+        NotificationService.send_like_notification(self.create_like(self.marcus, fiona_tweet))
+        comment = self.create_comment(self.fiona, self.marcus_tweet)
+        NotificationService.send_comment_notification(comment)
+        self.assertEqual(Notification.objects.count(), 3)
+
+        # a read notification is not reopened, a new one is created
+        notification.unread = False
+        notification.save()
+        NotificationService.send_like_notification(self.create_like(self.fiona, self.marcus_tweet))
+        self.assertEqual(Notification.objects.count(), 4)
+        notification.refresh_from_db()
+        self.assertEqual(notification.data['actor_count'], 4)
+
+        # neither is a notification of an older bucket
+        notification = self.marcus.notifications.filter(unread=True, verb='liked your tweet').first()
+        notification.data['bucket'] -= 1
+        notification.save()
+        like = self.create_like(self.create_user('bruno'), self.marcus_tweet)
+        NotificationService.send_like_notification(like)
+        self.assertEqual(Notification.objects.count(), 5)
+
+    def test_mark_all_as_read_with_watermark(self):
+        RedisClient.clear()
+        tweets = [self.create_tweet(self.marcus) for _ in range(4)]
+        for tweet in tweets:
+            NotificationService.send_like_notification(self.create_like(self.fiona, tweet))
+        notifications = list(self.marcus.notifications.order_by('id'))
+        self.assertEqual(NotificationService.get_unread_count(self.marcus.id), 4)
+
+        # the rows up to the watermark are read before they are updated
+        watermark = notifications[2].id
+        key = NOTIFICATIONS_READ_WATERMARK_PATTERN.format(user_id=self.marcus.id)
+        RedisClient.get_connection().set(key, watermark)
+        RedisClient.get_connection().delete(UNREAD_NOTIFICATIONS_PATTERN.format(user_id=self.marcus.id))
+        self.assertEqual(NotificationService.get_unread_count(self.marcus.id), 1)
+        self.assertEqual(Notification.objects.filter(unread=True).count(), 4)
+        queryset = NotificationService.filter_by_unread(Notification.objects.all(), self.marcus.id, True)
+        self.assertEqual(list(queryset), [notifications[3]])
+        # and no longer collapse the following notifications
+        NotificationService.send_like_notification(self.create_like(self.create_user('bruno'), tweets[0]))
+        self.assertEqual(self.marcus.notifications.count(), 5)
+
+        # the task updates the rows in chunks and drops the watermark
+        self.assertEqual(mark_all_as_read_task(self.marcus.id, watermark), '3 notifications marked as read.')
+        self.assertEqual(Notification.objects.filter(unread=True).count(), 2)
+        self.assertEqual(RedisClient.get_connection().get(key), None)
+        self.assertEqual(NotificationService.get_unread_count(self.marcus.id), 2)
+
+        # a newer watermark is not dropped by an older task
+        RedisClient.get_connection().set(key, watermark + 10)
+        mark_all_as_read_task(self.marcus.id, watermark)
+        self.assertEqual(RedisClient.get_connection().get(key), str(watermark + 10).encode())
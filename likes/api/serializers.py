@@ -1,19 +1,32 @@
 from accounts.api.serializers import UserSerializerForLike
 from comments.models import Comment
+from datetime import datetime
 from django.contrib.contenttypes.models import ContentType
 from likes.models import Like
+from likes.services import LikeService
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
 from tweets.models import Tweet
+from utils.memcached_helper import MemcachedHelper
+from utils.time_helpers import timestamp_to_datetime
 
 
 class LikeSerializer(serializers.ModelSerializer):
-    user = UserSerializerForLike(source='cached_user')
+    user = UserSerializerForLike(source='user_id')
+    created_at = serializers.SerializerMethodField()
 
     class Meta:
         model = Like
         fields = ('user', 'created_at',)
 
+    def get_created_at(self, obj):
+        # hbase likes keep created_at as a timestamp, both stores are rendered
+        # the same way so flipping switch_like_to_hbase is invisible to clients
+        created_at = obj.created_at
+        if not isinstance(created_at, datetime):
+            created_at = timestamp_to_datetime(created_at)
+        return serializers.DateTimeField().to_representation(created_at)
+
 
 class BaseLikeSerializerForCreateOrCancel(serializers.ModelSerializer):
     content_type = serializers.ChoiceField(choices=['tweet', 'comment'])
@@ -36,31 +49,43 @@ class BaseLikeSerializerForCreateOrCancel(serializers.ModelSerializer):
             raise ValidationError({
                 'content_type': 'Content type does not exist.'
             })
-        liked_object = model_class.objects.filter(id=data['object_id']).first()
+        liked_object = MemcachedHelper.get_object_or_none_through_cache(
+            model_class,
+            data['object_id'],
+        )
         if liked_object is None:
             raise ValidationError({'object_id': 'Object does not exist.'})
         return data
 
 
+class LikeSerializerForList(BaseLikeSerializerForCreateOrCancel):
+
+    def get_target(self):
+        # (content_type, object_id) of the liked object
+        model_class = self._get_model_class(self.validated_data)
+        return (
+            ContentType.objects.get_for_model(model_class),
+            self.validated_data['object_id'],
+        )
+
+
 class LikeSerializerForCreate(BaseLikeSerializerForCreateOrCancel):
 
     def get_or_create(self):
         validated_data = self.validated_data
-        model_class = self._get_model_class(validated_data)
-        return Like.objects.get_or_create(
-            content_type=ContentType.objects.get_for_model(model_class),
+        return LikeService.get_or_create(
+            user_id=self.context['request'].user.id,
+            model_class=self._get_model_class(validated_data),
             object_id=validated_data['object_id'],
-            user=self.context['request'].user,
         )
 
 
 class LikeSerializerForCancel(BaseLikeSerializerForCreateOrCancel):
 
     def cancel(self):
-        model_class = self._get_model_class(self.validated_data)
-        deleted, _ = Like.objects.filter(
-            content_type=ContentType.objects.get_for_model(model_class),
-            object_id=self.validated_data['object_id'],
-            user=self.context['request'].user,
-        ).delete()
-        return deleted
\ No newline at end of file
+        validated_data = self.validated_data
+        return LikeService.cancel(
+            user_id=self.context['request'].user.id,
+            model_class=self._get_model_class(validated_data),
+            object_id=validated_data['object_id'],
+        )
\ No newline at end of file
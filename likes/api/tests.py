@@ -1,4 +1,15 @@
+from django.contrib.auth.models import AnonymousUser
+from django.contrib.contenttypes.models import ContentType
+from gatekeeper.models import GateKeeper
+from likes.constants import LIKES_PREVIEW_SIZE
+from likes.models import HBaseLikeByObject, HBaseLikeByUser, Like
+from likes.services import LikeService
 from testing.testcases import TestCase
+from tweets.models import Tweet
+from tweets.tasks import flush_counts_task
+from twitter.cache import TWEET_LIKES_PATTERN
+from utils.paginations import EndlessPagination
+from utils.redis_client import RedisClient
 
 LIKE_BASE_API ='/api/likes/'
 LIKE_CANCEL_API = '/api/likes/cancel/'
@@ -25,9 +36,10 @@ class LikeApiTests(TestCase):
         response = self.anonymous_client.post(LIKE_BASE_API, data)
         self.assertEqual(response.status_code, 403)
 
-        # get is not allowed
+        # get lists the likes instead of creating one
         response = self.marcus_client.get(LIKE_BASE_API, data)
-        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
 
         # wrong content_type
         response = self.marcus_client.post(LIKE_BASE_API, {
@@ -65,9 +77,10 @@ class LikeApiTests(TestCase):
         response = self.anonymous_client.post(LIKE_BASE_API, data)
         self.assertEqual(response.status_code, 403)
 
-        # get is not allowed
+        # get lists the likes instead of creating one
         response = self.marcus_client.get(LIKE_BASE_API, data)
-        self.assertEqual(response.status_code, 405)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['results'], [])
 
         # wrong content_type
         response = self.marcus_client.post(LIKE_BASE_API, {
@@ -164,19 +177,19 @@ class LikeApiTests(TestCase):
         # test it without login
         response = self.anonymous_client.get(COMMENT_LIST_API, {'tweet_id': tweet.id})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['comments'][0]['has_liked'], False)
-        self.assertEqual(response.data['comments'][0]['likes_count'], 0)
+        self.assertEqual(response.data['results'][0]['has_liked'], False)
+        self.assertEqual(response.data['results'][0]['likes_count'], 0)
 
         # test comments list api with login
         response = self.fiona_client.get(COMMENT_LIST_API, {'tweet_id': tweet.id})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['comments'][0]['has_liked'], False)
-        self.assertEqual(response.data['comments'][0]['likes_count'], 0)
+        self.assertEqual(response.data['results'][0]['has_liked'], False)
+        self.assertEqual(response.data['results'][0]['likes_count'], 0)
         self.create_like(self.fiona, comment)
         response = self.fiona_client.get(COMMENT_LIST_API, {'tweet_id': tweet.id})
         self.assertEqual(response.status_code, 200)
-        self.assertEqual(response.data['comments'][0]['has_liked'], True)
-        self.assertEqual(response.data['comments'][0]['likes_count'], 1)
+        self.assertEqual(response.data['results'][0]['has_liked'], True)
+        self.assertEqual(response.data['results'][0]['likes_count'], 1)
 
         # test tweet detail api
         self.create_like(self.marcus, comment)
@@ -230,12 +243,17 @@ class LikeApiTests(TestCase):
             # check tweet api
             response = client.get(tweet_url)
             self.assertEqual(response.data['likes_count'], i + 1)
+            flush_counts_task()
             tweet.refresh_from_db()
             self.assertEqual(tweet.likes_count, i + 1)
 
         self.fiona_client.post(LIKE_BASE_API, data)
         response = self.fiona_client.get(tweet_url)
         self.assertEqual(response.data['likes_count'], 4)
+        # the database is only updated when the counts are flushed
+        tweet.refresh_from_db()
+        self.assertEqual(tweet.likes_count, 3)
+        flush_counts_task()
         tweet.refresh_from_db()
         self.assertEqual(tweet.likes_count, 4)
 
@@ -248,6 +266,7 @@ class LikeApiTests(TestCase):
 
         # fiona canceled the likes
         self.fiona_client.post(LIKE_CANCEL_API, data)
+        flush_counts_task()
         tweet.refresh_from_db()
         self.assertEqual(tweet.likes_count, 3)
         response = self.marcus_client.get(tweet_url)
@@ -255,4 +274,170 @@ class LikeApiTests(TestCase):
         response = self.fiona_client.get(newsfeed_url)
         self.assertEqual(response.data['results'][0]['tweet']['likes_count'], 3)
         response = self.marcus_client.get(newsfeed_url)
-        self.assertEqual(response.data['results'][0]['tweet']['likes_count'], 3)
\ No newline at end of file
+        self.assertEqual(response.data['results'][0]['tweet']['likes_count'], 3)
+
+    def test_has_liked_many(self):
+        tweets = [self.create_tweet(self.marcus) for _ in range(3)]
+        comment = self.create_comment(self.marcus, tweets[0])
+        self.create_like(self.fiona, tweets[1])
+        self.create_like(self.fiona, comment)
+
+        # one query per model instead of one per object
+        with self.assertNumQueries(2):
+            liked_map = LikeService.has_liked_many(self.fiona, tweets + [comment])
+        self.assertEqual(
+            [liked_map[tweet] for tweet in tweets],
+            [False, True, False],
+        )
+        self.assertEqual(liked_map[comment], True)
+        # any instance of the same row can be used to look up the map
+        self.assertEqual(liked_map[Tweet(id=tweets[1].id)], True)
+
+        with self.assertNumQueries(0):
+            liked_map = LikeService.has_liked_many(AnonymousUser(), tweets)
+        self.assertEqual(set(liked_map.values()), {False})
+
+    def test_list_likes(self):
+        page_size = EndlessPagination.page_size
+        tweet = self.create_tweet(self.marcus)
+        users = [self.create_user('user{}'.format(i)) for i in range(page_size + 2)]
+        for user in users:
+            self.create_like(user, tweet)
+        users = users[::-1]
+
+        # missing or wrong params
+        response = self.anonymous_client.get(LIKE_BASE_API, {'content_type': 'tweet'})
+        self.assertEqual(response.status_code, 400)
+        response = self.anonymous_client.get(LIKE_BASE_API, {
+            'content_type': 'tweet',
+            'object_id': -1,
+        })
+        self.assertEqual(response.status_code, 400)
+
+        response = self.anonymous_client.get(LIKE_BASE_API, {
+            'content_type': 'tweet',
+            'object_id': tweet.id,
+        })
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['has_next_page'], True)
+        self.assertEqual(
+            [like['user']['id'] for like in response.data['results']],
+            [user.id for user in users[:page_size]],
+        )
+        response = self.anonymous_client.get(LIKE_BASE_API, {
+            'content_type': 'tweet',
+            'object_id': tweet.id,
+            'before': response.data['next_cursor'],
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(
+            [like['user']['id'] for like in response.data['results']],
+            [user.id for user in users[page_size:]],
+        )
+
+        # the tweet detail only embeds the recent likes
+        response = self.anonymous_client.get(TWEET_DETAIL_API.format(tweet.id))
+        self.assertEqual(
+            [like['user']['id'] for like in response.data['likes']],
+            [user.id for user in users[:LIKES_PREVIEW_SIZE]],
+        )
+        # only the previewed likes are cached
+        conn = RedisClient.get_connection()
+        key = TWEET_LIKES_PATTERN.format(tweet_id=tweet.id)
+        self.assertEqual(conn.zcard(key), LIKES_PREVIEW_SIZE)
+
+        # canceled likes leave the preview
+        Like.objects.filter(user=users[0]).delete()
+        response = self.anonymous_client.get(TWEET_DETAIL_API.format(tweet.id))
+        self.assertEqual(
+            [like['user']['id'] for like in response.data['likes']],
+            [user.id for user in users[1:LIKES_PREVIEW_SIZE + 1]],
+        )
+
+    def test_likes_in_hbase(self):
+        GateKeeper.turn_on('switch_like_to_hbase')
+        self.addCleanup(GateKeeper.set_kv, 'switch_like_to_hbase', 'percent', 0)
+        tweet = self.create_tweet(self.marcus)
+        content_type = ContentType.objects.get_for_model(Tweet)
+        data = {'content_type': 'tweet', 'object_id': tweet.id}
+
+        # dual written to mysql and both hbase tables
+        response = self.fiona_client.post(LIKE_BASE_API, data)
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(tweet.like_set.count(), 1)
+        row_key = {
+            'user_id': self.fiona.id,
+            'content_type_id': content_type.id,
+            'object_id': tweet.id,
+        }
+        self.assertNotEqual(HBaseLikeByUser.get(**row_key), None)
+        likes = HBaseLikeByObject.filter(prefix=(tweet.id, content_type.id, None))
+        self.assertEqual([like.user_id for like in likes], [self.fiona.id])
+
+        # reads come from hbase
+        self.create_like(self.marcus, tweet)
+        response = self.anonymous_client.get(LIKE_BASE_API, data)
+        self.assertEqual(
+            [like['user']['id'] for like in response.data['results']],
+            [self.marcus.id, self.fiona.id],
+        )
+        # both stores render the likes the same way
+        self.assertEqual(isinstance(response.data['results'][0]['created_at'], str), True)
+        GateKeeper.set_kv('switch_like_to_hbase', 'percent', 0)
+        mysql_response = self.anonymous_client.get(LIKE_BASE_API, data)
+        GateKeeper.turn_on('switch_like_to_hbase')
+        self.assertEqual(response.data['results'], mysql_response.data['results'])
+        response = self.fiona_client.get(TWEET_DETAIL_API.format(tweet.id))
+        self.assertEqual(response.data['has_liked'], True)
+        liked_map = LikeService.has_liked_many(self.fiona, [tweet, self.create_tweet(self.marcus)])
+        self.assertEqual(sorted(liked_map.values()), [False, True])
+
+        # canceled in both stores
+        response = self.fiona_client.post(LIKE_CANCEL_API, data)
+        self.assertEqual(response.data['deleted'], 1)
+        self.assertEqual(HBaseLikeByUser.get(**row_key), None)
+        likes = HBaseLikeByObject.filter(prefix=(tweet.id, content_type.id, None))
+        self.assertEqual([like.user_id for like in likes], [self.marcus.id])
+        self.assertEqual(LikeService.has_liked(self.fiona, tweet), False)
+
+        # an existing like missing in hbase is repaired by liking it again
+        HBaseLikeByUser.delete(user_id=self.marcus.id, content_type_id=content_type.id, object_id=tweet.id)
+        self.assertEqual(LikeService.has_liked(self.marcus, tweet), False)
+        self.create_like(self.marcus, tweet)
+        self.assertEqual(LikeService.has_liked(self.marcus, tweet), True)
+
+    def test_backfill_likes_to_hbase(self):
+        tweet = self.create_tweet(self.marcus)
+        content_type = ContentType.objects.get_for_model(Tweet)
+        data = {'content_type': 'tweet', 'object_id': tweet.id}
+
+        # liked while hbase was written, canceled after the dual write was off
+        GateKeeper.turn_on('switch_like_dual_write')
+        self.create_like(self.fiona, tweet)
+        GateKeeper.set_kv('switch_like_dual_write', 'percent', 0)
+        self.fiona_client.post(LIKE_CANCEL_API, data)
+        self.assertNotEqual(HBaseLikeByUser.get(
+            user_id=self.fiona.id,
+            content_type_id=content_type.id,
+            object_id=tweet.id,
+        ), None)
+        # liked before the dual write
+        users = [self.create_user('user{}'.format(i)) for i in range(4)]
+        for user in users:
+            self.create_like(user, tweet)
+
+        GateKeeper.turn_on('switch_like_dual_write')
+        self.addCleanup(GateKeeper.set_kv, 'switch_like_dual_write', 'percent', 0)
+        self.assertEqual(LikeService.backfill_hbase(batch_size=3), (4, 1))
+        # running it again changes nothing
+        self.assertEqual(LikeService.backfill_hbase(batch_size=3), (4, 0))
+
+        GateKeeper.turn_on('switch_like_to_hbase')
+        self.addCleanup(GateKeeper.set_kv, 'switch_like_to_hbase', 'percent', 0)
+        response = self.anonymous_client.get(LIKE_BASE_API, data)
+        self.assertEqual(
+            [like['user']['id'] for like in response.data['results']],
+            [user.id for user in users[::-1]],
+        )
+        self.assertEqual(LikeService.has_liked(self.fiona, tweet), False)
+        self.assertEqual(LikeService.has_liked(users[0], tweet), True)
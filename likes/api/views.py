@@ -1,23 +1,59 @@
+from accounts.services import UserService
 from django.utils.decorators import method_decorator
+from gatekeeper.models import GateKeeper
 from inbox.services import NotificationService
 from likes.api.serializers import (
     LikeSerializer,
     LikeSerializerForCreate,
     LikeSerializerForCancel,
+    LikeSerializerForList,
 )
-from likes.models import Like
+from likes.models import HBaseLikeByObject, Like
 from ratelimit.decorators import ratelimit
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.permissions import AllowAny, IsAuthenticated
 from rest_framework.response import Response
 from utils.decorators import required_params
+from utils.paginations import EndlessPagination
 
 
 class LikeViewSet(viewsets.GenericViewSet):
     queryset = Like.objects.all()
-    permission_classes = [IsAuthenticated]
     serializer_class = LikeSerializerForCreate
+    pagination_class = EndlessPagination
+
+    def get_permissions(self):
+        if self.action == 'list':
+            return [AllowAny()]
+        return [IsAuthenticated()]
+
+    @required_params(params=['content_type', 'object_id'])
+    @method_decorator(ratelimit(key='user_or_ip', rate='10/s', method='GET', block=True))
+    def list(self, request, *args, **kwargs):
+        # /api/likes/?content_type=tweet&object_id=1, newest likes first
+        serializer = LikeSerializerForList(data=request.query_params)
+        if not serializer.is_valid():
+            return Response({
+                'message': 'Please check input.',
+                'errors': serializer.errors,
+            }, status=status.HTTP_400_BAD_REQUEST)
+        content_type, object_id = serializer.get_target()
+        if GateKeeper.is_switch_on('switch_like_to_hbase'):
+            page = self.paginator.paginate_hbase(
+                HBaseLikeByObject,
+                (object_id, content_type.id),
+                request,
+            )
+        else:
+            page = self.paginate_queryset(Like.objects.filter(
+                content_type=content_type,
+                object_id=object_id,
+            ))
+        serializer = LikeSerializer(page, many=True, context={
+            'user_summaries_map': UserService.get_user_summaries([like.user_id for like in page]),
+        })
+        return self.get_paginated_response(serializer.data)
 
     @required_params(method='POST', params=['content_type', 'object_id'])
     @method_decorator(ratelimit(key='user', rate='10/s', method='POST', block=True))
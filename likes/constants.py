@@ -0,0 +1,6 @@
+from django.conf import settings
+
+# number of recent likes embedded in the tweet detail, the full list is
+# served by the paginated likes api
+LIKES_PREVIEW_SIZE = 10
+BACKFILL_HBASE_LIKES_BATCH_SIZE = 1000 if not settings.TESTING else 3
@@ -1,29 +1,50 @@
 from utils.redis_helper import RedisHelper
 
 
-def incr_likes_count(sender, instance, created, **kwargs):
+def _get_counted_model_class(instance):
+    from comments.models import Comment
     from tweets.models import Tweet
-    from django.db.models import F
 
+    model_class = instance.content_type.model_class()
+    if model_class not in (Tweet, Comment):
+        return None
+    return model_class
+
+
+def incr_likes_count(sender, instance, created, **kwargs):
     if not created:
         return
 
-    model_class = instance.content_type.model_class()
-    if model_class != Tweet:
+    model_class = _get_counted_model_class(instance)
+    if model_class is None:
         return
 
-    Tweet.objects.filter(id=instance.object_id).update(likes_count=F('likes_count') + 1)
-    tweet = instance.content_object
-    RedisHelper.incr_count(tweet, 'likes_count')
+    # written behind to the database by the flush_counts task
+    RedisHelper.incr_count(model_class(id=instance.object_id), 'likes_count')
 
 def decr_likes_count(sender, instance, **kwargs):
+    model_class = _get_counted_model_class(instance)
+    if model_class is None:
+        return
+
+    RedisHelper.decr_count(model_class(id=instance.object_id), 'likes_count')
+
+
+def push_like_to_cache(sender, instance, created, **kwargs):
     from tweets.models import Tweet
-    from django.db.models import F
 
-    model_class = instance.content_type.model_class()
-    if model_class != Tweet:
+    if not created or instance.content_type.model_class() != Tweet:
+        return
+
+    from likes.services import LikeService
+    LikeService.push_tweet_like_to_cache(instance)
+
+
+def remove_like_from_cache(sender, instance, **kwargs):
+    from tweets.models import Tweet
+
+    if instance.content_type.model_class() != Tweet:
         return
 
-    Tweet.objects.filter(id=instance.object_id).update(likes_count=F('likes_count') - 1)
-    tweet = instance.content_object
-    RedisHelper.decr_count(tweet, 'likes_count')
\ No newline at end of file
+    from likes.services import LikeService
+    LikeService.invalidate_tweet_likes_cache(instance.object_id)
\ No newline at end of file
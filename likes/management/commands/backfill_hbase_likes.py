@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+from likes.constants import BACKFILL_HBASE_LIKES_BATCH_SIZE
+from likes.services import LikeService
+
+
+class Command(BaseCommand):
+    help = 'Copy the mysql likes to hbase, run with switch_like_dual_write on and before switch_like_to_hbase.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=BACKFILL_HBASE_LIKES_BATCH_SIZE)
+
+    def handle(self, *args, **options):
+        copied, deleted = LikeService.backfill_hbase(options['batch_size'])
+        self.stdout.write('{} likes copied to hbase, {} canceled likes deleted.'.format(copied, deleted))
@@ -0,0 +1,2 @@
+from .hbase_like import *
+from .like import *
\ No newline at end of file
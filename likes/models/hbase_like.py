@@ -0,0 +1,50 @@
+from django.contrib.auth.models import User
+from django_hbase import models
+from utils.memcached_helper import MemcachedHelper
+
+
+class HBaseLikeByObject(models.HBaseModel):
+    """
+    row_key: object_id + content_type_id + created_at + user_id
+    row_data: like_id
+    user_id keeps two likes of the same microsecond apart, like_id is the id
+    of the mysql row
+    """
+    # reverse it to avoid hot-cold data
+    object_id = models.IntegerField(reverse=True)
+    content_type_id = models.IntegerField()
+    created_at = models.TimeStampField()
+    user_id = models.IntegerField()
+    like_id = models.IntegerField(column_family='cf')
+
+    class Meta:
+        table_name = 'twitter_likes_by_object'
+        row_key = ('object_id', 'content_type_id', 'created_at', 'user_id')
+
+    def __str__(self):
+        return '{} {} liked {} {}'.format(
+            self.created_at,
+            self.user_id,
+            self.content_type_id,
+            self.object_id,
+        )
+
+    @property
+    def cached_user(self):
+        return MemcachedHelper.get_object_through_cache(User, self.user_id)
+
+
+class HBaseLikeByUser(models.HBaseModel):
+    """
+    row_key: user_id + content_type_id + object_id
+    row_data: created_at
+    one row per user and object, so it also works as the unique constraint
+    """
+    user_id = models.IntegerField(reverse=True)
+    content_type_id = models.IntegerField()
+    object_id = models.IntegerField()
+    created_at = models.TimeStampField(column_family='cf')
+
+    class Meta:
+        table_name = 'twitter_likes_by_user'
+        row_key = ('user_id', 'content_type_id', 'object_id')
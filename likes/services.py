@@ -1,15 +1,246 @@
+from collections import defaultdict
 from django.contrib.contenttypes.models import ContentType
-from likes.models import Like
+from gatekeeper.models import GateKeeper
+from likes.constants import LIKES_PREVIEW_SIZE
+from likes.models import HBaseLikeByObject, HBaseLikeByUser, Like
+from twitter.cache import TWEET_LIKES_PATTERN
+from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
+from utils.time_helpers import to_timestamp
+
+
+def lazy_load_tweet_likes(tweet_id):
+    def _lazy_load(limit):
+        from tweets.models import Tweet
+        return Like.objects.filter(
+            content_type=ContentType.objects.get_for_model(Tweet),
+            object_id=tweet_id,
+        ).order_by('-created_at', '-id')[:limit]
+    return _lazy_load
 
 
 class LikeService(object):
 
+    # writes go to hbase as soon as switch_like_dual_write is on, reads only
+    # move with switch_like_to_hbase, which is turned on after backfill_hbase.
+    # mysql stays the source of truth and is written on every like, even with
+    # the reads on hbase: the likes counts, the tweet likes cache and the like
+    # notifications are all driven by the Like signals and the inbox loads the
+    # Like rows, so dropping the mysql write needs those moved first
+    @classmethod
+    def is_dual_write_on(cls):
+        return GateKeeper.is_switch_on('switch_like_dual_write') or \
+            GateKeeper.is_switch_on('switch_like_to_hbase')
+
+    @classmethod
+    def get_or_create(cls, user_id, model_class, object_id):
+        content_type = ContentType.objects.get_for_model(model_class)
+        instance, created = Like.objects.get_or_create(
+            content_type=content_type,
+            object_id=object_id,
+            user_id=user_id,
+        )
+        if not cls.is_dual_write_on():
+            return instance, created
+
+        # dual write, mysql stays complete while the hbase tables fill up. an
+        # existing like is written again too, the puts are idempotent and it
+        # repairs a like hbase has missed
+        cls.save_to_hbase([instance])
+        return instance, created
+
+    @classmethod
+    def save_to_hbase(cls, likes):
+        like_by_object_data, like_by_user_data = [], []
+        for like in likes:
+            created_at = to_timestamp(like.created_at)
+            like_by_object_data.append({
+                'object_id': like.object_id,
+                'content_type_id': like.content_type_id,
+                'created_at': created_at,
+                'user_id': like.user_id,
+                'like_id': like.id,
+            })
+            like_by_user_data.append({
+                'user_id': like.user_id,
+                'content_type_id': like.content_type_id,
+                'object_id': like.object_id,
+                'created_at': created_at,
+            })
+        HBaseLikeByObject.batch_create(like_by_object_data)
+        HBaseLikeByUser.batch_create(like_by_user_data)
+
+    @classmethod
+    def cancel(cls, user_id, model_class, object_id):
+        content_type = ContentType.objects.get_for_model(model_class)
+        deleted, _ = Like.objects.filter(
+            content_type=content_type,
+            object_id=object_id,
+            user_id=user_id,
+        ).delete()
+        if not cls.is_dual_write_on():
+            return deleted
+
+        instance = HBaseLikeByUser.get(
+            user_id=user_id,
+            content_type_id=content_type.id,
+            object_id=object_id,
+        )
+        if instance is not None:
+            cls.delete_from_hbase([instance])
+        return deleted
+
+    @classmethod
+    def delete_from_hbase(cls, likes_by_user):
+        HBaseLikeByObject.batch_delete([
+            {
+                'object_id': like.object_id,
+                'content_type_id': like.content_type_id,
+                'created_at': like.created_at,
+                'user_id': like.user_id,
+            }
+            for like in likes_by_user
+        ])
+        HBaseLikeByUser.batch_delete([
+            {
+                'user_id': like.user_id,
+                'content_type_id': like.content_type_id,
+                'object_id': like.object_id,
+            }
+            for like in likes_by_user
+        ])
+
+    @classmethod
+    def backfill_hbase(cls, batch_size):
+        """
+        copies the mysql likes to hbase and drops the hbase likes which are
+        not in mysql anymore (canceled while the dual write was off). run it
+        with switch_like_dual_write on, before turning on switch_like_to_hbase.
+        returns (copied, deleted).
+        """
+        copied, last_id = 0, 0
+        while True:
+            likes = list(Like.objects.filter(id__gt=last_id).order_by('id')[:batch_size])
+            if not likes:
+                break
+            cls.save_to_hbase(likes)
+            copied += len(likes)
+            last_id = likes[-1].id
+
+        deleted, start = 0, None
+        while True:
+            # the scan starts at the last row of the previous batch, inclusive
+            rows = HBaseLikeByUser.filter(start=start, limit=batch_size + 1)
+            if start is not None:
+                rows = rows[1:]
+            if not rows:
+                break
+            existing = set(Like.objects.filter(
+                user_id__in=set(row.user_id for row in rows),
+                object_id__in=set(row.object_id for row in rows),
+            ).values_list('user_id', 'content_type_id', 'object_id'))
+            ghosts = [
+                row for row in rows
+                if (row.user_id, row.content_type_id, row.object_id) not in existing
+            ]
+            cls.delete_from_hbase(ghosts)
+            deleted += len(ghosts)
+            last_row = rows[-1]
+            start = (last_row.user_id, last_row.content_type_id, last_row.object_id)
+        return copied, deleted
+
     @classmethod
     def has_liked(cls, user, target):
         if user.is_anonymous:
             return False
+        content_type = ContentType.objects.get_for_model(target.__class__)
+        if GateKeeper.is_switch_on('switch_like_to_hbase'):
+            return HBaseLikeByUser.get(
+                user_id=user.id,
+                content_type_id=content_type.id,
+                object_id=target.id,
+            ) is not None
         return Like.objects.filter(
-            content_type=ContentType.objects.get_for_model(target.__class__),
+            content_type=content_type,
             object_id=target.id,
             user=user
-        ).exists()
\ No newline at end of file
+        ).exists()
+
+    @classmethod
+    def has_liked_many(cls, user, targets):
+        """
+        {target: has_liked} for a page of targets, one IN query (or one hbase
+        batch get) per model instead of one query per target. model instances
+        hash by pk, so the map can be looked up with any instance of the same row.
+        """
+        liked_map = {target: False for target in targets}
+        if user.is_anonymous or not liked_map:
+            return liked_map
+
+        model_class_to_targets = defaultdict(list)
+        for target in liked_map:
+            model_class_to_targets[target.__class__].append(target)
+
+        use_hbase = GateKeeper.is_switch_on('switch_like_to_hbase')
+        for model_class, model_targets in model_class_to_targets.items():
+            content_type = ContentType.objects.get_for_model(model_class)
+            if use_hbase:
+                instances = HBaseLikeByUser.batch_get([
+                    {
+                        'user_id': user.id,
+                        'content_type_id': content_type.id,
+                        'object_id': target.id,
+                    }
+                    for target in model_targets
+                ])
+                liked_ids = set(
+                    instance.object_id
+                    for instance in instances
+                    if instance is not None
+                )
+            else:
+                liked_ids = set(Like.objects.filter(
+                    content_type=content_type,
+                    object_id__in=[target.id for target in model_targets],
+                    user=user,
+                ).values_list('object_id', flat=True))
+            for target in model_targets:
+                liked_map[target] = target.id in liked_ids
+        return liked_map
+
+    @classmethod
+    def has_liked_in_context(cls, context, target):
+        # views put the precomputed map of the page into the serializer context,
+        # targets outside of it fall back to a single query
+        liked_map = context.get('liked_map')
+        if liked_map is not None and target in liked_map:
+            return liked_map[target]
+        return cls.has_liked(context['request'].user, target)
+
+    @classmethod
+    def get_recent_tweet_likes(cls, tweet_id, limit):
+        key = TWEET_LIKES_PATTERN.format(tweet_id=tweet_id)
+        likes, _ = RedisHelper.load_objects_window(
+            key,
+            lazy_load_tweet_likes(tweet_id),
+            limit=limit,
+            length_limit=LIKES_PREVIEW_SIZE,
+        )
+        return likes
+
+    @classmethod
+    def push_tweet_like_to_cache(cls, like):
+        key = TWEET_LIKES_PATTERN.format(tweet_id=like.object_id)
+        # only the tweet detail preview reads this cache
+        RedisHelper.push_object(
+            key,
+            like,
+            lazy_load_tweet_likes(like.object_id),
+            length_limit=LIKES_PREVIEW_SIZE,
+        )
+
+    @classmethod
+    def invalidate_tweet_likes_cache(cls, tweet_id):
+        # cancels are rare compared to reads, the list is reloaded on next read
+        key = TWEET_LIKES_PATTERN.format(tweet_id=tweet_id)
+        RedisClient.get_connection().delete(key)
@@ -7,7 +7,10 @@ class NewsFeedSerializer(serializers.Serializer):
     created_at = serializers.SerializerMethodField()
 
     def get_tweet(self, obj):
-        return TweetSerializer(obj.cached_tweet, context=self.context).data
+        tweet = self.context.get('tweets_map', {}).get(obj.tweet_id)
+        if tweet is None:
+            tweet = obj.cached_tweet
+        return TweetSerializer(tweet, context=self.context).data
 
     def get_created_at(self, obj):
         return obj.created_at
@@ -1,12 +1,17 @@
+from accounts.services import UserService
 from django.utils.decorators import method_decorator
 from gatekeeper.models import GateKeeper
+from likes.services import LikeService
 from newsfeeds.api.serializers import NewsFeedSerializer
 from newsfeeds.models import NewsFeed, HBaseNewsFeed
 from newsfeeds.services import NewsFeedService
 from ratelimit.decorators import ratelimit
 from rest_framework import viewsets
 from rest_framework.permissions import IsAuthenticated
+from tweets.models import Tweet
+from utils.memcached_helper import MemcachedHelper
 from utils.paginations import EndlessPagination
+from utils.redis_helper import RedisHelper
 
 
 class NewsFeedViewSet(viewsets.GenericViewSet):
@@ -15,8 +20,8 @@ class NewsFeedViewSet(viewsets.GenericViewSet):
 
     @method_decorator(ratelimit(key='user', rate='5/s', method='GET', block=True))
     def list(self, request):
-        cached_newsfeeds = NewsFeedService.get_cached_newsfeeds(request.user.id)
-        page = self.paginator.paginate_cached_list(cached_newsfeeds, request)
+        load_window = NewsFeedService.get_cached_newsfeeds_window_loader(request.user.id)
+        page = self.paginator.paginate_cached_window(load_window, request)
 
         if page is None:
             if GateKeeper.is_switch_on('switch_newsfeed_to_hbase'):
@@ -24,9 +29,26 @@ class NewsFeedViewSet(viewsets.GenericViewSet):
             else:
                 queryset = NewsFeed.objects.filter(user=request.user)
                 page = self.paginate_queryset(queryset)
+        # the tweets are loaded in batch, their authors are needed for the summaries
+        tweets_map = MemcachedHelper.get_objects_through_cache(
+            Tweet,
+            [newsfeed.tweet_id for newsfeed in page],
+        )
+        tweets = [Tweet(id=newsfeed.tweet_id) for newsfeed in page]
         serializer = NewsFeedSerializer(
             page,
-            context={'request': request},
+            context={
+                'request': request,
+                'tweets_map': tweets_map,
+                'liked_map': LikeService.has_liked_many(request.user, tweets),
+                'counts_map': RedisHelper.get_counts_many(
+                    tweets,
+                    ['likes_count', 'comments_count'],
+                ),
+                'user_summaries_map': UserService.get_user_summaries(
+                    [tweet.user_id for tweet in tweets_map.values()],
+                ),
+            },
             many=True,
         )
         return self.get_paginated_response(serializer.data)
@@ -1,3 +1,9 @@
 from django.conf import settings
 
-FANOUT_BATCH_SIZE = 1000 if not settings.TESTING else 3
\ No newline at end of file
+FANOUT_BATCH_SIZE = 1000 if not settings.TESTING else 3
+
+WARM_NEWSFEEDS_BATCH_SIZE = 100 if not settings.TESTING else 3
+# max number of users whose newsfeeds are reloaded from db / hbase per second
+WARM_NEWSFEEDS_RATE_LIMIT = 200
+# users who logged in within these days are considered as active
+WARM_NEWSFEEDS_ACTIVE_DAYS = 7
@@ -0,0 +1,81 @@
+from accounts.services import UserService
+from django.core.management.base import BaseCommand
+from django.db import connections
+from django_hbase.client import HBaseClient
+from functools import partial
+from multiprocessing import Pool
+from newsfeeds.constants import (
+    WARM_NEWSFEEDS_ACTIVE_DAYS,
+    WARM_NEWSFEEDS_BATCH_SIZE,
+    WARM_NEWSFEEDS_RATE_LIMIT,
+)
+from newsfeeds.services import NewsFeedService
+from newsfeeds.tasks import warm_newsfeeds_main_task
+from utils.redis_client import RedisClient
+
+
+def _reset_connections():
+    # forked workers must not share the sockets opened by the parent process
+    connections.close_all()
+    RedisClient.conn = None
+    HBaseClient.conn = None
+
+
+def _warm_batch(user_ids, rate_limit):
+    return NewsFeedService.warm_cached_newsfeeds(user_ids, rate_limit=rate_limit)
+
+
+class Command(BaseCommand):
+    help = 'Rebuild newsfeed caches of recently active users, e.g. after a redis flush.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=WARM_NEWSFEEDS_ACTIVE_DAYS)
+        parser.add_argument('--batch-size', type=int, default=WARM_NEWSFEEDS_BATCH_SIZE)
+        parser.add_argument(
+            '--rate-limit',
+            type=float,
+            default=WARM_NEWSFEEDS_RATE_LIMIT,
+            help='max users loaded from db / hbase per second across all workers',
+        )
+        parser.add_argument(
+            '--workers',
+            type=int,
+            default=4,
+            help='size of the process pool, 0 means warming in the current process',
+        )
+        parser.add_argument(
+            '--async',
+            action='store_true',
+            dest='use_celery',
+            help='dispatch the warm up to celery workers instead',
+        )
+
+    def handle(self, *args, **options):
+        if options['use_celery']:
+            msg = warm_newsfeeds_main_task.delay(options['days'], options['rate_limit'])
+            self.stdout.write('Warm up dispatched to celery: {}'.format(msg))
+            return
+
+        user_ids = UserService.get_recently_active_user_ids(options['days'])
+        batch_size = options['batch_size']
+        batches = [
+            user_ids[index: index + batch_size]
+            for index in range(0, len(user_ids), batch_size)
+        ]
+        total, warmed = len(user_ids), 0
+        self.stdout.write('{} active users, {} batches.'.format(total, len(batches)))
+
+        workers = options['workers']
+        if workers <= 0:
+            for batch_ids in batches:
+                warmed += _warm_batch(batch_ids, options['rate_limit'])
+                self.stdout.write('{}/{} newsfeed caches warmed.'.format(warmed, total))
+            return
+
+        # the rate limit is counted in redis, shared by all the workers
+        _reset_connections()
+        with Pool(processes=workers, initializer=_reset_connections) as pool:
+            warm_batch = partial(_warm_batch, rate_limit=options['rate_limit'])
+            for count in pool.imap_unordered(warm_batch, batches):
+                warmed += count
+                self.stdout.write('{}/{} newsfeed caches warmed.'.format(warmed, total))
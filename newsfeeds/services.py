@@ -1,7 +1,8 @@
+from django.conf import settings
 from gatekeeper.models import GateKeeper
 from newsfeeds.models import NewsFeed, HBaseNewsFeed
 from newsfeeds.tasks import fanout_newsfeeds_main_task
-from twitter.cache import USER_NEWSFEEDS_PATTERN
+from twitter.cache import USER_NEWSFEEDS_PATTERN, WARM_NEWSFEEDS_RATE_LIMIT_KEY
 from utils.redis_helper import RedisHelper
 from utils.redis_serializers import HBaseModelSerializer, DjangoModelSerializer
 
@@ -11,7 +12,7 @@ def lazy_load_newsfeeds(user_id):
     def _lazy_load(limit):
         if GateKeeper.is_switch_on('switch_newsfeed_to_hbase'):
             return HBaseNewsFeed.filter(prefix=(user_id,), limit=limit, reverse=True)
-        return NewsFeed.objects.filter(user_id=user_id).order_by('-created_at')[:limit]
+        return NewsFeed.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:limit]
     return _lazy_load
 
 
@@ -34,11 +35,40 @@ class NewsFeedService(object):
             serializer = DjangoModelSerializer
         return RedisHelper.load_objects(key, lazy_load_newsfeeds(user_id), serializer=serializer)
 
+    @classmethod
+    def get_cached_newsfeeds_window_loader(cls, user_id):
+        key = USER_NEWSFEEDS_PATTERN.format(user_id=user_id)
+        if GateKeeper.is_switch_on('switch_newsfeed_to_hbase'):
+            serializer = HBaseModelSerializer
+        else:
+            serializer = DjangoModelSerializer
+        return RedisHelper.get_window_loader(key, lazy_load_newsfeeds(user_id), serializer=serializer)
+
     @classmethod
     def push_newsfeed_to_cache(cls, newsfeed):
         key = USER_NEWSFEEDS_PATTERN.format(user_id=newsfeed.user_id)
         RedisHelper.push_object(key, newsfeed, lazy_load_newsfeeds(newsfeed.user_id))
 
+    @classmethod
+    def warm_cached_newsfeeds(cls, user_ids, rate_limit=None):
+        # reload newsfeeds of the given users from db / hbase and rewrite their
+        # caches in one pipeline. rate_limit caps how many users are loaded per
+        # second by all the workers together, so that a warm up does not
+        # become a stampede itself.
+        if GateKeeper.is_switch_on('switch_newsfeed_to_hbase'):
+            serializer = HBaseModelSerializer
+        else:
+            serializer = DjangoModelSerializer
+        key_to_newsfeeds = {}
+        for user_id in user_ids:
+            if rate_limit:
+                RedisHelper.wait_for_rate_limit(WARM_NEWSFEEDS_RATE_LIMIT_KEY, rate_limit)
+            key = USER_NEWSFEEDS_PATTERN.format(user_id=user_id)
+            newsfeeds = lazy_load_newsfeeds(user_id)(settings.REDIS_LIST_LENGTH_LIMIT)
+            key_to_newsfeeds[key] = list(newsfeeds)
+        RedisHelper.reload_objects_to_cache(key_to_newsfeeds, serializer)
+        return len(key_to_newsfeeds)
+
     @classmethod
     def create(cls, **kwargs):
         if GateKeeper.is_switch_on('switch_newsfeed_to_hbase'):
@@ -1,7 +1,12 @@
 from celery import shared_task
 from friendships.services import FriendshipService
 from utils.time_constants import ONE_HOUR
-from newsfeeds.constants import FANOUT_BATCH_SIZE
+from newsfeeds.constants import (
+    FANOUT_BATCH_SIZE,
+    WARM_NEWSFEEDS_ACTIVE_DAYS,
+    WARM_NEWSFEEDS_BATCH_SIZE,
+    WARM_NEWSFEEDS_RATE_LIMIT,
+)
 
 
 @shared_task(routing_key='newsfeeds', time_limit=ONE_HOUR)
@@ -35,3 +40,25 @@ def fanout_newsfeeds_main_task(tweet_id, created_at, tweet_user_id):
         (len(follower_ids) - 1) // FANOUT_BATCH_SIZE + 1,
     )
 
+
+@shared_task(routing_key='newsfeeds', time_limit=ONE_HOUR)
+def warm_newsfeeds_batch_task(user_ids, rate_limit=None):
+    from newsfeeds.services import NewsFeedService
+    warmed = NewsFeedService.warm_cached_newsfeeds(user_ids, rate_limit=rate_limit)
+    return '{} newsfeed caches warmed.'.format(warmed)
+
+
+@shared_task(routing_key='newsfeeds', time_limit=ONE_HOUR)
+def warm_newsfeeds_main_task(days=WARM_NEWSFEEDS_ACTIVE_DAYS, rate_limit=WARM_NEWSFEEDS_RATE_LIMIT):
+    from accounts.services import UserService
+    user_ids = UserService.get_recently_active_user_ids(days)
+    index = 0
+    while index < len(user_ids):
+        batch_ids = user_ids[index: index + WARM_NEWSFEEDS_BATCH_SIZE]
+        warm_newsfeeds_batch_task.delay(batch_ids, rate_limit)
+        index += WARM_NEWSFEEDS_BATCH_SIZE
+
+    return '{} newsfeed caches going to warm, {} batches created.'.format(
+        len(user_ids),
+        (len(user_ids) + WARM_NEWSFEEDS_BATCH_SIZE - 1) // WARM_NEWSFEEDS_BATCH_SIZE,
+    )
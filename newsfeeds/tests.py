@@ -1,9 +1,12 @@
+from django.core.management import call_command
 from gatekeeper.models import GateKeeper
+from io import StringIO
 from newsfeeds.services import NewsFeedService
-from newsfeeds.tasks import fanout_newsfeeds_main_task
+from newsfeeds.tasks import fanout_newsfeeds_main_task, warm_newsfeeds_main_task
 from testing.testcases import TestCase
 from twitter.cache import USER_NEWSFEEDS_PATTERN
 from utils.redis_client import RedisClient
+from utils.time_helpers import utc_now
 
 
 class NewsfeedServiceTest(TestCase):
@@ -98,4 +101,48 @@ class NewsFeedTaskTests(TestCase):
         cached_list = NewsFeedService.get_cached_newsfeeds(self.marcus.id)
         self.assertEqual(len(cached_list), 3)
         cached_list = NewsFeedService.get_cached_newsfeeds(self.fiona.id)
-        self.assertEqual(len(cached_list), 3)
\ No newline at end of file
+        self.assertEqual(len(cached_list), 3)
+
+
+class WarmNewsFeedsTests(TestCase):
+
+    def setUp(self):
+        super(WarmNewsFeedsTests, self).setUp()
+        self.clear_cache()
+        self.marcus = self.create_user('marcus')
+        self.fiona = self.create_user('fiona')
+        for i in range(2):
+            self.create_newsfeed(self.marcus, self.create_tweet(self.fiona))
+            self.create_newsfeed(self.fiona, self.create_tweet(self.fiona))
+        self.marcus.last_login = utc_now()
+        self.marcus.save()
+        RedisClient.clear()
+
+    def test_warm_newsfeeds_main_task(self):
+        conn = RedisClient.get_connection()
+        marcus_key = USER_NEWSFEEDS_PATTERN.format(user_id=self.marcus.id)
+        fiona_key = USER_NEWSFEEDS_PATTERN.format(user_id=self.fiona.id)
+        GateKeeper.turn_on('switch_newsfeed_to_hbase')
+
+        msg = warm_newsfeeds_main_task()
+        self.assertEqual(msg, '1 newsfeed caches going to warm, 1 batches created.')
+        self.assertEqual(conn.zcard(marcus_key), 2)
+        # fiona has never logged in, her cache stays cold
+        self.assertEqual(conn.exists(fiona_key), False)
+
+        newsfeeds = NewsFeedService.get_cached_newsfeeds(self.marcus.id)
+        self.assertEqual(len(newsfeeds), 2)
+
+    def test_warm_newsfeeds_command(self):
+        conn = RedisClient.get_connection()
+        marcus_key = USER_NEWSFEEDS_PATTERN.format(user_id=self.marcus.id)
+        GateKeeper.turn_on('switch_newsfeed_to_hbase')
+
+        out = StringIO()
+        call_command('warm_newsfeeds', workers=0, stdout=out)
+        self.assertEqual('1/1 newsfeed caches warmed.' in out.getvalue(), True)
+        self.assertEqual(conn.zcard(marcus_key), 2)
+
+        # warming again replaces the list instead of appending to it
+        call_command('warm_newsfeeds', workers=0, stdout=StringIO())
+        self.assertEqual(conn.zcard(marcus_key), 2)
@@ -1,13 +1,15 @@
 from comments.models import Comment
 from django.contrib.auth.models import User
-from django.contrib.contenttypes.models import ContentType
 from django.core.cache import caches
+from django.core.files.uploadedfile import SimpleUploadedFile
 from django.test import TestCase as DjangoTestCase
 from django_hbase.models import HBaseModel
 from friendships.services import FriendshipService
 from gatekeeper.models import GateKeeper
-from likes.models import Like
+from io import BytesIO
+from likes.services import LikeService
 from newsfeeds.services import NewsFeedService
+from PIL import Image
 from rest_framework.test import APIClient
 from tweets.models import Tweet
 from utils.redis_client import RedisClient
@@ -67,13 +69,18 @@ class TestCase(DjangoTestCase):
         return Comment.objects.create(user=user, tweet=tweet, content=content)
 
     def create_like(self, user, target):
-        instance, _ = Like.objects.get_or_create(
-            content_type=ContentType.objects.get_for_model(target.__class__),
-            object_id=target.id,
-            user=user,
-        )
+        instance, _ = LikeService.get_or_create(user.id, target.__class__, target.id)
         return instance
 
+    def create_image_file(self, name, width=1600, height=1200):
+        buffer = BytesIO()
+        Image.new('RGB', (width, height), color='blue').save(buffer, format='JPEG')
+        return SimpleUploadedFile(
+            name=name,
+            content=buffer.getvalue(),
+            content_type='image/jpeg',
+        )
+
     def create_user_and_client(self, *args, **kwargs):
         user = self.create_user(*args, **kwargs)
         client = APIClient()
@@ -1,6 +1,10 @@
 from accounts.api.serializers import UserSerializerForTweet
+from accounts.services import UserService
 from comments.api.serializers import CommentSerializer
+from comments.constants import COMMENTS_PREVIEW_SIZE
+from comments.services import CommentService
 from likes.api.serializers import LikeSerializer
+from likes.constants import LIKES_PREVIEW_SIZE
 from likes.services import LikeService
 from rest_framework import serializers
 from rest_framework.exceptions import ValidationError
@@ -11,11 +15,13 @@ from utils.redis_helper import RedisHelper
 
 
 class TweetSerializer(serializers.ModelSerializer):
-    user = UserSerializerForTweet(source='cached_user')
+    user = UserSerializerForTweet(source='user_id')
     has_liked = serializers.SerializerMethodField()
     comments_count = serializers.SerializerMethodField()
     likes_count = serializers.SerializerMethodField()
     photo_urls = serializers.SerializerMethodField()
+    # one of TWEET_PHOTO_SIZES
+    photo_size = 'small'
 
     class Meta:
         model = Tweet
@@ -31,19 +37,23 @@ class TweetSerializer(serializers.ModelSerializer):
         )
 
     def get_has_liked(self, obj):
-        return LikeService.has_liked(self.context['request'].user, obj)
+        return LikeService.has_liked_in_context(self.context, obj)
+
+    def _get_count(self, obj, attr):
+        # views put the counts of the whole page into the serializer context
+        counts = self.context.get('counts_map', {}).get(obj)
+        if counts is not None and attr in counts:
+            return counts[attr]
+        return RedisHelper.get_count(obj, attr)
 
     def get_comments_count(self, obj):
-        return RedisHelper.get_count(obj, 'comments_count')
+        return self._get_count(obj, 'comments_count')
 
     def get_likes_count(self, obj):
-        return RedisHelper.get_count(obj, 'likes_count')
+        return self._get_count(obj, 'likes_count')
 
     def get_photo_urls(self, obj):
-        photo_urls = []
-        for photo in obj.tweetphoto_set.all().order_by('order'):
-            photo_urls.append(photo.file.url)
-        return photo_urls
+        return TweetService.get_photo_urls(obj, self.photo_size)
 
 
 class TweetSerializerForCreate(serializers.ModelSerializer):
@@ -80,8 +90,11 @@ class TweetSerializerForCreate(serializers.ModelSerializer):
         return tweet
 
 class TweetSerializerForDetail(TweetSerializer):
-    comments = CommentSerializer(source='comment_set', many=True)
-    likes = LikeSerializer(source='like_set', many=True)
+    # only the newest comments, the others are served by the paginated comments api
+    comments = serializers.SerializerMethodField()
+    # only the recent likes, the others are served by the paginated likes api
+    likes = serializers.SerializerMethodField()
+    photo_size = 'medium'
 
     class Meta:
         model = Tweet
@@ -96,4 +109,20 @@ class TweetSerializerForDetail(TweetSerializer):
             'likes_count',
             'has_liked',
             'photo_urls',
-        )
\ No newline at end of file
+        )
+
+    def get_likes(self, obj):
+        likes = LikeService.get_recent_tweet_likes(obj.id, LIKES_PREVIEW_SIZE)
+        return LikeSerializer(likes, many=True, context={
+            'user_summaries_map': UserService.get_user_summaries([like.user_id for like in likes]),
+        }).data
+
+    def get_comments(self, obj):
+        comments = CommentService.get_recent_comments(obj.id, COMMENTS_PREVIEW_SIZE)
+        user = self.context['request'].user
+        return CommentSerializer(comments, many=True, context={
+            **self.context,
+            'liked_map': LikeService.has_liked_many(user, comments),
+            'counts_map': RedisHelper.get_counts_many(comments, ['likes_count']),
+            'user_summaries_map': UserService.get_user_summaries([comment.user_id for comment in comments]),
+        }).data
@@ -1,8 +1,11 @@
 from rest_framework.test import APIClient
 from testing.testcases import TestCase
+from django.core.files.storage import default_storage
+from PIL import Image
+from tweets.constants import TweetPhotoStatus
 from tweets.models import Tweet, TweetPhoto
 from django.core.files.uploadedfile import SimpleUploadedFile
-from utils.paginations import EndlessPagination
+from utils.paginations import EndlessPagination, encode_cursor
 from utils.redis_client import RedisClient
 from utils.redis_serializers import DjangoModelSerializer
 
@@ -109,31 +112,39 @@ class TweetApiTests(TestCase):
         })
         self.assertEqual(response.status_code, 201)
         self.assertEqual(TweetPhoto.objects.count(), 1)
+        # not an image, no thumbnails and no url
+        self.assertEqual(TweetPhoto.objects.first().status, TweetPhotoStatus.REJECTED)
+        self.assertEqual(response.data['photo_urls'], [])
 
         # upload multiple files
-        file1 = SimpleUploadedFile(
-            name='selfie1.jpg',
-            content=str.encode('selfie 1'),
-            content_type='image/jpeg',
-        )
-        file2 = SimpleUploadedFile(
-            name='selfie2.jpg',
-            content=str.encode('selfie 2'),
-            content_type='image/jpeg',
-        )
+        file1 = self.create_image_file('selfie1.jpg')
+        file2 = self.create_image_file('selfie2.jpg', width=300, height=400)
         response = self.user1_client.post(TWEET_CREATE_API, {
             'content': 'a selfie',
             'files': [file1, file2],
         })
         self.assertEqual(response.status_code, 201)
         self.assertEqual(TweetPhoto.objects.count(), 3)
+        tweet_id = response.data['id']
+        photos = TweetPhoto.objects.filter(tweet_id=tweet_id).order_by('order')
+        for photo in photos:
+            self.assertEqual(photo.status, TweetPhotoStatus.APPROVED)
+        # list apis serve the small size
+        self.assertEqual(response.data['photo_urls'][0].endswith('_small.jpg'), True)
 
         # we can get photo url from retrieve api
-        retrieve_url = TWEET_RETRIEVE_API.format(response.data['id'])
+        retrieve_url = TWEET_RETRIEVE_API.format(tweet_id)
         response = self.user1_client.get(retrieve_url)
         self.assertEqual(len(response.data['photo_urls']), 2)
         self.assertEqual('selfie1' in response.data['photo_urls'][0], True)
         self.assertEqual('selfie2' in response.data['photo_urls'][1], True)
+        self.assertEqual(response.data['photo_urls'][0].endswith('_medium.jpg'), True)
+
+        # thumbnails keep the aspect ratio and are never scaled up
+        with default_storage.open(photos[0].file.name.replace('.jpg', '_small.jpg')) as file:
+            self.assertEqual(Image.open(file).size, (680, 510))
+        with default_storage.open(photos[1].file.name.replace('.jpg', '_medium.jpg')) as file:
+            self.assertEqual(Image.open(file).size, (300, 400))
 
         # upload file more than 9 files
         files = [
@@ -225,4 +236,37 @@ class TweetApiTests(TestCase):
 
         data = conn.get(f'tweet:{tweet.id}')
         cached_tweet = DjangoModelSerializer.deserialize(data)
-        self.assertEqual(tweet, cached_tweet)
\ No newline at end of file
+        self.assertEqual(tweet, cached_tweet)
+
+    def test_refresh_pagination(self):
+        page_size = EndlessPagination.page_size
+        cursor = self.tweets1[-1].created_at
+        new_tweets = [
+            self.create_tweet(self.user1, 'new tweet {}'.format(i))
+            for i in range(page_size + 3)
+        ][::-1]
+
+        # only the newest page is returned, the gap can be pulled afterwards
+        response = self.anonymous_client.get(TWEET_LIST_API, {
+            'user_id': self.user1.id,
+            'created_at__gt': cursor,
+        })
+        self.assertEqual(response.data['has_next_page'], False)
+        self.assertEqual(response.data['has_more_newer'], True)
+        self.assertEqual(len(response.data['results']), page_size)
+        self.assertEqual(response.data['results'][0]['id'], new_tweets[0].id)
+        self.assertEqual(
+            response.data['continuation_cursor'],
+            encode_cursor(new_tweets[page_size - 1].created_at, new_tweets[page_size - 1].id),
+        )
+
+        response = self.anonymous_client.get(TWEET_LIST_API, {
+            'user_id': self.user1.id,
+            'created_at__gt': cursor,
+            'before': response.data['continuation_cursor'],
+        })
+        self.assertEqual(response.data['has_more_newer'], False)
+        self.assertEqual(
+            [tweet['id'] for tweet in response.data['results']],
+            [tweet.id for tweet in new_tweets[page_size:]],
+        )
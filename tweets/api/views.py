@@ -1,4 +1,6 @@
+from accounts.services import UserService
 from django.utils.decorators import method_decorator
+from likes.services import LikeService
 from newsfeeds.services import NewsFeedService
 from ratelimit.decorators import ratelimit
 from rest_framework import viewsets, status
@@ -13,6 +15,7 @@ from tweets.models import Tweet
 from tweets.services import TweetService
 from utils.decorators import required_params
 from utils.paginations import EndlessPagination
+from utils.redis_helper import RedisHelper
 
 
 class TweetViewSet(viewsets.GenericViewSet):
@@ -30,15 +33,23 @@ class TweetViewSet(viewsets.GenericViewSet):
     @method_decorator(ratelimit(key='user', rate='5/m', method='POST', block=True))
     def list(self, request):
         user_id = request.query_params['user_id']
-        cached_tweets = TweetService.get_cached_tweets(user_id=user_id)
-        page = self.paginator.paginate_cached_list(cached_tweets, request)
+        load_window = TweetService.get_cached_tweets_window_loader(user_id=user_id)
+        page = self.paginator.paginate_cached_window(load_window, request)
         if not page:
             queryset = Tweet.objects.filter(user_id=user_id).order_by('-created_at')
             page = self.paginate_queryset(queryset)
         # many=True means list of dict
         serializer = TweetSerializer(
             page,
-            context={'request': request},
+            context={
+                'request': request,
+                'liked_map': LikeService.has_liked_many(request.user, page),
+                'counts_map': RedisHelper.get_counts_many(
+                    page,
+                    ['likes_count', 'comments_count'],
+                ),
+                'user_summaries_map': UserService.get_user_summaries([tweet.user_id for tweet in page]),
+            },
             many=True,
         )
         return self.get_paginated_response(serializer.data)
@@ -1,3 +1,8 @@
+from django.conf import settings
+
+
+# there is no manual moderation, process_tweet_photos_task approves the uploads
+# it could resize and rejects the ones which are not images
 class TweetPhotoStatus:
 
     PENDING = 0
@@ -11,4 +16,18 @@ TWEET_PHOTO_STATUS_CHOICES = (
     (TweetPhotoStatus.REJECTED, 'rejected'),
 )
 
-TWEET_PHOTOS_UPLOAD_LIMIT = 9
\ No newline at end of file
+TWEET_PHOTOS_UPLOAD_LIMIT = 9
+TWEET_PHOTO_UPLOAD_PATTERN = 'tweet_photos/{tweet_id}/{name}'
+# max width / height in pixels, lists serve the small size and the detail the
+# medium one, the originals are only served until they are resized
+TWEET_PHOTO_SIZES = {
+    'thumb': 150,
+    'small': 680,
+    'medium': 1200,
+}
+TWEET_PHOTO_RESIZE_WORKERS = 4 if not settings.TESTING else 0
+# photos which failed for another reason than not being an image are retried,
+# then rejected
+TWEET_PHOTO_RESIZE_MAX_RETRIES = 3
+# max number of rows written by one UPDATE when flushing the cached counts
+FLUSH_COUNTS_BATCH_SIZE = 500
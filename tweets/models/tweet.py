@@ -1,12 +1,12 @@
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.models import ContentType
 from django.db import models
-from django.db.models.signals import post_save, pre_delete
+from django.db.models.signals import post_delete, post_save
 from likes.models import Like
 from tweets.listeners import push_tweet_to_cache
 from utils.listeners import invalidate_object_cache
 from utils.memcached_helper import MemcachedHelper
-from utils.time_helpers import utc_now
+from utils.time_helpers import to_timestamp, utc_now
 
 
 class Tweet(models.Model):
@@ -48,9 +48,11 @@ class Tweet(models.Model):
 
     @property
     def timestamp(self):
-        return int(self.created_at.timestamp() * 1000000)
+        return to_timestamp(self.created_at)
 
 
 post_save.connect(invalidate_object_cache, sender=Tweet)
-# pre_delete.connect(invalidate_object_cache, sender=Tweet)
+# deleted tweets must not pass the cached validation of likes and comments.
+# post_delete, a reader between pre_delete and the delete would cache it again
+post_delete.connect(invalidate_object_cache, sender=Tweet)
 post_save.connect(push_tweet_to_cache, sender=Tweet)
\ No newline at end of file
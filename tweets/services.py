@@ -1,11 +1,14 @@
+from tweets.constants import TWEET_PHOTO_UPLOAD_PATTERN, TweetPhotoStatus
 from tweets.models import Tweet, TweetPhoto
+from tweets.tasks import process_tweet_photos_task
 from twitter.cache import USER_TWEETS_PATTERN
+from utils.photo_helper import PhotoHelper
 from utils.redis_helper import RedisHelper
 
 
 def lazy_load_tweets(user_id):
     def _lazy_load(limit):
-        return Tweet.objects.filter(user_id=user_id).order_by('-created_at')[:limit]
+        return Tweet.objects.filter(user_id=user_id).order_by('-created_at', '-id')[:limit]
     return _lazy_load
 
 
@@ -13,22 +16,49 @@ class TweetService(object):
 
     @classmethod
     def create_photos_from_files(cls, tweet, files):
+        # only the originals are stored during the request, the thumbnails
+        # are made by process_tweet_photos_task
         photos = []
         for index, file in enumerate(files):
+            name = PhotoHelper.save_upload(
+                TWEET_PHOTO_UPLOAD_PATTERN.format(tweet_id=tweet.id, name=file.name),
+                file,
+            )
             photo = TweetPhoto(
                 tweet=tweet,
                 user=tweet.user,
-                file=file,
+                file=name,
                 order=index,
             )
             photos.append(photo)
         TweetPhoto.objects.bulk_create(photos)
+        # bulk_create does not return the ids on mysql, the task loads them by tweet
+        process_tweet_photos_task.delay(tweet.id)
+
+    @classmethod
+    def get_photo_urls(cls, tweet, size_name):
+        photos = tweet.tweetphoto_set.exclude(
+            status=TweetPhotoStatus.REJECTED,
+        ).order_by('order')
+        photo_urls = []
+        for photo in photos:
+            # the original is served until the photo has been resized
+            if photo.status == TweetPhotoStatus.PENDING:
+                photo_urls.append(photo.file.url)
+            else:
+                photo_urls.append(PhotoHelper.get_url(photo.file.name, size_name))
+        return photo_urls
 
     @classmethod
     def get_cached_tweets(cls, user_id):
         key = USER_TWEETS_PATTERN.format(user_id=user_id)
         return RedisHelper.load_objects(key, lazy_load_tweets(user_id))
 
+    @classmethod
+    def get_cached_tweets_window_loader(cls, user_id):
+        key = USER_TWEETS_PATTERN.format(user_id=user_id)
+        return RedisHelper.get_window_loader(key, lazy_load_tweets(user_id))
+
     @classmethod
     def push_tweet_to_cache(cls, tweet):
         key = USER_TWEETS_PATTERN.format(user_id=tweet.user_id)
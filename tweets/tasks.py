@@ -0,0 +1,64 @@
+from celery import shared_task
+from tweets.constants import (
+    FLUSH_COUNTS_BATCH_SIZE,
+    TWEET_PHOTO_RESIZE_MAX_RETRIES,
+    TWEET_PHOTO_RESIZE_WORKERS,
+    TWEET_PHOTO_SIZES,
+    TweetPhotoStatus,
+)
+from utils.time_constants import ONE_HOUR, ONE_MINUTE
+
+
+@shared_task(time_limit=ONE_HOUR)
+def flush_counts_task():
+    # run by celery beat, see CELERY_BEAT_SCHEDULE
+    from comments.models import Comment
+    from tweets.models import Tweet
+    from utils.redis_helper import RedisHelper
+    flushed = 0
+    for model_class, attr in [
+        (Tweet, 'likes_count'),
+        (Tweet, 'comments_count'),
+        (Comment, 'likes_count'),
+    ]:
+        flushed += RedisHelper.flush_counts(
+            model_class,
+            attr,
+            batch_size=FLUSH_COUNTS_BATCH_SIZE,
+        )
+    return '{} counts flushed.'.format(flushed)
+
+
+@shared_task(
+    bind=True,
+    routing_key='photos',
+    time_limit=ONE_HOUR,
+    max_retries=TWEET_PHOTO_RESIZE_MAX_RETRIES,
+)
+def process_tweet_photos_task(self, tweet_id):
+    from tweets.models import TweetPhoto
+    from utils.photo_helper import PhotoHelper
+    # a retry only picks up the photos which are still pending
+    photos = list(TweetPhoto.objects.filter(
+        tweet_id=tweet_id,
+        status=TweetPhotoStatus.PENDING,
+    ))
+    resized = PhotoHelper.make_thumbnails(
+        [photo.file.name for photo in photos],
+        TWEET_PHOTO_SIZES,
+        workers=TWEET_PHOTO_RESIZE_WORKERS,
+    )
+    can_retry = self.request.retries < self.max_retries
+    approved_ids, rejected_ids, failed_ids = [], [], []
+    for photo in photos:
+        if resized[photo.file.name]:
+            approved_ids.append(photo.id)
+        elif resized[photo.file.name] is None and can_retry:
+            failed_ids.append(photo.id)
+        else:
+            rejected_ids.append(photo.id)
+    TweetPhoto.objects.filter(id__in=approved_ids).update(status=TweetPhotoStatus.APPROVED)
+    TweetPhoto.objects.filter(id__in=rejected_ids).update(status=TweetPhotoStatus.REJECTED)
+    if failed_ids:
+        raise self.retry(countdown=ONE_MINUTE)
+    return '{} photos resized, {} rejected.'.format(len(approved_ids), len(rejected_ids))
@@ -1,11 +1,15 @@
+from celery.exceptions import Retry
 from datetime import timedelta
+from django.core.files.storage import default_storage
 from testing.testcases import TestCase
 from tweets.constants import TweetPhotoStatus
-from tweets.models import TweetPhoto
+from tweets.models import Tweet, TweetPhoto
 from tweets.services import TweetService
+from tweets.tasks import flush_counts_task, process_tweet_photos_task
 from twitter.cache import USER_TWEETS_PATTERN
 from utils.redis_client import RedisClient
-from utils.time_helpers import utc_now
+from utils.redis_helper import RedisHelper
+from utils.time_helpers import to_timestamp, utc_now
 
 
 class TweetTests(TestCase):
@@ -40,6 +44,117 @@ class TweetTests(TestCase):
         self.assertEqual(photo.status, TweetPhotoStatus.PENDING)
         self.assertEqual(self.tweet.tweetphoto_set.count(), 1)
 
+    def test_process_tweet_photos_task(self):
+        name = default_storage.save('testing/photo.jpg', self.create_image_file('photo.jpg'))
+        photo = TweetPhoto.objects.create(tweet=self.tweet, user=self.marcus, file=name)
+        # the original is missing, not an image that can be rejected right away
+        missing_photo = TweetPhoto.objects.create(
+            tweet=self.tweet,
+            user=self.marcus,
+            file='testing/missing.jpg',
+            order=1,
+        )
+
+        # retried while the retries last, the resized photo is not retried
+        with self.assertRaises(Retry):
+            process_tweet_photos_task(self.tweet.id)
+        photo.refresh_from_db()
+        missing_photo.refresh_from_db()
+        self.assertEqual(photo.status, TweetPhotoStatus.APPROVED)
+        self.assertEqual(missing_photo.status, TweetPhotoStatus.PENDING)
+
+        # then rejected instead of pending forever
+        result = process_tweet_photos_task.apply(
+            args=[self.tweet.id],
+            retries=process_tweet_photos_task.max_retries,
+        )
+        self.assertEqual(result.get(), '0 photos resized, 1 rejected.')
+        missing_photo.refresh_from_db()
+        self.assertEqual(missing_photo.status, TweetPhotoStatus.REJECTED)
+
+    def test_flush_counts(self):
+        RedisClient.clear()
+        self.create_like(self.marcus, self.tweet)
+        self.create_comment(self.marcus, self.tweet)
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.likes_count, 0)
+        self.assertEqual(RedisHelper.get_count(self.tweet, 'likes_count'), 1)
+
+        flush_counts_task()
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.likes_count, 1)
+        self.assertEqual(self.tweet.comments_count, 1)
+
+        # a crash between taking the dirty set and the database update leaves
+        # the flushing set behind, it is retried before the new changes
+        conn = RedisClient.get_connection()
+        dirty_key = RedisHelper.get_dirty_counts_key(Tweet, 'likes_count')
+        self.create_like(self.create_user('fiona'), self.tweet)
+        conn.rename(dirty_key, '{}:flushing'.format(dirty_key))
+        self.create_like(self.create_user('bruno'), self.tweet)
+        self.assertEqual(RedisHelper.flush_counts(Tweet, 'likes_count'), 1)
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.likes_count, 3)
+        # flushing again writes the same absolute value
+        self.assertEqual(RedisHelper.flush_counts(Tweet, 'likes_count'), 1)
+        self.tweet.refresh_from_db()
+        self.assertEqual(self.tweet.likes_count, 3)
+        self.assertEqual(RedisHelper.flush_counts(Tweet, 'likes_count'), 0)
+
+    def test_flush_counts_with_nothing_dirty(self):
+        RedisClient.clear()
+        self.assertEqual(RedisHelper.flush_counts(Tweet, 'likes_count'), 0)
+        self.assertEqual(RedisHelper.flush_counts(Tweet, 'likes_count'), 0)
+        self.assertEqual(flush_counts_task(), '0 counts flushed.')
+
+        # a flush running elsewhere holds the lock, the dirty set is left to it
+        conn = RedisClient.get_connection()
+        dirty_key = RedisHelper.get_dirty_counts_key(Tweet, 'likes_count')
+        self.create_like(self.marcus, self.tweet)
+        conn.set('{}:lock'.format(dirty_key), 'token')
+        self.assertEqual(RedisHelper.flush_counts(Tweet, 'likes_count'), 0)
+        self.assertEqual(conn.exists(dirty_key), 1)
+        conn.delete('{}:lock'.format(dirty_key))
+        self.assertEqual(RedisHelper.flush_counts(Tweet, 'likes_count'), 1)
+        self.assertEqual(conn.exists('{}:lock'.format(dirty_key)), 0)
+
+    def test_get_counts_many(self):
+        RedisClient.clear()
+        tweets = [self.tweet, self.create_tweet(self.marcus)]
+        self.create_like(self.marcus, tweets[1])
+        RedisClient.get_connection().delete(
+            RedisHelper.get_count_key(tweets[1], 'likes_count'),
+        )
+        Tweet.objects.filter(id=tweets[1].id).update(likes_count=1)
+
+        attrs = ['likes_count', 'comments_count']
+        # misses are loaded with one query and cached
+        with self.assertNumQueries(1):
+            counts_map = RedisHelper.get_counts_many(tweets, attrs)
+        self.assertEqual(counts_map[tweets[0]], {'likes_count': 0, 'comments_count': 0})
+        self.assertEqual(counts_map[tweets[1]], {'likes_count': 1, 'comments_count': 0})
+
+        self.create_comment(self.marcus, tweets[0])
+        with self.assertNumQueries(0):
+            counts_map = RedisHelper.get_counts_many(tweets, attrs)
+        self.assertEqual(counts_map[tweets[0]], {'likes_count': 0, 'comments_count': 1})
+        self.assertEqual(counts_map[tweets[1]], {'likes_count': 1, 'comments_count': 0})
+
+    def test_count_ttl(self):
+        RedisClient.clear()
+        conn = RedisClient.get_connection()
+        likes_key = RedisHelper.get_count_key(self.tweet, 'likes_count')
+        comments_key = RedisHelper.get_count_key(self.tweet, 'comments_count')
+
+        self.assertEqual(RedisHelper.get_count(self.tweet, 'likes_count'), 0)
+        self.assertGreater(conn.ttl(likes_key), 0)
+
+        # initialised from db and incremented in one script
+        self.assertEqual(RedisHelper.incr_count(self.tweet, 'comments_count'), 1)
+        self.assertGreater(conn.ttl(comments_key), 0)
+        self.assertEqual(RedisHelper.incr_count(self.tweet, 'comments_count'), 2)
+        self.assertEqual(RedisHelper.decr_count(self.tweet, 'comments_count'), 1)
+
 
 class TestServiceTweets(TestCase):
 
@@ -82,4 +197,27 @@ class TestServiceTweets(TestCase):
         self.assertEqual(conn.exists(key), True)
 
         tweets = TweetService.get_cached_tweets(self.marcus.id)
-        self.assertEqual([t.id for t in tweets], [tweet2.id, tweet1.id])
\ No newline at end of file
+        self.assertEqual([t.id for t in tweets], [tweet2.id, tweet1.id])
+
+    def test_get_cached_tweets_window(self):
+        tweets = [self.create_tweet(self.marcus, 'tweet {}'.format(i)) for i in range(5)]
+        tweets = tweets[::-1]
+        RedisClient.clear()
+        load_window = TweetService.get_cached_tweets_window_loader(self.marcus.id)
+
+        # cache miss
+        objects, cached_length = load_window(limit=2)
+        self.assertEqual([t.id for t in objects], [tweets[0].id, tweets[1].id])
+        self.assertEqual(cached_length, 5)
+
+        # cache hit, older than the cursor
+        objects, cached_length = load_window(
+            before=(to_timestamp(tweets[1].created_at), tweets[1].id),
+            limit=2,
+        )
+        self.assertEqual([t.id for t in objects], [tweets[2].id, tweets[3].id])
+        self.assertEqual(cached_length, 5)
+
+        # cache hit, newer than the cursor
+        objects, _ = load_window(after=(to_timestamp(tweets[2].created_at), tweets[2].id))
+        self.assertEqual([t.id for t in objects], [tweets[0].id, tweets[1].id])
@@ -1,7 +1,27 @@
 # Memcached Pattern
 FOLLOWINGS_PATTERN = 'followings:{user_id}'
 USER_PROFILE_PATTERN = 'userprofile:{user_id}'
+# json encoded, see UserService.encode_user_summary
+USER_SUMMARY_PATTERN = 'user_summary:{user_id}'
 
 # Redis Pattern
-USER_TWEETS_PATTERN = 'user_tweets:{user_id}'
-USER_NEWSFEEDS_PATTERN = 'user_newsfeeds:{user_id}'
\ No newline at end of file
+# cached lists are sorted sets with id prefixed members since v3,
+# keys of older formats are left to expire
+USER_TWEETS_PATTERN = 'user_tweets:v3:{user_id}'
+USER_NEWSFEEDS_PATTERN = 'user_newsfeeds:v3:{user_id}'
+# per second counter shared by all the workers warming newsfeeds
+WARM_NEWSFEEDS_RATE_LIMIT_KEY = 'warm_newsfeeds:rate'
+TWEET_LIKES_PATTERN = 'tweet_likes:{tweet_id}'
+TWEET_COMMENTS_PATTERN = 'tweet_comments:{tweet_id}'
+# notification events waiting for the delivery task, the flag telling that
+# a delivery task is scheduled and the lock held by the draining one
+PENDING_NOTIFICATIONS_KEY = 'pending_notifications'
+PENDING_NOTIFICATIONS_SCHEDULED_KEY = 'pending_notifications:scheduled'
+PENDING_NOTIFICATIONS_LOCK_KEY = 'pending_notifications:lock'
+UNREAD_NOTIFICATIONS_PATTERN = 'unread_notifications:{user_id}'
+# notifications up to this id are read, set by mark-all-as-read until the
+# rows are updated by mark_all_as_read_task
+NOTIFICATIONS_READ_WATERMARK_PATTERN = 'notifications_read_watermark:{user_id}'
+SESSION_PATTERN = 'session:{session_key}'
+# bitmap, see UserService.username_may_exist
+USER_BLOOM_FILTER_KEY = 'user_bloom_filter'
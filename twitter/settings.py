@@ -186,8 +186,21 @@ CACHES = {
         'TIMEOUT': 86400 * 7,
         'KEY_PREFIX': 'rl',
     },
+    # in process, for the users of the sessions, see CachedModelBackend
+    'local': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'TIMEOUT': 10,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
 }
 
+# sessions are kept in redis and their users are loaded through the caches,
+# an authenticated request does no query for the authentication
+SESSION_ENGINE = 'utils.redis_session'
+AUTHENTICATION_BACKENDS = ['accounts.backends.CachedModelBackend']
+
 # Redis
 REDIS_HOST = '127.0.0.1'
 REDIS_PORT = 6379
@@ -202,7 +215,20 @@ CELERY_TASK_ALWAYS_EAGER = TESTING
 CELERY_QUEUES = (
     Queue('default', routing_key='default'),
     Queue('newsfeeds', routing_key='newsfeeds'),
+    Queue('photos', routing_key='photos'),
 )
+# like / comment counts are kept in redis and written behind to the database,
+# unread notification counters are recounted in case an increment was lost
+CELERY_BEAT_SCHEDULE = {
+    'flush-counts': {
+        'task': 'tweets.tasks.flush_counts_task',
+        'schedule': 60,
+    },
+    'reconcile-unread-counts': {
+        'task': 'inbox.tasks.reconcile_unread_counts_task',
+        'schedule': 60 * 60,
+    },
+}
 
 # Rate Limiter
 RATELIMIT_USE_CACHE = 'ratelimit'
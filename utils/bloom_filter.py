@@ -0,0 +1,92 @@
+from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
+
+import hashlib
+
+# KEYS[1]: filter, KEYS[2]: filter being rebuilt, ARGV: bit offsets
+# a filter that does not exist is left alone, it would claim false negatives
+ADD_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        for j, offset in ipairs(ARGV) do
+            redis.call('SETBIT', key, offset, 1)
+        end
+    end
+end
+return true
+"""
+
+# KEYS[1]: filter, ARGV: bit offsets
+CONTAINS_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    return 1
+end
+for i, offset in ipairs(ARGV) do
+    if redis.call('GETBIT', KEYS[1], offset) == 0 then
+        return 0
+    end
+end
+return 1
+"""
+
+
+class BloomFilter:
+    """
+    a bloom filter stored as a redis bitmap. might_contain never gives a false
+    negative, so a False answer can skip the database. a filter that is not
+    built yet contains everything.
+    """
+
+    def __init__(self, key, size, hash_count):
+        self.key = key
+        self.rebuilding_key = '{}:rebuilding'.format(key)
+        self.size = size
+        self.hash_count = hash_count
+
+    def get_offsets(self, value):
+        # double hashing, the k positions come from the two halves of one digest
+        digest = hashlib.sha256(value.encode('utf-8')).digest()
+        h1 = int.from_bytes(digest[:8], 'big')
+        h2 = int.from_bytes(digest[8:16], 'big')
+        return [(h1 + i * h2) % self.size for i in range(self.hash_count)]
+
+    def add(self, values):
+        offsets = set()
+        for value in values:
+            offsets.update(self.get_offsets(value))
+        if not offsets:
+            return
+        script = RedisHelper.get_script(ADD_SCRIPT)
+        script(
+            keys=[self.key, self.rebuilding_key],
+            args=list(offsets),
+            client=RedisClient.get_connection(),
+        )
+
+    def might_contain(self, value):
+        script = RedisHelper.get_script(CONTAINS_SCRIPT)
+        return script(
+            keys=[self.key],
+            args=self.get_offsets(value),
+            client=RedisClient.get_connection(),
+        ) == 1
+
+    def rebuild(self, batches):
+        """
+        batches is an iterable of lists of values. the filter is built aside
+        and swapped in, values added meanwhile go to both.
+        """
+        conn = RedisClient.get_connection()
+        conn.delete(self.rebuilding_key)
+        # allocates the whole bitmap, and marks the new filter as existing
+        conn.setbit(self.rebuilding_key, self.size - 1, 0)
+        added = 0
+        for values in batches:
+            pipeline = conn.pipeline(transaction=False)
+            for value in values:
+                for offset in self.get_offsets(value):
+                    pipeline.setbit(self.rebuilding_key, offset, 1)
+            pipeline.execute()
+            added += len(values)
+        conn.rename(self.rebuilding_key, self.key)
+        return added
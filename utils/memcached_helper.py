@@ -3,6 +3,12 @@ from django.core.cache import caches
 
 cache = caches['testing'] if settings.TESTING else caches['default']
 
+# cached in place of ids that do not exist. the entry is dropped by
+# invalidate_object_cache once the id is created, the timeout only guards
+# against missed invalidations.
+MISSING_OBJECT = '<missing>'
+MISSING_OBJECT_TIMEOUT = 60
+
 
 class MemcachedHelper:
 
@@ -14,6 +20,11 @@ class MemcachedHelper:
     def get_object_through_cache(cls, model_class, object_id):
         key = cls.get_key(model_class, object_id)
         obj = cache.get(key)
+        # cached as missing by the other readers, behaves like objects.get
+        if obj == MISSING_OBJECT:
+            raise model_class.DoesNotExist(
+                '{} matching query does not exist.'.format(model_class.__name__),
+            )
         if obj is not None:
             return obj
 
@@ -21,6 +32,55 @@ class MemcachedHelper:
         cache.set(key, obj)
         return obj
 
+    @classmethod
+    def get_object_or_none_through_cache(cls, model_class, object_id):
+        key = cls.get_key(model_class, object_id)
+        obj = cache.get(key)
+        if obj == MISSING_OBJECT:
+            return None
+        if obj is not None:
+            return obj
+
+        obj = model_class.objects.filter(id=object_id).first()
+        if obj is None:
+            cache.set(key, MISSING_OBJECT, MISSING_OBJECT_TIMEOUT)
+            return None
+        cache.set(key, obj)
+        return obj
+
+    @classmethod
+    def get_objects_through_cache(cls, model_class, object_ids):
+        """
+        {id: object} of the ids that exist, read with one get_many and one IN
+        query for the misses. ids that do not exist are cached as missing.
+        """
+        keys = {cls.get_key(model_class, object_id): object_id for object_id in set(object_ids)}
+        if not keys:
+            return {}
+        cached_objects = cache.get_many(list(keys))
+        objects, missed_ids = {}, []
+        for key, object_id in keys.items():
+            obj = cached_objects.get(key)
+            if obj is None:
+                missed_ids.append(object_id)
+            elif obj != MISSING_OBJECT:
+                objects[object_id] = obj
+        if not missed_ids:
+            return objects
+
+        found_objects = {obj.id: obj for obj in model_class.objects.filter(id__in=missed_ids)}
+        cache.set_many({
+            cls.get_key(model_class, object_id): obj
+            for object_id, obj in found_objects.items()
+        })
+        cache.set_many({
+            cls.get_key(model_class, object_id): MISSING_OBJECT
+            for object_id in missed_ids
+            if object_id not in found_objects
+        }, MISSING_OBJECT_TIMEOUT)
+        objects.update(found_objects)
+        return objects
+
     @classmethod
     def invalidate_cached_object(cls, model_class, object_id):
         key = cls.get_key(model_class, object_id)
@@ -1,117 +1,230 @@
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from bisect import bisect_left, bisect_right
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
 from rest_framework.pagination import BasePagination
 from rest_framework.response import Response
-from dateutil import parser
 from django.conf import settings
 from utils.time_constants import MAX_TIMESTAMP
+from utils.time_helpers import parse_timestamp, timestamp_to_datetime, to_timestamp
+
+
+def encode_cursor(created_at, object_id=None):
+    # an opaque token of the (created_at, id) position, hbase objects have no id
+    # since created_at is already unique inside their row key prefix
+    raw = '{}:{}'.format(to_timestamp(created_at), '' if object_id is None else object_id)
+    return urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        timestamp, object_id = urlsafe_b64decode(padded.encode()).decode().split(':')
+        return int(timestamp), int(object_id) if object_id else None
+    except ValueError:
+        raise ValidationError({'cursor': 'Invalid cursor.'})
+
+
+class NegatedPositionKeys:
+    """
+    A read only sequence of (-created_at, -id) over a list ordered from newest to
+    oldest. Keys are computed on access, so bisect only normalises the O(log n)
+    objects it actually compares.
+    """
+
+    def __init__(self, reverse_ordered_list):
+        self.reverse_ordered_list = reverse_ordered_list
+
+    def __len__(self):
+        return len(self.reverse_ordered_list)
+
+    def __getitem__(self, index):
+        obj = self.reverse_ordered_list[index]
+        return -to_timestamp(obj.created_at), -(getattr(obj, 'id', None) or 0)
 
 
 class EndlessPagination(BasePagination):
-    
+
     page_size = 20
+    # querysets are ordered by (cursor_field, id), cached lists and hbase rows
+    # are always ordered by created_at
+    cursor_field = 'created_at'
 
     def __init__(self):
         super(EndlessPagination, self).__init__()
         self.has_next_page = False
+        # refresh (after) requests return at most one page, the rest of
+        # the gap can be pulled with after + before=continuation_cursor
+        self.has_more_newer = False
+        self.continuation_cursor = None
+        self.next_cursor = None
+        self.newest_cursor = None
 
     def to_html(self):
         pass
 
+    def get_cursor(self, obj):
+        return encode_cursor(getattr(obj, self.cursor_field), getattr(obj, 'id', None))
+
+    def get_cursor_bounds(self, request):
+        """
+        (before, after) positions as (created_at, id) pairs, id is None for the
+        legacy created_at__lt / created_at__gt params which exclude the whole
+        timestamp.
+        """
+        params = request.query_params
+        before, after = None, None
+        if 'before' in params:
+            before = decode_cursor(params['before'])
+        elif 'created_at__lt' in params:
+            before = (parse_timestamp(params['created_at__lt']), None)
+        if 'after' in params:
+            after = decode_cursor(params['after'])
+        elif 'created_at__gt' in params:
+            after = (parse_timestamp(params['created_at__gt']), None)
+        return before, after
+
+    def set_cursors(self, objects):
+        self.newest_cursor = self.get_cursor(objects[0]) if objects else None
+        if self.has_next_page:
+            self.next_cursor = self.get_cursor(objects[-1])
+        if self.has_more_newer:
+            self.continuation_cursor = self.get_cursor(objects[-1])
+        return objects
+
+    def paginate_newer_objects(self, objects):
+        # objects are ordered from newest to oldest, at most page_size + 1 of them
+        self.has_next_page = False
+        self.has_more_newer = len(objects) > self.page_size
+        return self.set_cursors(objects[:self.page_size])
+
+    def paginate_older_objects(self, objects):
+        # objects are ordered from newest to oldest, at most page_size + 1 of them
+        self.has_next_page = len(objects) > self.page_size
+        return self.set_cursors(objects[:self.page_size])
+
     def paginate_ordered_list(self, reverse_ordered_list, request):
-        # greater than basically means getting the updated info
-        if 'created_at__gt' in request.query_params:
-            try:
-                created_at__gt = parser.isoparse(request.query_params['created_at__gt'])
-            except ValueError:
-                created_at__gt = int(request.query_params['created_at__gt'])
-            objects = []
-            for obj in reverse_ordered_list:
-                if obj.created_at > created_at__gt:
-                    objects.append(obj)
-                else:
-                    break
-            self.has_next_page = False
-            return objects
-
-        # less than means getting older info
-        index = 0
-        if 'created_at__lt' in request.query_params:
-            try:
-                created_at__lt = parser.isoparse(request.query_params['created_at__lt'])
-            except ValueError:
-                created_at__lt = int(request.query_params['created_at__lt'])
-            for index, obj in enumerate(reverse_ordered_list):
-                if obj.created_at < created_at__lt:
-                    break
+        # the list is ordered from newest to oldest, so the negated positions
+        # are ascending and the cursor position can be found by binary search
+        keys = NegatedPositionKeys(reverse_ordered_list)
+        before, after = self.get_cursor_bounds(request)
+
+        start = 0
+        if before is not None:
+            created_at, object_id = before
+            if object_id is None:
+                start = bisect_right(keys, (-created_at, float('inf')))
             else:
-                reverse_ordered_list = []
-        self.has_next_page = len(reverse_ordered_list) > index + self.page_size
-        return reverse_ordered_list[index: index + self.page_size]
+                start = bisect_right(keys, (-created_at, -object_id))
 
-    def paginate_queryset(self, queryset, request, view=None):
-        # if cache hit, it will return an ordered list instead of a queryset.
-        if 'created_at__gt' in request.query_params:
-            created_at__gt = request.query_params['created_at__gt']
-            queryset = queryset.filter(created_at__gt=created_at__gt)
-            self.has_next_page = False
-            return queryset.order_by('-created_at')
+        # after basically means getting the updated info
+        if after is not None:
+            created_at, object_id = after
+            if object_id is None:
+                stop = bisect_left(keys, (-created_at, float('-inf')))
+            else:
+                stop = bisect_left(keys, (-created_at, -object_id))
+            stop = min(stop, start + self.page_size + 1)
+            return self.paginate_newer_objects(reverse_ordered_list[start:stop])
 
-        if 'created_at__lt' in request.query_params:
-            created_at__lt = request.query_params['created_at__lt']
-            queryset = queryset.filter(created_at__lt=created_at__lt)
+        # before means getting older info
+        return self.paginate_older_objects(
+            reverse_ordered_list[start: start + self.page_size + 1],
+        )
 
-        queryset = queryset.order_by('-created_at')[:self.page_size + 1]
-        self.has_next_page = len(queryset) > self.page_size
-        return queryset[: self.page_size]
+    def filter_queryset_by_cursors(self, queryset, before, after):
+        # keyset seek on (created_at, id), ties on created_at are broken by id
+        field = self.cursor_field
+        if before is not None:
+            created_at, object_id = before
+            created_at = timestamp_to_datetime(created_at)
+            condition = Q(**{field + '__lt': created_at})
+            if object_id is not None:
+                condition |= Q(**{field: created_at, 'id__lt': object_id})
+            queryset = queryset.filter(condition)
+        if after is not None:
+            created_at, object_id = after
+            created_at = timestamp_to_datetime(created_at)
+            condition = Q(**{field + '__gt': created_at})
+            if object_id is not None:
+                condition |= Q(**{field: created_at, 'id__gt': object_id})
+            queryset = queryset.filter(condition)
+        return queryset
 
-    def paginate_cached_list(self, cached_list, request):
-        paginated_list = self.paginate_ordered_list(cached_list, request)
+    def paginate_queryset(self, queryset, request, view=None):
+        # if cache hit, it will return an ordered list instead of a queryset.
+        before, after = self.get_cursor_bounds(request)
+        queryset = self.filter_queryset_by_cursors(queryset, before, after)
+        ordering = ('-' + self.cursor_field, '-id')
+        objects = list(queryset.order_by(*ordering)[:self.page_size + 1])
+        if after is not None:
+            return self.paginate_newer_objects(objects)
+        return self.paginate_older_objects(objects)
 
-        if 'created_at__gt' in request.query_params:
-            return paginated_list
-        if self.has_next_page:
-            return paginated_list
-        if len(cached_list) < settings.REDIS_LIST_LENGTH_LIMIT:
-            return paginated_list
+    def paginate_cached_window(self, load_window, request):
+        # load_window(before, after, limit) reads only the objects inside
+        # the cursor window from redis and returns (objects, cached_length)
+        before, after = self.get_cursor_bounds(request)
+        objects, cached_length = load_window(
+            before=before,
+            after=after,
+            limit=self.page_size + 1,
+        )
+        if after is not None:
+            # a full cache holding no object older than after does not cover
+            # the whole gap, the rest of it is only in the db / hbase
+            if len(objects) <= self.page_size and \
+                    cached_length >= settings.REDIS_LIST_LENGTH_LIMIT:
+                older_objects, _ = load_window(before=after, limit=1)
+                if not older_objects:
+                    return None
+            return self.paginate_newer_objects(objects)
+
+        if len(objects) > self.page_size:
+            return self.paginate_older_objects(objects)
+        # the cache is complete if it holds less than the limit
+        if cached_length < settings.REDIS_LIST_LENGTH_LIMIT:
+            return self.paginate_older_objects(objects)
         return None
 
     def get_paginated_response(self, data):
-        return Response({
+        response_data = {
             'has_next_page': self.has_next_page,
+            'has_more_newer': self.has_more_newer,
+            'next_cursor': self.next_cursor,
+            'newest_cursor': self.newest_cursor,
             'results': data,
-        })
+        }
+        if self.has_more_newer:
+            response_data['continuation_cursor'] = self.continuation_cursor
+        return Response(response_data)
 
     def paginate_hbase(self, hb_model, row_key_prefix, request):
-        if 'created_at__gt' in request.query_params:
-            created_at__gt = request.query_params['created_at__gt']
-            start = (*row_key_prefix, created_at__gt)
-            stop = (*row_key_prefix, MAX_TIMESTAMP)
-            objects = hb_model.filter(start=start, stop=stop)
-            if len(objects) and objects[0].created_at == int(created_at__gt):
-                objects = objects[:0:-1]
-            else:
-                objects = objects[::-1]
-            self.has_next_page = False
-            return objects
+        # created_at is unique inside a row key prefix, so a cursor is an exact
+        # start / stop row and its id part is not needed
+        before, after = self.get_cursor_bounds(request)
 
-        if 'created_at__lt' in request.query_params:
-            created_at__lt = request.query_params['created_at__lt']
+        if after is not None:
+            # reversed scan from the newest row down to the cursor (exclusive),
+            # bounded by the page size instead of reading up to MAX_TIMESTAMP
+            created_at__lt = MAX_TIMESTAMP if before is None else before[0]
             start = (*row_key_prefix, created_at__lt)
+            stop = (*row_key_prefix, after[0])
+            objects = hb_model.filter(start=start, stop=stop, limit=self.page_size + 2, reverse=True)
+            if len(objects) and objects[0].created_at == created_at__lt:
+                objects = objects[1:]
+            # row keys with more fields after created_at sort after the stop row
+            objects = [obj for obj in objects if obj.created_at != after[0]]
+            return self.paginate_newer_objects(objects[:self.page_size + 1])
+
+        if before is not None:
+            start = (*row_key_prefix, before[0])
             stop = (*row_key_prefix, None)
             objects = hb_model.filter(start=start, stop=stop, limit=self.page_size + 2, reverse=True)
-            if len(objects) and objects[0].created_at == int(created_at__lt):
+            if len(objects) and objects[0].created_at == before[0]:
                 objects = objects[1:]
-            if len(objects) > self.page_size:
-                objects = objects[:-1]
-                self.has_next_page = True
-            else:
-                self.has_next_page = False
-            return objects
+            return self.paginate_older_objects(objects[:self.page_size + 1])
 
         prefix = (*row_key_prefix, None)
         objects = hb_model.filter(prefix=prefix, limit=self.page_size + 1, reverse=True)
-        if len(objects) > self.page_size:
-            objects = objects[:-1]
-            self.has_next_page = True
-        else:
-            self.has_next_page = False
-        return objects
\ No newline at end of file
+        return self.paginate_older_objects(objects)
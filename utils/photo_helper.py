@@ -0,0 +1,89 @@
+from billiard.pool import Pool
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from functools import partial
+from io import BytesIO
+from PIL import Image, ImageOps
+import os
+
+THUMBNAIL_QUALITY = 85
+# one pool per process, created on first use and kept for the next tasks. the
+# pid tells apart a pool inherited from a parent process, whose workers are
+# not the children of this one
+_pool = None
+_pool_pid = None
+
+
+def _get_pool(workers):
+    global _pool, _pool_pid
+    if _pool is None or _pool_pid != os.getpid():
+        _pool = Pool(processes=workers)
+        _pool_pid = os.getpid()
+    return _pool
+
+
+def _make_thumbnails(name, sizes):
+    # runs in the pool workers, only file names cross the process boundary.
+    # any failure is returned instead of raised, so that one photo can not
+    # fail the whole map
+    try:
+        return name, _resize(name, sizes)
+    except Exception:
+        return name, None
+
+
+def _resize(name, sizes):
+    largest = max(sizes.values())
+    with default_storage.open(name) as file:
+        try:
+            image = Image.open(file)
+            # lets the jpeg decoder scale down by 1/2 .. 1/8 while decoding
+            image.draft('RGB', (largest, largest))
+            image = ImageOps.exif_transpose(image).convert('RGB')
+        except (OSError, ValueError, Image.DecompressionBombError):
+            return False
+
+    # from the largest to the smallest, each size is resized from the previous one
+    for size_name, max_pixels in sorted(sizes.items(), key=lambda item: -item[1]):
+        image.thumbnail((max_pixels, max_pixels), Image.LANCZOS)
+        buffer = BytesIO()
+        image.save(buffer, format='JPEG', quality=THUMBNAIL_QUALITY, optimize=True, progressive=True)
+        thumbnail_name = PhotoHelper.get_thumbnail_name(name, size_name)
+        # the file system storage would pick another name for an existing file
+        if default_storage.exists(thumbnail_name):
+            default_storage.delete(thumbnail_name)
+        default_storage.save(thumbnail_name, ContentFile(buffer.getvalue()))
+    return True
+
+
+class PhotoHelper:
+
+    @classmethod
+    def save_upload(cls, name, file):
+        # storage.save reads the upload chunk by chunk (a multipart upload on s3),
+        # large uploads are spooled to a temporary file by django, not kept in memory
+        return default_storage.save(default_storage.generate_filename(name), file)
+
+    @classmethod
+    def get_thumbnail_name(cls, name, size_name):
+        root, _ = os.path.splitext(name)
+        return '{}_{}.jpg'.format(root, size_name)
+
+    @classmethod
+    def get_url(cls, name, size_name):
+        return default_storage.url(cls.get_thumbnail_name(name, size_name))
+
+    @classmethod
+    def make_thumbnails(cls, names, sizes, workers=0):
+        """
+        saves a jpeg next to each original for every {size_name: max_pixels} in
+        sizes. returns {name: True if resized, False if the file is not an image,
+        None if it failed otherwise}, a storage error for instance.
+        """
+        make_thumbnails = partial(_make_thumbnails, sizes=sizes)
+        if workers <= 0 or len(names) <= 1:
+            return dict(map(make_thumbnails, names))
+
+        # billiard instead of multiprocessing, celery workers are daemonic
+        # processes which multiprocessing does not allow to have children
+        return dict(_get_pool(workers).map(make_thumbnails, names))
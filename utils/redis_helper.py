@@ -1,20 +1,112 @@
+from collections import defaultdict
 from django_hbase.models import HBaseModel
 from utils.redis_client import RedisClient
 from utils.redis_serializers import DjangoModelSerializer, HBaseModelSerializer
 from django.conf import settings
+from redis.exceptions import ResponseError
+from utils.time_constants import ONE_MINUTE
+from utils.time_helpers import to_timestamp
+
+import time
+import uuid
+
+FLUSH_COUNTS_LOCK_TIMEOUT = 5 * ONE_MINUTE
+
+# KEYS: count key, dirty set key
+# ARGV: amount, ttl, object id, initial count (only when the caller loaded it)
+# returns the new count, or nil if the count is not cached and no initial
+# count is given. runs atomically, so concurrent changes can not be lost.
+CHANGE_COUNT_SCRIPT = """
+if redis.call('EXISTS', KEYS[1]) == 0 then
+    if ARGV[4] == nil then
+        return false
+    end
+    redis.call('SET', KEYS[1], ARGV[4])
+end
+local count = redis.call('INCRBY', KEYS[1], ARGV[1])
+redis.call('EXPIRE', KEYS[1], ARGV[2])
+redis.call('SADD', KEYS[2], ARGV[3])
+return count
+"""
+
+# KEYS: counter keys, ARGV: amounts, same order
+# counters that are not cached are left alone, they are rebuilt on next read
+INCR_IF_EXISTS_SCRIPT = """
+for i, key in ipairs(KEYS) do
+    if redis.call('EXISTS', key) == 1 then
+        redis.call('INCRBY', key, ARGV[i])
+    end
+end
+return true
+"""
+
+# KEYS[1]: key, ARGV[1]: expected value
+DELETE_IF_EQUALS_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
 
 
 class RedisHelper:
 
+    # cached lists are stored as sorted sets scored by created_at in microseconds,
+    # so that a page can be read by its cursor without loading the whole list.
+    # members are prefixed by the zero padded object id, so objects sharing the
+    # same created_at are ordered by id like (created_at, id) in mysql.
+
+    @classmethod
+    def get_score(cls, obj):
+        return to_timestamp(obj.created_at)
+
+    @classmethod
+    def get_tie_breaker(cls, obj):
+        # hbase objects have no id, their created_at is unique in the row key
+        return getattr(obj, 'id', None) or 0
+
+    @classmethod
+    def get_position(cls, obj):
+        return cls.get_score(obj), cls.get_tie_breaker(obj)
+
+    @classmethod
+    def _to_member(cls, obj, serializer):
+        return '{:016d}:{}'.format(cls.get_tie_breaker(obj), serializer.serialize(obj))
+
+    @classmethod
+    def _parse_member(cls, member):
+        tie_breaker, serialized_data = member.split(b':', 1)
+        return int(tie_breaker), serialized_data
+
+    @classmethod
+    def in_window(cls, position, before=None, after=None):
+        """
+        position, before and after are (created_at, id) pairs. a bound without id
+        excludes every object created at the bound's created_at.
+        """
+        created_at, _ = position
+        if before is not None:
+            if before[1] is None and created_at >= before[0]:
+                return False
+            if before[1] is not None and position >= before:
+                return False
+        if after is not None:
+            if after[1] is None and created_at <= after[0]:
+                return False
+            if after[1] is not None and position <= after:
+                return False
+        return True
+
     @classmethod
     def load_objects(cls, key, lazy_load_objects, serializer=DjangoModelSerializer):
         conn = RedisClient.get_connection()
 
         # cache hit
         if conn.exists(key):
-            serialized_list = conn.lrange(key, 0, -1)  # get value from start to end
+            members = conn.zrevrange(key, 0, -1)  # get value from newest to oldest
             objects = []
-            for serialized_data in serialized_list:
+            for member in members:
+                _, serialized_data = cls._parse_member(member)
                 deserialized_obj = serializer.deserialize(serialized_data)
                 objects.append(deserialized_obj)
             return objects
@@ -25,65 +117,320 @@ class RedisHelper:
         return list(objects)
 
     @classmethod
-    def push_object(cls, key, obj, lazy_load_objects):
+    def load_objects_window(
+        cls,
+        key,
+        lazy_load_objects,
+        before=None,
+        after=None,
+        limit=None,
+        serializer=DjangoModelSerializer,
+        length_limit=None,
+    ):
+        """
+        newest to oldest objects positioned between the after and before cursors,
+        at most limit of them. returns (objects, cached_length), only the objects
+        in the window are fetched and deserialized. on a cache miss the newest
+        length_limit objects are cached, REDIS_LIST_LENGTH_LIMIT by default.
+        """
+        conn = RedisClient.get_connection()
+        max_value = '+inf' if before is None else '({}'.format(before[0])
+        min_value = '-inf' if after is None else '({}'.format(after[0])
+        # objects sharing created_at with a cursor are read apart and filtered
+        # by id, usually there is none or a handful of them
+        boundary_scores = set(
+            bound[0] for bound in (before, after)
+            if bound is not None and bound[1] is not None
+        )
+
+        # existence check and range reads in a single round trip
+        pipeline = conn.pipeline(transaction=False)
+        pipeline.zcard(key)
+        if limit is None:
+            pipeline.zrevrangebyscore(key, max_value, min_value, withscores=True)
+        else:
+            pipeline.zrevrangebyscore(
+                key, max_value, min_value, start=0, num=limit, withscores=True,
+            )
+        for score in boundary_scores:
+            pipeline.zrevrangebyscore(key, score, score, withscores=True)
+        results = pipeline.execute()
+        cached_length = results[0]
+
+        # cache hit
+        if cached_length:
+            candidates = []
+            for members in results[1:]:
+                for member, score in members:
+                    tie_breaker, serialized_data = cls._parse_member(member)
+                    position = (int(score), tie_breaker)
+                    if cls.in_window(position, before, after):
+                        candidates.append((position, serialized_data))
+            candidates.sort(key=lambda candidate: candidate[0], reverse=True)
+            if limit is not None:
+                candidates = candidates[:limit]
+            objects = [
+                serializer.deserialize(serialized_data)
+                for _, serialized_data in candidates
+            ]
+            return objects, cached_length
+
+        # cache miss, the loaded objects are already deserialized
+        length_limit = length_limit or settings.REDIS_LIST_LENGTH_LIMIT
+        objects = list(lazy_load_objects(length_limit))
+        cls._load_objects_to_cache(key, objects, serializer)
+        window = [
+            obj for obj in objects
+            if cls.in_window(cls.get_position(obj), before, after)
+        ]
+        if limit is not None:
+            window = window[:limit]
+        return window, len(objects)
+
+    @classmethod
+    def get_window_loader(cls, key, lazy_load_objects, serializer=DjangoModelSerializer):
+        def _load_window(before=None, after=None, limit=None):
+            return cls.load_objects_window(
+                key,
+                lazy_load_objects,
+                before=before,
+                after=after,
+                limit=limit,
+                serializer=serializer,
+            )
+        return _load_window
+
+    @classmethod
+    def push_object(cls, key, obj, lazy_load_objects, length_limit=None):
+        length_limit = length_limit or settings.REDIS_LIST_LENGTH_LIMIT
         if isinstance(obj, HBaseModel):
             serializer = HBaseModelSerializer
         else:
             serializer = DjangoModelSerializer
         conn = RedisClient.get_connection()
         if conn.exists(key):
-            serialized_data = serializer.serialize(obj)
-            conn.lpush(key, serialized_data)
-            conn.ltrim(key, 0, settings.REDIS_LIST_LENGTH_LIMIT - 1)
+            conn.zadd(key, {cls._to_member(obj, serializer): cls.get_score(obj)})
+            # only keep the newest length_limit objects
+            conn.zremrangebyrank(key, 0, -length_limit - 1)
             return
-        objects = lazy_load_objects(settings.REDIS_LIST_LENGTH_LIMIT)
+        objects = lazy_load_objects(length_limit)
         cls._load_objects_to_cache(key, objects, serializer)
 
+    @classmethod
+    def _serialize_objects(cls, objects, serializer):
+        return {
+            cls._to_member(obj, serializer): cls.get_score(obj)
+            for obj in objects
+        }
+
     @classmethod
     def _load_objects_to_cache(cls, key, objects, serializer):
         conn = RedisClient.get_connection()
-        serialized_list = []
-        # Can only cache the limit size objects
-        for obj in objects:
-            serialized_data = serializer.serialize(obj)
-            serialized_list.append(serialized_data)
-
-        if serialized_list:
-            conn.rpush(key, *serialized_list)
+        serialized_mapping = cls._serialize_objects(objects, serializer)
+        if serialized_mapping:
+            conn.zadd(key, serialized_mapping)
             conn.expire(key, settings.REDIS_KEY_EXPIRE_TIME)
 
+    @classmethod
+    def reload_objects_to_cache(cls, key_to_objects, serializer=DjangoModelSerializer):
+        # rebuild a batch of cached lists in one round trip, the old lists are
+        # replaced so that a changed cache format does not survive a warm up
+        conn = RedisClient.get_connection()
+        pipeline = conn.pipeline()
+        for key, objects in key_to_objects.items():
+            serialized_mapping = cls._serialize_objects(objects, serializer)
+            pipeline.delete(key)
+            if serialized_mapping:
+                pipeline.zadd(key, serialized_mapping)
+                pipeline.expire(key, settings.REDIS_KEY_EXPIRE_TIME)
+        pipeline.execute()
+
+    # counters are written behind: redis holds the authoritative value and the
+    # ids of changed objects are collected in a dirty set, which is flushed to
+    # the database periodically. the flush writes absolute values, so running
+    # it again after a crash can not apply a change twice.
+
+    # registered lua scripts by source
+    scripts = {}
+
     @classmethod
     def get_count_key(cls, obj, attr):
         return '{}.{}:{}'.format(obj.__class__.__name__, attr, obj.id)
 
     @classmethod
-    def incr_count(cls, obj, attr):
+    def get_dirty_counts_key(cls, model_class, attr):
+        return '{}.{}:dirty'.format(model_class.__name__, attr)
+
+    @classmethod
+    def _load_count_from_db(cls, obj, attr):
+        return obj.__class__.objects.filter(id=obj.id).values_list(attr, flat=True).first() or 0
+
+    @classmethod
+    def get_script(cls, source):
+        if source not in cls.scripts:
+            cls.scripts[source] = RedisClient.get_connection().register_script(source)
+        return cls.scripts[source]
+
+    @classmethod
+    def _change_count(cls, obj, attr, amount):
         conn = RedisClient.get_connection()
-        key = cls.get_count_key(obj, attr)
-        if not conn.exists(key):
-            conn.set(key, getattr(obj, attr))
-            conn.exists(key, settings.REDIS_KEY_EXPIRE_TIME)
-            return getattr(obj, attr)
-        return conn.incr(key)
+        script = cls.get_script(CHANGE_COUNT_SCRIPT)
+        keys = [
+            cls.get_count_key(obj, attr),
+            cls.get_dirty_counts_key(obj.__class__, attr),
+        ]
+        args = [amount, settings.REDIS_KEY_EXPIRE_TIME, obj.id]
+        count = script(keys=keys, args=args, client=conn)
+        if count is not None:
+            return count
+        # the count is not cached, run again with the initial value from db
+        args.append(cls._load_count_from_db(obj, attr))
+        return script(keys=keys, args=args, client=conn)
+
+    @classmethod
+    def incr_count(cls, obj, attr):
+        return cls._change_count(obj, attr, 1)
 
     @classmethod
     def decr_count(cls, obj, attr):
-        conn = RedisClient.get_connection()
-        key = cls.get_count_key(obj, attr)
-        if not conn.exists(key):
-            conn.set(key, getattr(obj, attr))
-            conn.exists(key, settings.REDIS_KEY_EXPIRE_TIME)
-            return getattr(obj, attr)
-        return conn.decr(key)
+        return cls._change_count(obj, attr, -1)
 
     @classmethod
     def get_count(cls, obj, attr):
         conn = RedisClient.get_connection()
         key = cls.get_count_key(obj, attr)
         count = conn.get(key)
-        if count:
+        if count is not None:
             return int(count)
-        obj.refresh_from_db()
-        count = getattr(obj, attr)
-        conn.set(key, count)
+        count = cls._load_count_from_db(obj, attr)
+        conn.set(key, count, ex=settings.REDIS_KEY_EXPIRE_TIME, nx=True)
         return count
+
+    @classmethod
+    def incr_if_exists(cls, key_to_amount):
+        # incrementing a missing key would start it from 0 instead of the real
+        # count, so only the cached counters are changed, atomically
+        if not key_to_amount:
+            return
+        keys = list(key_to_amount.keys())
+        args = [key_to_amount[key] for key in keys]
+        script = cls.get_script(INCR_IF_EXISTS_SCRIPT)
+        script(keys=keys, args=args, client=RedisClient.get_connection())
+
+    @classmethod
+    def wait_for_rate_limit(cls, key, rate_limit):
+        """
+        blocks until the caller may go on, at most rate_limit callers per second
+        window across all the processes sharing the key.
+        """
+        conn = RedisClient.get_connection()
+        while True:
+            now = time.time()
+            window_key = '{}:{}'.format(key, int(now))
+            pipeline = conn.pipeline()
+            pipeline.incr(window_key)
+            pipeline.expire(window_key, 2)
+            count, _ = pipeline.execute()
+            if count <= rate_limit:
+                return
+            time.sleep(int(now) + 1 - now)
+
+    @classmethod
+    def delete_if_equals(cls, key, value):
+        # the key is left alone if it was overwritten in the meantime
+        script = cls.get_script(DELETE_IF_EQUALS_SCRIPT)
+        return script(keys=[key], args=[value], client=RedisClient.get_connection())
+
+    @classmethod
+    def get_counts_many(cls, objects, attrs):
+        """
+        {obj: {attr: count}} for a page of objects in one MGET. the missing
+        counts are loaded with one query per model and cached in one pipeline.
+        """
+        objects = list(objects)
+        if not objects:
+            return {}
+        conn = RedisClient.get_connection()
+        keys = [cls.get_count_key(obj, attr) for obj in objects for attr in attrs]
+        values = iter(conn.mget(keys))
+
+        counts_map = {}
+        missing_ids = defaultdict(set)
+        for obj in objects:
+            counts = counts_map.setdefault(obj, {})
+            for attr in attrs:
+                value = next(values)
+                if value is None:
+                    missing_ids[obj.__class__].add(obj.id)
+                else:
+                    counts[attr] = int(value)
+        if not missing_ids:
+            return counts_map
+
+        pipeline = conn.pipeline(transaction=False)
+        for model_class, object_ids in missing_ids.items():
+            rows = model_class.objects.filter(id__in=object_ids).values('id', *attrs)
+            row_map = {row['id']: row for row in rows}
+            for obj, counts in counts_map.items():
+                if obj.__class__ != model_class or obj.id not in object_ids:
+                    continue
+                row = row_map.get(obj.id, {})
+                for attr in attrs:
+                    if attr in counts:
+                        continue
+                    counts[attr] = row.get(attr) or 0
+                    pipeline.set(
+                        cls.get_count_key(obj, attr),
+                        counts[attr],
+                        ex=settings.REDIS_KEY_EXPIRE_TIME,
+                        nx=True,
+                    )
+        pipeline.execute()
+        return counts_map
+
+    @classmethod
+    def flush_counts(cls, model_class, attr, batch_size=None):
+        """
+        write the counts of the dirty objects back to the database with a bulk
+        update. the dirty set is renamed before it is read so that new changes
+        go to a fresh set; a flushing set left behind by a crash is retried
+        first and only deleted once the database has been updated. returns 0
+        when another flush of the same counts is running.
+        """
+        conn = RedisClient.get_connection()
+        dirty_key = cls.get_dirty_counts_key(model_class, attr)
+        lock_key = '{}:lock'.format(dirty_key)
+        # with overlapping flushes, one could rename a new dirty set over the
+        # flushing set of the other, which then deletes it unflushed
+        token = uuid.uuid4().hex
+        if not conn.set(lock_key, token, ex=FLUSH_COUNTS_LOCK_TIMEOUT, nx=True):
+            return 0
+        try:
+            return cls._flush_counts(conn, model_class, attr, dirty_key, batch_size)
+        finally:
+            cls.delete_if_equals(lock_key, token)
+
+    @classmethod
+    def _flush_counts(cls, conn, model_class, attr, dirty_key, batch_size):
+        flushing_key = '{}:flushing'.format(dirty_key)
+        if not conn.exists(flushing_key):
+            try:
+                conn.rename(dirty_key, flushing_key)
+            except ResponseError:
+                # no such key, nothing has changed since the last flush
+                return 0
+
+        object_ids = [int(object_id) for object_id in conn.smembers(flushing_key)]
+        counts = conn.mget([
+            cls.get_count_key(model_class(id=object_id), attr)
+            for object_id in object_ids
+        ])
+        objects = [
+            model_class(id=object_id, **{attr: int(count)})
+            for object_id, count in zip(object_ids, counts)
+            # an expired count has been flushed long ago
+            if count is not None
+        ]
+        model_class.objects.bulk_update(objects, [attr], batch_size=batch_size)
+        conn.delete(flushing_key)
+        return len(objects)
@@ -0,0 +1,69 @@
+from django.contrib.sessions.backends.base import CreateError, SessionBase, UpdateError
+from twitter.cache import SESSION_PATTERN
+from utils.redis_client import RedisClient
+
+
+class SessionStore(SessionBase):
+    """
+    sessions stored in redis, used as SESSION_ENGINE. keys expire with the
+    session so there is nothing to clear.
+    """
+
+    @classmethod
+    def get_key(cls, session_key):
+        return SESSION_PATTERN.format(session_key=session_key)
+
+    def load(self):
+        data = None
+        if self.session_key is not None:
+            data = RedisClient.get_connection().get(self.get_key(self.session_key))
+        if data is None:
+            self._session_key = None
+            return {}
+        return self.decode(data.decode('utf-8'))
+
+    def exists(self, session_key):
+        if not session_key:
+            return False
+        return RedisClient.get_connection().exists(self.get_key(session_key)) > 0
+
+    def create(self):
+        # the same as the cache backend of django, retry on a key collision
+        for i in range(10000):
+            self._session_key = self._get_new_session_key()
+            try:
+                self.save(must_create=True)
+            except CreateError:
+                continue
+            self.modified = True
+            return
+        raise RuntimeError('Unable to create a new session key.')
+
+    def save(self, must_create=False):
+        if self.session_key is None:
+            return self.create()
+        data = self.encode(self._get_session(no_load=must_create))
+        saved = RedisClient.get_connection().set(
+            self.get_key(self.session_key),
+            data,
+            ex=self.get_expiry_age(),
+            nx=must_create,
+            # a session deleted meanwhile (logged out elsewhere) is not written back
+            xx=not must_create,
+        )
+        if saved:
+            return
+        if must_create:
+            raise CreateError
+        raise UpdateError
+
+    def delete(self, session_key=None):
+        if session_key is None:
+            if self.session_key is None:
+                return
+            session_key = self.session_key
+        RedisClient.get_connection().delete(self.get_key(session_key))
+
+    @classmethod
+    def clear_expired(cls):
+        pass
@@ -1,5 +1,18 @@
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image
+from rest_framework.exceptions import ValidationError
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
 from testing.testcases import TestCase
+from tweets.models import Tweet
+from utils.paginations import EndlessPagination, decode_cursor, encode_cursor
+from utils.memcached_helper import MemcachedHelper
+from utils.photo_helper import PhotoHelper
 from utils.redis_client import RedisClient
+from utils.redis_helper import RedisHelper
+
+import time
 
 
 class UtilsTests(TestCase):
@@ -16,4 +29,134 @@ class UtilsTests(TestCase):
 
         RedisClient.clear()
         cached_list = conn.lrange('redis_key', 0, -1)
-        self.assertEqual(cached_list, [])
\ No newline at end of file
+        self.assertEqual(cached_list, [])
+
+    def test_paginate_ordered_list(self):
+        page_size = EndlessPagination.page_size
+        user = self.create_user('marcus')
+        tweets = [self.create_tweet(user) for _ in range(page_size + 2)][::-1]
+        factory = APIRequestFactory()
+
+        def paginate(params):
+            paginator = EndlessPagination()
+            request = Request(factory.get('/', params))
+            return paginator.paginate_ordered_list(tweets, request), paginator.has_next_page
+
+        page, has_next_page = paginate({})
+        self.assertEqual(page, tweets[:page_size])
+        self.assertEqual(has_next_page, True)
+
+        # iso string cursor
+        page, has_next_page = paginate({'created_at__lt': tweets[1].created_at})
+        self.assertEqual(page, tweets[2:])
+        self.assertEqual(has_next_page, False)
+
+        # microsecond timestamp cursor
+        page, has_next_page = paginate({'created_at__gt': tweets[2].timestamp})
+        self.assertEqual(page, tweets[:2])
+        self.assertEqual(has_next_page, False)
+
+        page, has_next_page = paginate({'created_at__lt': tweets[-1].created_at})
+        self.assertEqual(page, [])
+        self.assertEqual(has_next_page, False)
+
+    def test_paginate_with_cursor_tokens(self):
+        page_size = EndlessPagination.page_size
+        user = self.create_user('marcus')
+        tweets = [self.create_tweet(user) for _ in range(page_size + 2)]
+        # every tweet shares the same created_at, ties are broken by id
+        Tweet.objects.filter(user=user).update(created_at=tweets[0].created_at)
+        factory = APIRequestFactory()
+
+        def paginate(params, queryset=False):
+            paginator = EndlessPagination()
+            request = Request(factory.get('/', params))
+            if queryset:
+                page = paginator.paginate_queryset(Tweet.objects.filter(user=user), request)
+            else:
+                ordered_list = list(Tweet.objects.filter(user=user).order_by('-created_at', '-id'))
+                page = paginator.paginate_ordered_list(ordered_list, request)
+            return [tweet.id for tweet in page], paginator
+
+        tweet_ids = sorted([tweet.id for tweet in tweets], reverse=True)
+        for queryset in (True, False):
+            page, paginator = paginate({}, queryset)
+            self.assertEqual(page, tweet_ids[:page_size])
+            self.assertEqual(paginator.has_next_page, True)
+            self.assertEqual(decode_cursor(paginator.next_cursor)[1], tweet_ids[page_size - 1])
+
+            page, paginator = paginate({'before': paginator.next_cursor}, queryset)
+            self.assertEqual(page, tweet_ids[page_size:])
+            self.assertEqual(paginator.has_next_page, False)
+
+            newest = Tweet.objects.get(id=tweet_ids[1])
+            page, paginator = paginate({'after': encode_cursor(newest.created_at, newest.id)}, queryset)
+            self.assertEqual(page, tweet_ids[:1])
+
+        paginator = EndlessPagination()
+        request = Request(factory.get('/', {'before': 'not a cursor'}))
+        with self.assertRaises(ValidationError):
+            paginator.get_cursor_bounds(request)
+
+    def test_get_object_or_none_through_cache(self):
+        self.clear_cache()
+        user = self.create_user('marcus')
+        tweet = self.create_tweet(user)
+        missing_id = tweet.id + 1
+
+        self.assertEqual(MemcachedHelper.get_object_or_none_through_cache(Tweet, tweet.id), tweet)
+        self.assertEqual(MemcachedHelper.get_object_or_none_through_cache(Tweet, missing_id), None)
+        # both the object and the missing id are cached
+        with self.assertNumQueries(0):
+            self.assertEqual(MemcachedHelper.get_object_or_none_through_cache(Tweet, tweet.id), tweet)
+            self.assertEqual(MemcachedHelper.get_object_or_none_through_cache(Tweet, missing_id), None)
+
+        # creating the missing id drops the negative entry
+        new_tweet = Tweet.objects.create(id=missing_id, user=user, content='new tweet')
+        self.assertEqual(MemcachedHelper.get_object_or_none_through_cache(Tweet, missing_id), new_tweet)
+        new_tweet.delete()
+        self.assertEqual(MemcachedHelper.get_object_or_none_through_cache(Tweet, missing_id), None)
+        # the missing entry is not returned as an object
+        with self.assertRaises(Tweet.DoesNotExist):
+            MemcachedHelper.get_object_through_cache(Tweet, missing_id)
+
+    def test_get_objects_through_cache(self):
+        self.clear_cache()
+        user = self.create_user('marcus')
+        tweets = [self.create_tweet(user) for _ in range(3)]
+        missing_id = tweets[-1].id + 1
+        tweet_ids = [tweet.id for tweet in tweets] + [missing_id]
+
+        # one query for the misses
+        with self.assertNumQueries(1):
+            objects = MemcachedHelper.get_objects_through_cache(Tweet, tweet_ids)
+        self.assertEqual(objects, {tweet.id: tweet for tweet in tweets})
+        # none at all once cached, the missing id included
+        with self.assertNumQueries(0):
+            objects = MemcachedHelper.get_objects_through_cache(Tweet, tweet_ids)
+        self.assertEqual(objects, {tweet.id: tweet for tweet in tweets})
+        self.assertEqual(MemcachedHelper.get_objects_through_cache(Tweet, []), {})
+
+    def test_wait_for_rate_limit(self):
+        windows = []
+        for _ in range(3):
+            RedisHelper.wait_for_rate_limit('testing_rate', 2)
+            windows.append(int(time.time()))
+        # the third caller waits for the next one second window
+        self.assertEqual(windows[2] > windows[0], True)
+
+    def test_make_thumbnails_in_pool(self):
+        names = [
+            default_storage.save('testing/photo1.jpg', self.create_image_file('photo1.jpg')),
+            default_storage.save('testing/photo2.jpg', self.create_image_file('photo2.jpg')),
+            default_storage.save('testing/photo3.jpg', ContentFile(b'not an image')),
+        ]
+        resized = PhotoHelper.make_thumbnails(names, {'small': 100}, workers=2)
+        self.assertEqual(resized, {names[0]: True, names[1]: True, names[2]: False})
+        for name in names[:2]:
+            with default_storage.open(PhotoHelper.get_thumbnail_name(name, 'small')) as file:
+                self.assertEqual(Image.open(file).size, (100, 75))
+        self.assertEqual(
+            default_storage.exists(PhotoHelper.get_thumbnail_name(names[2], 'small')),
+            False,
+        )
@@ -1,6 +1,32 @@
-from datetime import datetime
+from datetime import datetime, timedelta
+from dateutil import parser
 import pytz
 
+EPOCH = datetime(1970, 1, 1, tzinfo=pytz.utc)
+
 
 def utc_now():
-    return datetime.now().replace(tzinfo=pytz.utc)
\ No newline at end of file
+    return datetime.now().replace(tzinfo=pytz.utc)
+
+
+def to_timestamp(value):
+    # normalise a datetime or a microsecond timestamp into microseconds,
+    # done with integer arithmetic so that it is exact
+    if isinstance(value, datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=pytz.utc)
+        return (value - EPOCH) // timedelta(microseconds=1)
+    return int(value)
+
+
+def parse_timestamp(value):
+    # cursors come as microsecond timestamps (hbase) or iso strings (mysql)
+    try:
+        return int(value)
+    except ValueError:
+        return to_timestamp(parser.isoparse(value))
+
+
+def timestamp_to_datetime(value):
+    # inverse of to_timestamp, microseconds since epoch to an aware datetime
+    return EPOCH + timedelta(microseconds=int(value))